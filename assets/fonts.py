@@ -2,65 +2,187 @@
 # -*- coding: utf-8 -*-
 """
 字体管理模块
-处理字体注册和配置
+处理字体注册和配置；查找到的字体路径缓存在应用目录中，按文件和字体目录的修改时间校验，
+缓存有效时启动不再逐个探测系统字体
 """
 
+import json
 import os
+import threading
+
 from kivy.logger import Logger
 from kivy.core.text import LabelBase
 
+from utils.platform_probe import android_storage
+
+
+# Android系统字体路径（中文字体按优先级排列）
+ANDROID_FONT_PATHS = [
+    '/system/fonts/DroidSansFallback.ttf',
+    '/system/fonts/NotoSansCJK-Regular.ttc',
+    '/system/fonts/Roboto-Regular.ttf',
+    '/system/fonts/DroidSans.ttf'
+]
+DEFAULT_FONT_PATH = '/system/fonts/Roboto-Regular.ttf'
+FONT_CACHE_FILE = 'font_cache.json'
+FONT_CACHE_VERSION = 1
+
+# 已注册的字体：名称 -> 路径
+_registered = {}
+_registration_thread = None
+
+
+def get_font_cache_path():
+    """获取字体缓存文件路径（应用私有目录）"""
+    if android_storage is not None:
+        data_dir = android_storage.app_storage_path()
+    else:
+        # 桌面环境下使用项目data目录
+        data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+    return os.path.join(data_dir, FONT_CACHE_FILE)
+
+
+def _mtime(path):
+    """文件或目录的修改时间，不存在时为None"""
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _font_dirs():
+    return sorted(set(os.path.dirname(path) for path in ANDROID_FONT_PATHS + [DEFAULT_FONT_PATH]))
+
+
+def _discover_fonts():
+    """
+    探测系统字体
 
-def register_fonts():
-    """注册字体"""
+    Returns:
+        dict: 字体名称（'Chinese'/'Default'）-> 字体文件路径
+    """
+    fonts = {}
+    for font_path in ANDROID_FONT_PATHS:
+        if os.path.exists(font_path):
+            fonts['Chinese'] = font_path
+            break
+    if os.path.exists(DEFAULT_FONT_PATH):
+        fonts['Default'] = DEFAULT_FONT_PATH
+    return fonts
+
+
+def _load_cache(cache_path):
+    """
+    读取字体缓存，字体文件或字体目录有变化时视为失效
+
+    Returns:
+        dict: 字体名称 -> 路径，缓存不存在或失效时返回None
+    """
     try:
-        # Android系统字体路径
-        android_font_paths = [
-            '/system/fonts/DroidSansFallback.ttf',
-            '/system/fonts/NotoSansCJK-Regular.ttc',
-            '/system/fonts/Roboto-Regular.ttf',
-            '/system/fonts/DroidSans.ttf'
-        ]
-        
-        # 尝试注册中文字体
-        chinese_font_registered = False
-        for font_path in android_font_paths:
-            if os.path.exists(font_path):
-                try:
-                    LabelBase.register(name='Chinese', fn_regular=font_path)
-                    Logger.info(f"Fonts: Successfully registered Chinese font: {font_path}")
-                    chinese_font_registered = True
-                    break
-                except Exception as e:
-                    Logger.warning(f"Fonts: Failed to register font {font_path}: {e}")
-                    continue
-        
-        if not chinese_font_registered:
-            Logger.warning("Fonts: No Chinese font found, using default font")
-            # 使用默认字体
-            LabelBase.register(name='Chinese', fn_regular=None)
-        
-        # 注册默认字体
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if cache.get('version') != FONT_CACHE_VERSION:
+        return None
+    # 目录修改时间不变说明没有增删字体文件（包括上次未找到的字体）
+    if cache.get('dirs') != {path: _mtime(path) for path in _font_dirs()}:
+        return None
+    fonts = {}
+    for name, entry in cache.get('fonts', {}).items():
+        if _mtime(entry['path']) != entry['mtime']:
+            return None
+        fonts[name] = entry['path']
+    return fonts
+
+
+def _save_cache(cache_path, fonts):
+    cache = {
+        'version': FONT_CACHE_VERSION,
+        'dirs': {path: _mtime(path) for path in _font_dirs()},
+        'fonts': {name: {'path': path, 'mtime': _mtime(path)} for name, path in fonts.items()}
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        Logger.warning(f"Fonts: Failed to write font cache: {e}")
+
+
+def _register(fonts):
+    """按探测结果注册字体"""
+    for name, font_path in fonts.items():
         try:
-            if os.path.exists('/system/fonts/Roboto-Regular.ttf'):
-                LabelBase.register(name='Default', fn_regular='/system/fonts/Roboto-Regular.ttf')
-                Logger.info("Fonts: Successfully registered default font")
-            else:
-                Logger.info("Fonts: Using system default font")
+            LabelBase.register(name=name, fn_regular=font_path)
+            _registered[name] = font_path
+            Logger.info(f"Fonts: Successfully registered {name} font: {font_path}")
         except Exception as e:
-            Logger.warning(f"Fonts: Failed to register default font: {e}")
-        
+            Logger.warning(f"Fonts: Failed to register font {font_path}: {e}")
+    if 'Chinese' not in _registered:
+        Logger.warning("Fonts: No Chinese font found, using default font")
+    return True
+
+
+def _discover_and_register(cache_path):
+    global _registration_thread
+    try:
+        fonts = _discover_fonts()
+        _register(fonts)
+        _save_cache(cache_path, fonts)
         return True
-        
     except Exception as e:
         Logger.error(f"Fonts: Font registration failed: {e}")
         return False
+    finally:
+        _registration_thread = None
+
+
+def register_fonts(cache_path=None, background=False):
+    """
+    注册字体
+
+    Args:
+        cache_path: 字体缓存文件路径，默认为应用私有目录下的font_cache.json
+        background: 缓存失效需要探测系统字体时，是否在后台线程中进行
+
+    Returns:
+        bool: 注册成功（后台注册时表示已开始）
+    """
+    global _registration_thread
+    cache_path = cache_path or get_font_cache_path()
+    try:
+        fonts = _load_cache(cache_path)
+    except Exception as e:
+        Logger.warning(f"Fonts: Failed to read font cache: {e}")
+        fonts = None
+    if fonts is not None:
+        return _register(fonts)
+
+    if background:
+        _registration_thread = threading.Thread(
+            target=_discover_and_register, args=(cache_path,), name='FontRegistration')
+        _registration_thread.daemon = True
+        _registration_thread.start()
+        return True
+    return _discover_and_register(cache_path)
+
+
+def wait_for_fonts():
+    """等待后台字体注册完成（字体名称需在创建控件前确定）"""
+    thread = _registration_thread
+    if thread is not None and thread is not threading.current_thread():
+        thread.join()
 
 
 def get_font_name(prefer_chinese=False):
     """获取字体名称"""
-    if prefer_chinese and 'Chinese' in LabelBase._fonts:
+    wait_for_fonts()
+    if prefer_chinese and 'Chinese' in _registered:
         return 'Chinese'
-    elif 'Default' in LabelBase._fonts:
+    elif 'Default' in _registered:
         return 'Default'
     else:
         return 'Roboto'  # Kivy默认字体
@@ -68,4 +190,5 @@ def get_font_name(prefer_chinese=False):
 
 def is_chinese_font_available():
     """检查中文字体是否可用"""
-    return 'Chinese' in LabelBase._fonts
+    wait_for_fonts()
+    return 'Chinese' in _registered
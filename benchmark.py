@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+俯卧撑计数器性能基准测试
+不依赖摄像头和界面，使用帧源驱动各模块并输出耗时统计
+
+用法示例：
+    python benchmark.py backends --source "synthetic?frames=300&realtime=0" \\
+        --backend "mediapipe?model_complexity=0" --backend "mediapipe?model_complexity=1"
+    python benchmark.py storage --backend json --backend sqlite --history 0 100000 --writes 200
+    python benchmark.py startup --repeat 3
+    python benchmark.py pipeline --source "synthetic?fps=60" --duration 10
+    python benchmark.py sessions --cameras 1 2 4 --workers 2 --target-fps 15
+"""
+
+import argparse
+import json
+import os
+import sys
+
+# 添加项目路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+
+def bench_backends(args):
+    """对比各推理后端在同一组帧上的速度和检测结果"""
+    from core.pose_detector import PoseDetector
+    from utils.frame_sources import create_frame_source
+    from utils.latency import FrameTiming, LatencyMonitor, now
+
+    results = []
+    for backend_spec in args.backend or ['mediapipe']:
+        source = create_frame_source(args.source)
+        if not source.open():
+            print(f"无法打开帧源: {args.source}")
+            return 1
+
+        detector = PoseDetector(backend=backend_spec)
+        detector.process_interval = 1
+        monitor = LatencyMonitor()
+        detected = 0
+
+        # 预热，避免首帧的模型初始化计入统计
+        ret, frame = source.read()
+        if ret:
+            detector.process_frame(frame)
+            detector.reset_counter()
+
+        start = now()
+        frames = 0
+        while frames < args.frames:
+            ret, frame = source.read()
+            if not ret:
+                break
+            timing = FrameTiming(frames)
+            _, pose_detected = detector.process_frame(frame, timing=timing)
+            timing.display = now()
+            monitor.record(timing)
+            detected += pose_detected
+            frames += 1
+        elapsed = now() - start
+
+        inference = monitor.summary()['inference']
+        results.append({
+            'backend': detector.backend.describe(),
+            'frames': frames,
+            'fps': round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+            'inference_p50_ms': inference['p50'],
+            'inference_p95_ms': inference['p95'],
+            'frame_p95_ms': monitor.summary()['glass_to_glass']['p95'],
+            'detection_rate': round(detected / frames, 3) if frames else 0.0,
+            'reps': detector.get_counter(),
+        })
+        detector.cleanup()
+        source.release()
+
+    print_results(results, args.json)
+    return 0
+
+
+def bench_storage(args):
+    """对比各存储后端在不同历史记录规模下新增一条记录的耗时"""
+    import logging
+    import shutil
+    import tempfile
+    from datetime import datetime, timedelta
+
+    from kivy.logger import Logger
+
+    from core.user_manager import UserManager
+    from utils.latency import LatencyStats, get_process_write_bytes, now
+
+    results = []
+    for backend in args.backend or ['json', 'sqlite']:
+        for history in args.history:
+            data_dir = tempfile.mkdtemp()
+            try:
+                user_manager = UserManager(backend=backend, data_dir=data_dir,
+                                           background=args.background)
+                user_manager.register('bench', 'password')
+
+                # 直接构造历史记录并整体写入
+                user_data = user_manager.users_data['bench']
+                start_date = datetime(2020, 1, 1)
+                user_data['pushup_records'] = [
+                    {'count': 10 + i % 20, 'date': (start_date + timedelta(minutes=i)).isoformat(),
+                     'duration': 60.0}
+                    for i in range(history)
+                ]
+                user_data['total_pushups'] = sum(r['count'] for r in user_data['pushup_records'])
+                user_data['best_session'] = max([r['count'] for r in user_data['pushup_records']] or [0])
+                user_manager.save_users()
+
+                # 写放大：进程实际写出的字节数（含后台压缩、WAL检查点）/ 记录本身的JSON字节数
+                # 统计期间关闭日志输出，避免计入
+                stats = LatencyStats(window=args.writes)
+                logical_bytes = 0
+                level = Logger.level
+                Logger.setLevel(logging.ERROR)
+                try:
+                    written_before = get_process_write_bytes()
+                    for i in range(args.writes):
+                        start = now()
+                        user_manager.submit_pushup_record('bench', 15, duration=60.0)
+                        stats.add(now() - start)
+                        record = user_manager.users_data['bench']['pushup_records'][-1]
+                        logical_bytes += len(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+                    user_manager.close()
+                    written = get_process_write_bytes() - written_before
+                finally:
+                    Logger.setLevel(level)
+
+                summary = stats.summary()
+                results.append({
+                    'backend': backend,
+                    'mode': 'background' if args.background else 'sync',
+                    'history': history,
+                    'writes': args.writes,
+                    'write_mean_ms': summary['mean'],
+                    'write_p95_ms': summary['p95'],
+                    'bytes_per_write': round(written / args.writes) if args.writes else 0,
+                    'write_amplification': round(written / logical_bytes, 1) if logical_bytes else 0.0,
+                })
+            finally:
+                shutil.rmtree(data_dir)
+
+    print_results(results, args.json)
+    return 0
+
+
+def bench_startup(args):
+    """对比冷启动（新建检测器）和预热后从获取检测器到首帧推理完成的耗时"""
+    from core.detector_pool import DetectorPool
+    from utils.frame_sources import create_frame_source
+    from utils.latency import LatencyStats, now
+
+    source = create_frame_source(args.source)
+    if not source.open():
+        print(f"无法打开帧源: {args.source}")
+        return 1
+    ret, frame = source.read()
+    source.release()
+    if not ret:
+        print(f"无法读取帧源: {args.source}")
+        return 1
+
+    results = []
+    for mode in ('cold', 'warm'):
+        stats = LatencyStats(window=args.repeat)
+        pool = DetectorPool()
+        if mode == 'warm':
+            pool.prewarm(args.backend, background=False)
+        for _ in range(args.repeat):
+            if mode == 'cold':
+                pool = DetectorPool()
+            start = now()
+            detector = pool.acquire(backend=args.backend)
+            detector.process_interval = 1
+            detector.process_frame(frame)
+            stats.add(now() - start)
+            if mode == 'cold':
+                detector.cleanup()
+            else:
+                pool.release(detector, args.backend)
+        pool.shutdown()
+
+        summary = stats.summary()
+        results.append({
+            'mode': mode,
+            'backend': args.backend or 'default',
+            'repeat': args.repeat,
+            'first_frame_mean_ms': summary['mean'],
+            'first_frame_max_ms': summary['max'],
+        })
+
+    print_results(results, args.json)
+    return 0
+
+
+def _run_threaded(args):
+    """线程模式：采集线程只保留最新帧，推理在当前线程中进行（与CameraHandler + MainScreen相同）"""
+    import threading
+    import time
+
+    import cv2
+    from core.pose_detector import PoseDetector
+    from utils.frame_sources import create_frame_source
+    from utils.latency import now
+
+    detector = PoseDetector(backend=args.backend)
+    detector.process_interval = 1
+    source = create_frame_source(args.source)
+    source.open()
+    width, height = args.size
+    latest = {'seq': 0, 'frame': None}
+    condition = threading.Condition()
+    stop = threading.Event()
+
+    def capture():
+        interval = 1.0 / source.fps if source.realtime else 0
+        next_time = now()
+        while not stop.is_set():
+            ret, frame = source.read()
+            if not ret:
+                break
+            frame = cv2.resize(frame, (width, height))
+            with condition:
+                latest['seq'] += 1
+                latest['frame'] = frame
+                condition.notify_all()
+            if interval:
+                next_time += interval
+                time.sleep(max(0.0, next_time - now()))
+
+    thread = threading.Thread(target=capture, daemon=True)
+    start = now()
+    thread.start()
+    last = processed = 0
+    while now() - start < args.duration:
+        with condition:
+            if not condition.wait_for(lambda: latest['seq'] > last, timeout=0.1):
+                continue
+            seq, frame = latest['seq'], latest['frame']
+        last = seq
+        detector.process_frame(frame)
+        processed += 1
+    elapsed = now() - start
+    stop.set()
+    thread.join()
+    detector.cleanup()
+    source.release()
+    return processed, last, elapsed
+
+
+def _run_processes(args):
+    """多进程模式：见core.process_pipeline"""
+    import time
+
+    from core.process_pipeline import ProcessPipeline
+    from utils.latency import now
+
+    pipeline = ProcessPipeline(source=args.source, backend=args.backend, frame_size=tuple(args.size))
+    if not pipeline.start():
+        raise RuntimeError(f"无法打开帧源: {args.source}")
+    # 等待推理进程加载完模型后再计时
+    while not pipeline.poll() and not pipeline.finished:
+        time.sleep(0.01)
+    start = now()
+    first = pipeline.frames
+    while now() - start < args.duration and not pipeline.finished:
+        pipeline.poll()
+        time.sleep(1 / 60.0)
+    processed = pipeline.frames - first
+    elapsed = now() - start
+    final = pipeline.stop()
+    captured = (final['frames'] + final['skipped']) if final else processed
+    return processed, captured, elapsed
+
+
+def bench_pipeline(args):
+    """对比线程模式和多进程模式下可持续的处理帧率"""
+    results = []
+    for mode, run in (('threads', _run_threaded), ('processes', _run_processes)):
+        processed, captured, elapsed = run(args)
+        results.append({
+            'mode': mode,
+            'backend': args.backend or 'default',
+            'cpus': os.cpu_count(),
+            'processed_fps': round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+            'captured': captured,
+            'processed': processed,
+        })
+
+    print_results(results, args.json)
+    return 0
+
+
+def bench_sessions(args):
+    """多摄像头会话共享推理线程池时，总吞吐量和每个会话的帧率、延迟随摄像头数的变化"""
+    import time
+
+    from core.session_manager import SessionManager
+
+    results = []
+    for cameras in args.cameras:
+        manager = SessionManager(workers=args.workers)
+        for i in range(cameras):
+            manager.add_session(f'camera{i}', source=args.source, backend=args.backend,
+                                target_fps=args.target_fps)
+        manager.start()
+        time.sleep(args.duration)
+        stats = manager.get_stats()
+        manager.stop()
+
+        sessions = stats['sessions']
+        results.append({
+            'cameras': cameras,
+            'workers': args.workers,
+            'total_fps': stats['total_fps'],
+            'min_session_fps': min(session['fps'] for session in sessions),
+            'max_session_fps': max(session['fps'] for session in sessions),
+            'p50_ms': max(session['latency_p50'] for session in sessions),
+            'p95_ms': max(session['latency_p95'] for session in sessions),
+        })
+
+    print_results(results, args.json)
+    return 0
+
+
+def print_results(results, as_json=False):
+    """输出结果表格或JSON"""
+    if as_json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    if not results:
+        return
+    columns = list(results[0].keys())
+    widths = [max(len(str(column)), *(len(str(row[column])) for row in results)) for column in columns]
+    print('  '.join(str(column).ljust(width) for column, width in zip(columns, widths)))
+    for row in results:
+        print('  '.join(str(row[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='俯卧撑计数器性能基准测试')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出结果')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    backends = subparsers.add_parser('backends', help='推理后端对比')
+    backends.add_argument('--source', default='synthetic?realtime=0',
+                          help='帧源描述（见 utils.frame_sources.create_frame_source）')
+    backends.add_argument('--backend', action='append',
+                          help='推理后端描述（见 core.pose_backends.create_pose_backend），可重复')
+    backends.add_argument('--frames', type=int, default=300, help='每个后端处理的帧数')
+    backends.set_defaults(func=bench_backends)
+
+    storage = subparsers.add_parser('storage', help='存储后端写入耗时对比')
+    storage.add_argument('--backend', action='append', help='存储后端（json/sqlite），可重复')
+    storage.add_argument('--history', type=int, nargs='+', default=[0, 1000, 10000, 100000],
+                         help='预置的历史记录数')
+    storage.add_argument('--writes', type=int, default=50, help='每种规模下新增的记录数')
+    storage.add_argument('--background', action='store_true',
+                         help='使用后台写入（耗时为界面线程入队耗时）')
+    storage.set_defaults(func=bench_storage)
+
+    startup = subparsers.add_parser('startup', help='检测器冷启动与预热对比')
+    startup.add_argument('--source', default='synthetic?realtime=0', help='提供测试帧的帧源描述')
+    startup.add_argument('--backend', help='推理后端描述')
+    startup.add_argument('--repeat', type=int, default=3, help='每种模式的重复次数')
+    startup.set_defaults(func=bench_startup)
+
+    pipeline = subparsers.add_parser('pipeline', help='线程模式与多进程模式的处理帧率对比')
+    pipeline.add_argument('--source', default='synthetic?fps=60', help='帧源描述（应为实时帧源）')
+    pipeline.add_argument('--backend', help='推理后端描述')
+    pipeline.add_argument('--size', type=int, nargs=2, default=[640, 480], metavar=('W', 'H'),
+                          help='帧尺寸')
+    pipeline.add_argument('--duration', type=float, default=10.0, help='每种模式的运行时间（秒）')
+    pipeline.set_defaults(func=bench_pipeline)
+
+    sessions = subparsers.add_parser('sessions', help='多摄像头会话共享推理线程池的扩展性')
+    sessions.add_argument('--source', default='synthetic?fps=30', help='每个会话的帧源描述（应为实时帧源）')
+    sessions.add_argument('--backend', help='推理后端描述')
+    sessions.add_argument('--cameras', type=int, nargs='+', default=[1, 2, 4], help='同时运行的会话数')
+    sessions.add_argument('--workers', type=int, default=2, help='推理工作线程数')
+    sessions.add_argument('--target-fps', type=float, default=15, help='每个会话的目标推理帧率')
+    sessions.add_argument('--duration', type=float, default=10.0, help='每种会话数的运行时间（秒）')
+    sessions.set_defaults(func=bench_sessions)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -33,7 +33,7 @@ version = 1.0
 
 # (list) Application requirements
 # comma separated e.g. requirements = sqlite3,kivy
-requirements = python3,kivy,opencv,numpy,pillow,plyer,android
+requirements = python3,kivy,opencv,numpy,pillow,plyer,android,sqlite3
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
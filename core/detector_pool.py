@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态检测器池
+模型只加载一次，训练之间复用同一个PoseDetector，只重置计数状态；登录后可在后台预热
+导入本模块不会加载cv2/mediapipe，PoseDetector在首次创建检测器时才导入（预热时在后台线程中）
+"""
+
+import threading
+
+from kivy.logger import Logger
+
+from utils.latency import now
+
+
+def _create_detector(backend):
+    """创建检测器（延迟导入姿态检测模块）"""
+    from core.pose_detector import PoseDetector
+    return PoseDetector(backend=backend)
+
+
+class DetectorPool:
+    """PoseDetector复用池"""
+
+    def __init__(self, warmup_shape=(480, 640, 3)):
+        """
+        初始化检测器池
+
+        Args:
+            warmup_shape: 预热使用的空白帧尺寸
+        """
+        self.warmup_shape = warmup_shape
+        self._idle = {}
+        self._lock = threading.Lock()
+        self._warmup_thread = None
+        self.last_warmup_time = None
+
+    def acquire(self, callback=None, backend=None):
+        """
+        获取一个检测器（优先复用已加载的）
+
+        Args:
+            callback: 检测结果回调函数
+            backend: 推理后端描述字符串，None为默认后端
+
+        Returns:
+            PoseDetector: 计数已重置的检测器
+        """
+        self._wait_warmup()
+        with self._lock:
+            idle = self._idle.get(backend)
+            detector = idle.pop() if idle else None
+
+        if detector is None:
+            detector = _create_detector(backend)
+            Logger.info("DetectorPool: 新建检测器")
+        detector.reset_counter()
+        detector.frame_count = 0
+        detector.callback = callback
+        return detector
+
+    def release(self, detector, backend=None):
+        """
+        归还检测器，保留已加载的模型供下次使用
+
+        Args:
+            detector: acquire获取的检测器
+            backend: 获取时使用的后端描述字符串
+        """
+        detector.callback = None
+        detector.reset_counter()
+        with self._lock:
+            self._idle.setdefault(backend, []).append(detector)
+
+    def prewarm(self, backend=None, background=True):
+        """
+        预先创建检测器并用空白帧跑一次推理（完成模型加载和图初始化）
+
+        Args:
+            backend: 推理后端描述字符串
+            background: 是否在后台线程中执行
+        """
+        with self._lock:
+            if self._idle.get(backend) or self._warmup_thread is not None:
+                return
+            if background:
+                self._warmup_thread = threading.Thread(
+                    target=self._warmup, args=(backend,), name='DetectorWarmup')
+                self._warmup_thread.daemon = True
+                self._warmup_thread.start()
+                return
+        self._warmup(backend)
+
+    def _warmup(self, backend):
+        start = now()
+        try:
+            import numpy as np
+            detector = _create_detector(backend)
+            interval = detector.process_interval
+            detector.process_interval = 1
+            detector.process_frame(np.zeros(self.warmup_shape, dtype=np.uint8))
+            detector.process_interval = interval
+            self.release(detector, backend)
+            self.last_warmup_time = now() - start
+            Logger.info(f"DetectorPool: 预热完成，耗时 {self.last_warmup_time * 1000:.0f} ms")
+        except Exception as e:
+            Logger.error(f"DetectorPool: 预热失败: {e}")
+        finally:
+            self._warmup_thread = None
+
+    def _wait_warmup(self):
+        """正在预热时等待完成，避免重复加载模型"""
+        thread = self._warmup_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def shutdown(self):
+        """释放所有空闲检测器及其模型（应用退出或后台内存紧张时调用）"""
+        self._wait_warmup()
+        with self._lock:
+            detectors = [detector for idle in self._idle.values() for detector in idle]
+            self._idle = {}
+        for detector in detectors:
+            detector.cleanup()
+
+
+# 全局检测器池
+detector_pool = DetectorPool()
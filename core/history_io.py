@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+训练历史导入导出模块
+以流式方式在存储和CSV / 分块NPZ文件之间转换全部用户的训练记录，任何时候只在内存中保留一个数据块
+"""
+
+import csv
+import json
+import zipfile
+
+import numpy as np
+
+from kivy.logger import Logger
+
+from core.rep_events import REP_COLUMNS, REP_DTYPE, concat_columns, decode_columns, encode_columns
+
+
+CSV_FIELDS = ('type', 'username', 'name', 'password_hash', 'created_at',
+              'date', 'count', 'duration', 'reps')
+USER_FIELDS = ('username', 'name', 'password_hash', 'created_at')
+
+
+def _format_of(path):
+    """根据扩展名判断文件格式"""
+    if path.endswith('.csv'):
+        return 'csv'
+    if path.endswith('.npz'):
+        return 'npz'
+    raise ValueError(f"不支持的文件格式: {path}")
+
+
+def export_history(store, path, chunk_size=10000):
+    """
+    导出全部用户及其训练记录
+
+    Args:
+        store: 用户数据存储（见core.user_store）
+        path: 输出文件路径（.csv 或 .npz）
+        chunk_size: NPZ每个数据块的行数
+
+    Returns:
+        dict: users（用户数）、sessions（记录数）
+    """
+    if _format_of(path) == 'csv':
+        result = _export_csv(store, path)
+    else:
+        result = _export_npz(store, path, chunk_size)
+    Logger.info(f"HistoryIO: 导出 {result['users']} 个用户、{result['sessions']} 条记录到 {path}")
+    return result
+
+
+def import_history(store, path, chunk_size=10000):
+    """
+    导入用户及其训练记录；已存在的用户保留原资料，日期相同的记录视为重复并跳过
+
+    Args:
+        store: 用户数据存储
+        path: 输入文件路径（.csv 或 .npz）
+        chunk_size: 每次批量写入的记录数
+
+    Returns:
+        dict: users（新建用户数）、sessions（导入记录数）、skipped（跳过的重复记录数）
+    """
+    importer = _Importer(store, chunk_size)
+    if _format_of(path) == 'csv':
+        _import_csv(importer, path)
+    else:
+        _import_npz(importer, path)
+    importer.finish()
+    Logger.info(f"HistoryIO: 从 {path} 导入 {importer.users} 个用户、{importer.sessions} 条记录，"
+                f"跳过重复 {importer.skipped} 条")
+    return {'users': importer.users, 'sessions': importer.sessions, 'skipped': importer.skipped}
+
+
+def _export_csv(store, path):
+    """CSV：每个用户一行user，随后是该用户的session行"""
+    users = sessions = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for username, profile in store.iter_users():
+            writer.writerow({'type': 'user', 'username': username, 'name': profile['name'],
+                             'password_hash': profile['password_hash'],
+                             'created_at': profile['created_at']})
+            users += 1
+            for record in store.iter_sessions(username):
+                writer.writerow({
+                    'type': 'session', 'username': username, 'date': record['date'],
+                    'count': record['count'],
+                    'duration': '' if record.get('duration') is None else record['duration'],
+                    'reps': json.dumps(record['reps']) if record.get('reps') else ''
+                })
+                sessions += 1
+    return {'users': users, 'sessions': sessions}
+
+
+def _import_csv(importer, path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            if row['type'] == 'user':
+                importer.add_user(row['username'], {key: row[key] for key in USER_FIELDS[1:]})
+            elif row['type'] == 'session':
+                record = {'count': int(row['count']), 'date': row['date'],
+                          'duration': float(row['duration']) if row['duration'] else None}
+                if row['reps']:
+                    record['reps'] = json.loads(row['reps'])
+                importer.add_session(row['username'], record)
+
+
+class _NpzChunkWriter:
+    """按块把列数据写入NPZ（zip中的.npy成员，名称为 表名/块序号/列名.npy）"""
+
+    def __init__(self, archive, table, chunk_size):
+        self.archive = archive
+        self.table = table
+        self.chunk_size = chunk_size
+        self.chunks = 0
+        self.rows = []
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def write_array(self, column, array):
+        name = f'{self.table}/{self.chunks:05d}/{column}.npy'
+        with self.archive.open(name, 'w', force_zip64=True) as f:
+            np.lib.format.write_array(f, np.asarray(array), allow_pickle=False)
+
+    def flush(self):
+        if not self.rows:
+            return
+        self.write_chunk(self.rows)
+        self.chunks += 1
+        self.rows = []
+
+    def write_chunk(self, rows):
+        for i, column in enumerate(USER_FIELDS):
+            self.write_array(column, np.array([row[i] or '' for row in rows], dtype=str))
+
+
+class _NpzSessionWriter(_NpzChunkWriter):
+    """训练记录块：基本列 + 动作事件列（各记录的事件首尾相接，rep_count给出每条记录的事件数）"""
+
+    def write_chunk(self, rows):
+        self.write_array('username', np.array([username for username, _ in rows], dtype=str))
+        self.write_array('date', np.array([record['date'] for _, record in rows], dtype=str))
+        self.write_array('count', np.array([record['count'] for _, record in rows], dtype=np.int32))
+        self.write_array('duration', np.array(
+            [np.nan if record.get('duration') is None else record['duration'] for _, record in rows],
+            dtype=np.float64))
+
+        reps = [decode_columns(record['reps']) if record.get('reps') else None for _, record in rows]
+        self.write_array('rep_count', np.array(
+            [len(columns['start']) if columns is not None else 0 for columns in reps], dtype=np.int32))
+        merged = concat_columns(columns for columns in reps if columns is not None)
+        for column in REP_COLUMNS:
+            self.write_array(f'rep_{column}', merged[column].astype(REP_DTYPE))
+
+
+def _export_npz(store, path, chunk_size):
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        users = _NpzChunkWriter(archive, 'users', chunk_size)
+        user_count = 0
+        for username, profile in store.iter_users():
+            users.add((username, profile['name'], profile['password_hash'], profile['created_at']))
+            user_count += 1
+        users.flush()
+
+        # 用户资料写完后再逐个用户写记录，导入时总是先建用户
+        sessions = _NpzSessionWriter(archive, 'sessions', chunk_size)
+        session_count = 0
+        for username, _ in store.iter_users():
+            for record in store.iter_sessions(username):
+                sessions.add((username, record))
+                session_count += 1
+        sessions.flush()
+    return {'users': user_count, 'sessions': session_count}
+
+
+def _read_chunks(archive, table):
+    """
+    逐块读取表
+
+    Yields:
+        dict: 列名 -> 数组
+    """
+    chunks = {}
+    for name in archive.namelist():
+        parts = name.split('/')
+        if len(parts) == 3 and parts[0] == table and parts[2].endswith('.npy'):
+            chunks.setdefault(parts[1], []).append(name)
+    for chunk in sorted(chunks):
+        columns = {}
+        for name in chunks[chunk]:
+            with archive.open(name) as f:
+                columns[name.split('/')[2][:-4]] = np.lib.format.read_array(f, allow_pickle=False)
+        yield columns
+
+
+def _import_npz(importer, path):
+    with zipfile.ZipFile(path, 'r') as archive:
+        for columns in _read_chunks(archive, 'users'):
+            for i, username in enumerate(columns['username']):
+                importer.add_user(str(username), {key: str(columns[key][i]) for key in USER_FIELDS[1:]})
+
+        for columns in _read_chunks(archive, 'sessions'):
+            # 事件列按rep_count切分回每条记录
+            offsets = np.concatenate([[0], np.cumsum(columns['rep_count'])])
+            for i, username in enumerate(columns['username']):
+                duration = float(columns['duration'][i])
+                record = {'count': int(columns['count'][i]), 'date': str(columns['date'][i]),
+                          'duration': None if np.isnan(duration) else duration}
+                if columns['rep_count'][i]:
+                    start, end = offsets[i], offsets[i + 1]
+                    record['reps'] = encode_columns(
+                        {column: columns[f'rep_{column}'][start:end] for column in REP_COLUMNS})
+                importer.add_session(str(username), record)
+
+
+class _Importer:
+    """把导入的用户和记录按块写入存储"""
+
+    def __init__(self, store, chunk_size):
+        self.store = store
+        self.chunk_size = chunk_size
+        self.existing = set(username for username, _ in store.iter_users())
+        self.users = 0
+        self.sessions = 0
+        self.skipped = 0
+        self._username = None
+        self._dates = set()
+        self._pending = []
+
+    def add_user(self, username, profile):
+        if username in self.existing:
+            return
+        self.store.create_user(username, {
+            'password_hash': profile['password_hash'],
+            'name': profile.get('name') or '',
+            'created_at': profile['created_at'],
+            'pushup_records': [],
+            'total_pushups': 0,
+            'best_session': 0
+        })
+        self.existing.add(username)
+        self.users += 1
+
+    def add_session(self, username, record):
+        if username != self._username:
+            self._flush()
+            self._username = username
+            self._dates = self.store.session_dates(username) if username in self.existing else None
+        if self._dates is None:
+            # 文件中没有该用户的资料
+            self.skipped += 1
+            return
+        if record['date'] in self._dates:
+            self.skipped += 1
+            return
+        self._dates.add(record['date'])
+        self._pending.append(record)
+        if len(self._pending) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self._pending:
+            self.store.import_records(self._username, self._pending)
+            self.sessions += len(self._pending)
+            self._pending = []
+
+    def finish(self):
+        self._flush()
+        # batch策略下导入的日志追加没有逐条fsync，结束时统一同步到磁盘
+        self.store.sync()
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多人检测与计数模块
+先用人体检测器找出画面中的每个人，再对每个人的裁剪区域做姿态推理，按IoU跟踪身份，
+每个跟踪目标各自计数。
+
+开销控制：人体检测每隔detect_interval帧运行一次，其间按上一帧的关键点移动跟踪框；
+所有人的裁剪区域通过一次process_batch推理。只有输入批次维度为动态的ONNX后端
+（OnnxPoseBackend.supports_batch）才真正一次运行网络，每帧开销随人数的增长低于逐人独立检测；
+MediaPipe等其他后端的process_batch是逐张推理的循环，姿态推理开销随人数线性增长
+
+人体检测器需显式指定：HOG只适合站立的人，俯卧撑等俯卧姿态请使用能检测横向人体的DNN检测器
+"""
+
+import cv2
+import numpy as np
+from kivy.logger import Logger
+
+from core.pose_detector import PoseDetector
+from core.rep_events import RepRecorder
+from utils.config_spec import parse_spec
+from utils.latency import now
+from utils.tracing import tracer
+
+
+# 标记不同跟踪目标的颜色（BGR）
+TRACK_COLORS = ((66, 117, 245), (66, 245, 117), (245, 66, 230), (66, 230, 245), (245, 200, 66), (160, 66, 245))
+
+
+def box_iou(a, b):
+    """计算两个 (x, y, w, h) 框的交并比"""
+    x1 = max(a[0], b[0])
+    y1 = max(a[1], b[1])
+    x2 = min(a[0] + a[2], b[0] + b[2])
+    y2 = min(a[1] + a[3], b[1] + b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class HogPersonDetector:
+    """OpenCV HOG行人检测器（无需模型文件，适合站立姿态，俯卧撑等横向姿态建议使用DNN检测器）"""
+
+    name = 'hog'
+
+    def __init__(self, max_width=400, min_score=0.3, nms_threshold=0.4):
+        """
+        初始化HOG检测器
+
+        Args:
+            max_width: 检测前把帧缩小到该宽度以内
+            min_score: 最小检测分数
+            nms_threshold: 非极大值抑制的IoU阈值
+        """
+        self.max_width = max_width
+        self.min_score = min_score
+        self.nms_threshold = nms_threshold
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+
+    def detect(self, image):
+        """
+        检测画面中的人
+
+        Args:
+            image: BGR图像
+
+        Returns:
+            list: (x, y, w, h) 像素坐标框
+        """
+        height, width = image.shape[:2]
+        scale = min(1.0, self.max_width / width)
+        if scale < 1.0:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)))
+        rects, weights = self.hog.detectMultiScale(image, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(rects) == 0:
+            return []
+        boxes = [[int(v / scale) for v in rect] for rect in rects]
+        scores = [float(w) for w in np.asarray(weights).reshape(-1)]
+        keep = cv2.dnn.NMSBoxes(boxes, scores, self.min_score, self.nms_threshold)
+        return [tuple(boxes[i]) for i in np.asarray(keep).reshape(-1)]
+
+    def describe(self):
+        return self.name
+
+
+class DnnPersonDetector:
+    """OpenCV DNN SSD人体检测器（如MobileNet-SSD，输出 [1, 1, N, 7] 检测结果）"""
+
+    name = 'dnn'
+
+    def __init__(self, model_path, config_path=None, input_size=(300, 300), person_class=15,
+                 min_score=0.5, nms_threshold=0.4):
+        """
+        初始化DNN检测器
+
+        Args:
+            model_path: 模型权重文件
+            config_path: 模型结构文件（Caffe的prototxt，其他格式可为空）
+            input_size: 网络输入尺寸 (宽, 高)
+            person_class: "人"的类别编号（VOC为15，COCO为1）
+            min_score: 最小检测分数
+            nms_threshold: 非极大值抑制的IoU阈值
+        """
+        self.model_path = model_path
+        self.input_size = tuple(input_size)
+        self.person_class = person_class
+        self.min_score = min_score
+        self.nms_threshold = nms_threshold
+        if config_path:
+            self.net = cv2.dnn.readNet(model_path, config_path)
+        else:
+            self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def detect(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(image, 1.0 / 127.5, self.input_size, (127.5, 127.5, 127.5),
+                                     swapRB=False, crop=False)
+        self.net.setInput(blob)
+        detections = self.net.forward().reshape(-1, 7)
+        detections = detections[(detections[:, 1] == self.person_class) & (detections[:, 2] >= self.min_score)]
+        boxes = []
+        for _, _, _, x1, y1, x2, y2 in detections:
+            x1, x2 = np.clip([x1, x2], 0, 1) * width
+            y1, y2 = np.clip([y1, y2], 0, 1) * height
+            boxes.append([int(x1), int(y1), int(x2 - x1), int(y2 - y1)])
+        if not boxes:
+            return []
+        keep = cv2.dnn.NMSBoxes(boxes, detections[:, 2].tolist(), self.min_score, self.nms_threshold)
+        return [tuple(boxes[i]) for i in np.asarray(keep).reshape(-1)]
+
+    def describe(self):
+        return f'{self.name}({self.model_path})'
+
+
+def create_person_detector(spec):
+    """
+    根据描述字符串创建人体检测器
+
+    支持的格式：
+        hog[?max_width=400&min_score=0.3]
+        dnn:<模型文件>[?config=<prototxt>&width=300&height=300&class=15&min_score=0.5]
+
+    Args:
+        spec: 描述字符串，或带detect(image)方法的检测器对象
+
+    Returns:
+        人体检测器
+    """
+    if not isinstance(spec, str):
+        return spec
+
+    scheme, path, options = parse_spec(spec, ('hog', 'dnn'))
+    if scheme == 'hog':
+        detector = HogPersonDetector(max_width=int(options.get('max_width', 400)),
+                                     min_score=float(options.get('min_score', 0.3)))
+    elif scheme == 'dnn':
+        detector = DnnPersonDetector(
+            path, config_path=options.get('config'),
+            input_size=(int(options.get('width', 300)), int(options.get('height', 300))),
+            person_class=int(options.get('class', 15)),
+            min_score=float(options.get('min_score', 0.5)))
+    else:
+        raise ValueError(f"未知的人体检测器: {spec}")
+    Logger.info(f"MultiPersonDetector: 使用人体检测器 {detector.describe()}")
+    return detector
+
+
+class PersonTrack:
+    """跟踪目标：位置框和独立的计数状态（属性与PoseDetector.update_count所需的一致）"""
+
+    def __init__(self, track_id, box):
+        self.track_id = track_id
+        self.box = tuple(box)
+        self.missed = 0
+        self.counter = 0
+        self.stage = None
+        self.rep_recorder = RepRecorder()
+        self.landmarks = None
+        self.arm_angle = 0.0
+        self.leg_angle = 0.0
+        self.center = None
+
+
+class PersonTracker:
+    """按IoU贪心匹配的多目标跟踪器"""
+
+    def __init__(self, iou_threshold=0.3, max_missed=3, max_tracks=6):
+        """
+        初始化跟踪器
+
+        Args:
+            iou_threshold: 检测框与跟踪框匹配的最小IoU
+            max_missed: 连续多少次未匹配到检测框或未检测到姿态后结束跟踪
+            max_tracks: 同时跟踪的最大人数
+        """
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.max_tracks = max_tracks
+        self.tracks = []
+        self.finished = []
+        self._next_id = 1
+
+    def update(self, boxes):
+        """
+        用新的检测结果更新跟踪目标
+
+        Args:
+            boxes: (x, y, w, h) 检测框列表
+
+        Returns:
+            list: 当前跟踪目标
+        """
+        pairs = sorted(((box_iou(track.box, box), t, d)
+                        for t, track in enumerate(self.tracks) for d, box in enumerate(boxes)),
+                       reverse=True)
+        matched_tracks = set()
+        matched_boxes = set()
+        for iou, t, d in pairs:
+            if iou < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_boxes:
+                continue
+            matched_tracks.add(t)
+            matched_boxes.add(d)
+            track = self.tracks[t]
+            track.box = tuple(boxes[d])
+            track.missed = 0
+            track.center = None
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.missed += 1
+        self.prune()
+
+        for d, box in enumerate(boxes):
+            if d not in matched_boxes and len(self.tracks) < self.max_tracks:
+                self.tracks.append(PersonTrack(self._next_id, box))
+                Logger.info(f"MultiPersonDetector: 新跟踪目标 #{self._next_id}")
+                self._next_id += 1
+        return self.tracks
+
+    def prune(self):
+        """结束丢失过久的跟踪目标（保留其计数）"""
+        for track in [track for track in self.tracks if track.missed > self.max_missed]:
+            self.tracks.remove(track)
+            self.finished.append(track)
+            Logger.info(f"MultiPersonDetector: 跟踪目标 #{track.track_id} 结束，计数 {track.counter}")
+
+    def reset(self):
+        """清空所有跟踪目标"""
+        self.tracks = []
+        self.finished = []
+        self._next_id = 1
+
+
+class MultiPersonDetector:
+    """多人俯卧撑检测器：人体检测 + 逐人裁剪的批量姿态推理 + 跟踪 + 每人独立计数"""
+
+    def __init__(self, person_detector, backend=None, detect_interval=5, max_people=6,
+                 crop_margin=0.15, callback=None):
+        """
+        初始化多人检测器
+
+        Args:
+            person_detector: 人体检测器描述字符串或对象（见create_person_detector），
+                             俯卧撑需要能检测俯卧人体的检测器（如 dnn:<模型文件>），HOG只适合站立姿态
+            backend: 姿态推理后端（见create_pose_backend），默认为逐帧独立检测的MediaPipe；
+                     同一个实例依次处理不同人的裁剪区域，MediaPipe不能沿用帧间跟踪。
+                     默认后端不支持批量推理，裁剪区域逐张推理，姿态推理开销随人数线性增长；
+                     人数较多时请使用动态批次的ONNX后端（supports_batch为True）
+            detect_interval: 每隔多少帧运行一次人体检测
+            max_people: 最多同时跟踪的人数
+            crop_margin: 裁剪区域在跟踪框四周的扩展比例
+            callback: 检测结果回调函数，接收(frame, counters)，counters为 跟踪编号 -> 计数
+        """
+        self.pose = PoseDetector(backend=backend or 'mediapipe?static=1')
+        if not self.pose.backend.supports_batch:
+            Logger.warning(f"MultiPersonDetector: 后端 {self.pose.backend.name} 不支持批量推理，"
+                           f"姿态推理开销随人数线性增长")
+        self.person_detector = create_person_detector(person_detector)
+        self.tracker = PersonTracker(max_tracks=max_people)
+        self.detect_interval = detect_interval
+        self.crop_margin = crop_margin
+        self.callback = callback
+        self.frame_count = 0
+        # 开销统计：人体检测次数、姿态推理批次数和推理的人次
+        self.detect_calls = 0
+        self.pose_batches = 0
+        self.pose_crops = 0
+        Logger.info("MultiPersonDetector: 多人检测器初始化完成")
+
+    def process_frame(self, frame, timing=None):
+        """
+        处理单帧图像
+
+        Args:
+            frame: 输入BGR帧
+            timing: 可选的FrameTiming，记录推理开始和结束时间
+
+        Returns:
+            tuple: (绘制后的帧, 是否检测到姿态)
+        """
+        if frame is None:
+            return None, False
+
+        self.frame_count += 1
+        frame_id = timing.frame_id if timing is not None else self.frame_count
+        height, width = frame.shape[:2]
+        if width > self.pose.max_frame_width:
+            scale = self.pose.max_frame_width / width
+            frame = cv2.resize(frame, (self.pose.max_frame_width, int(height * scale)))
+            height, width = frame.shape[:2]
+
+        if timing is not None:
+            timing.inference_start = now()
+        # 没有跟踪目标时每帧都检测，否则按间隔检测
+        missed = set()
+        if not self.tracker.tracks or (self.frame_count - 1) % self.detect_interval == 0:
+            with tracer.span('person_detect', frame_id):
+                self.tracker.update(self.person_detector.detect(frame))
+            self.detect_calls += 1
+            # 未匹配到检测框的跟踪目标本帧已计过一次丢失，未检测到姿态时不再重复计
+            missed = {track.track_id for track in self.tracker.tracks if track.missed}
+
+        tracks = list(self.tracker.tracks)
+        regions = [self._crop_region(track.box, width, height) for track in tracks]
+        # 跟踪框漂移出画面时裁剪区域为空，不做姿态推理，按未检测到姿态处理
+        visible = [i for i, region in enumerate(regions) if region is not None]
+        results = [None] * len(tracks)
+        if visible:
+            with tracer.span('preprocess', frame_id):
+                image = cv2.cvtColor(self.pose.deblur_image(frame), cv2.COLOR_BGR2RGB)
+                image = self.pose.histogram_equalization(image)
+                crops = [np.ascontiguousarray(image[y:y + h, x:x + w])
+                         for x, y, w, h in (regions[i] for i in visible)]
+            with tracer.span('inference', frame_id):
+                batch = self.pose.backend.process_batch(crops)
+            for i, landmarks in zip(visible, batch):
+                results[i] = landmarks
+            self.pose_batches += 1
+            self.pose_crops += len(crops)
+        if timing is not None:
+            timing.inference_end = now()
+
+        timestamp = timing.capture if timing is not None and timing.capture is not None else now()
+        detected = False
+        with tracer.span('counter', frame_id):
+            for track, region, landmarks in zip(tracks, regions, results):
+                if landmarks is None:
+                    track.landmarks = None
+                    if track.track_id not in missed:
+                        track.missed += 1
+                    continue
+                detected = True
+                track.missed = 0
+                track.landmarks = self._to_frame(landmarks, region, width, height)
+                # 按像素坐标计数：归一化坐标按裁剪区域的宽、高分别缩放x、y，
+                # 裁剪区域越宽，角度失真越大
+                track.arm_angle, track.leg_angle = self.pose.update_count(
+                    track.landmarks * (width, height, 1, 1), timestamp, state=track)
+                self._follow(track, width, height)
+            self.tracker.prune()
+
+        with tracer.span('draw', frame_id):
+            self._draw(frame)
+
+        if self.callback:
+            self.callback(frame, self.get_counters())
+        return frame, detected
+
+    def _crop_region(self, box, width, height):
+        """
+        跟踪框四周扩展后裁剪到画面范围内
+
+        Returns:
+            tuple: (x, y, w, h) 裁剪区域，跟踪框完全在画面外时返回None
+        """
+        x, y, w, h = box
+        mx = int(w * self.crop_margin)
+        my = int(h * self.crop_margin)
+        x1 = max(0, int(x) - mx)
+        y1 = max(0, int(y) - my)
+        x2 = min(width, int(x + w) + mx)
+        y2 = min(height, int(y + h) + my)
+        if x2 <= x1 or y2 <= y1:
+            return None
+        return x1, y1, x2 - x1, y2 - y1
+
+    @staticmethod
+    def _to_frame(landmarks, region, width, height):
+        """把裁剪区域内的归一化关键点换算为整帧归一化坐标"""
+        x, y, w, h = region
+        points = landmarks.copy()
+        points[:, 0] = (landmarks[:, 0] * w + x) / width
+        points[:, 1] = (landmarks[:, 1] * h + y) / height
+        return points
+
+    @staticmethod
+    def _follow(track, width, height, min_visibility=0.5):
+        """两次人体检测之间按关键点中心的移动平移跟踪框（框的大小保持检测结果）"""
+        visible = track.landmarks[track.landmarks[:, 3] >= min_visibility]
+        if len(visible) == 0:
+            return
+        center = (float(visible[:, 0].mean()) * width, float(visible[:, 1].mean()) * height)
+        if track.center is not None:
+            x, y, w, h = track.box
+            track.box = (x + center[0] - track.center[0], y + center[1] - track.center[1], w, h)
+        track.center = center
+
+    def _draw(self, image):
+        """绘制每个人的关键点、跟踪框和计数"""
+        for track in self.tracker.tracks:
+            color = TRACK_COLORS[(track.track_id - 1) % len(TRACK_COLORS)]
+            x, y, w, h = (int(v) for v in track.box)
+            cv2.rectangle(image, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(image, f'#{track.track_id}: {track.counter}', (x + 4, max(20, y + 22)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2, cv2.LINE_AA)
+            if track.landmarks is not None:
+                self.pose.draw_landmarks(image, track.landmarks)
+
+    def get_counters(self):
+        """
+        获取每个人的计数（包括已离开画面的跟踪目标）
+
+        Returns:
+            dict: 跟踪编号 -> 计数
+        """
+        return {track.track_id: track.counter for track in self.tracker.finished + self.tracker.tracks}
+
+    def get_rep_events(self):
+        """
+        获取每个人的单次动作事件
+
+        Returns:
+            dict: 跟踪编号 -> 列数据（见core.rep_events.REP_COLUMNS）
+        """
+        return {track.track_id: track.rep_recorder.columns()
+                for track in self.tracker.finished + self.tracker.tracks}
+
+    def reset_counter(self):
+        """清空所有跟踪目标和计数"""
+        self.tracker.reset()
+        self.frame_count = 0
+        Logger.info("MultiPersonDetector: 计数器已重置")
+
+    def cleanup(self):
+        """清理资源"""
+        self.pose.cleanup()
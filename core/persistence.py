@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+后台持久化模块
+在独立线程中按批执行存储写入，界面线程只负责入队，通过Future获取写入结果
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+
+from kivy.logger import Logger
+
+
+class PersistenceWorker:
+    """后台写入线程"""
+
+    # fsync策略：每次写入后、每批写入后、交给操作系统
+    FSYNC_POLICIES = ('always', 'batch', 'never')
+
+    def __init__(self, store, max_queue=256, batch_size=32, fsync_policy='batch'):
+        """
+        初始化后台写入线程
+
+        Args:
+            store: 用户数据存储（见core.user_store），需提供sync()和set_fsync()
+            max_queue: 队列上限，队列满时入队会阻塞，避免无限堆积
+            batch_size: 每批最多连续执行的写入数
+            fsync_policy: 'always'、'batch'（默认）或 'never'
+        """
+        if fsync_policy not in self.FSYNC_POLICIES:
+            raise ValueError(f"未知的fsync策略: {fsync_policy}")
+        self.store = store
+        self.batch_size = batch_size
+        self.fsync_policy = fsync_policy
+        self.store.set_fsync(fsync_policy == 'always')
+
+        # 统计信息
+        self.batches = 0
+        self.writes = 0
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name='Persistence')
+        self._thread.daemon = True
+        self._running = True
+        self._thread.start()
+
+    def submit(self, func, *args):
+        """
+        提交一次写入
+
+        Args:
+            func: 写入函数（如store.add_record）
+            *args: 参数
+
+        Returns:
+            Future: 写入完成（含按策略fsync）后设置结果，失败时设置异常
+        """
+        if not self._running:
+            raise RuntimeError("PersistenceWorker已停止")
+        future = Future()
+        self._queue.put((future, func, args))
+        return future
+
+    def _run(self):
+        """写入线程主循环：取出一批任务依次执行，然后按策略同步到磁盘"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            batch = [item]
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            results = []
+            for future, func, args in batch:
+                try:
+                    results.append((future, func(*args), None))
+                except Exception as e:
+                    Logger.error(f"PersistenceWorker: 写入失败: {e}")
+                    results.append((future, None, e))
+
+            if self.fsync_policy == 'batch':
+                try:
+                    self.store.sync()
+                except Exception as e:
+                    Logger.error(f"PersistenceWorker: 同步到磁盘失败: {e}")
+                    results = [(future, None, error or e) for future, _, error in results]
+
+            # 数据落盘后再通知调用方
+            for future, result, error in results:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+            self.batches += 1
+            self.writes += len(batch)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                self._queue.task_done()
+                break
+
+    def flush(self):
+        """等待已提交的写入全部完成（应用暂停/退出时调用）"""
+        if self._running:
+            self._queue.join()
+
+    def stop(self):
+        """写完剩余任务后停止线程"""
+        if not self._running:
+            return
+        self._running = False
+        self._queue.put(None)
+        self._thread.join()
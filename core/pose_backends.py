@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姿态推理后端模块
+统一MediaPipe Pose、OpenCV DNN、ONNX Runtime和关键点回放等推理后端的接口，
+所有后端输出MediaPipe 33点布局的关键点，供PoseDetector计数和绘制使用
+"""
+
+import json
+import os
+
+import cv2
+import numpy as np
+from kivy.logger import Logger
+
+from utils.config_spec import option_flag, parse_spec
+
+
+# MediaPipe Pose 33点关键点名称（按索引顺序）
+LANDMARK_NAMES = (
+    'NOSE', 'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER', 'RIGHT_EYE_INNER',
+    'RIGHT_EYE', 'RIGHT_EYE_OUTER', 'LEFT_EAR', 'RIGHT_EAR', 'MOUTH_LEFT',
+    'MOUTH_RIGHT', 'LEFT_SHOULDER', 'RIGHT_SHOULDER', 'LEFT_ELBOW', 'RIGHT_ELBOW',
+    'LEFT_WRIST', 'RIGHT_WRIST', 'LEFT_PINKY', 'RIGHT_PINKY', 'LEFT_INDEX',
+    'RIGHT_INDEX', 'LEFT_THUMB', 'RIGHT_THUMB', 'LEFT_HIP', 'RIGHT_HIP',
+    'LEFT_KNEE', 'RIGHT_KNEE', 'LEFT_ANKLE', 'RIGHT_ANKLE', 'LEFT_HEEL',
+    'RIGHT_HEEL', 'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX',
+)
+LANDMARK_INDEX = {name: index for index, name in enumerate(LANDMARK_NAMES)}
+NUM_LANDMARKS = len(LANDMARK_NAMES)
+
+# 关键点连接（与mp.solutions.pose.POSE_CONNECTIONS一致）
+POSE_CONNECTIONS = (
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (11, 23), (12, 14), (12, 24), (13, 15), (14, 16),
+    (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22), (17, 19),
+    (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29),
+    (27, 31), (28, 30), (28, 32), (29, 31), (30, 32),
+)
+
+# COCO 17点（MoveNet等模型）到MediaPipe索引的映射
+COCO17_TO_MEDIAPIPE = (0, 2, 5, 7, 8, 11, 12, 13, 14, 15, 16, 23, 24, 25, 26, 27, 28)
+
+# OpenPose COCO 18点到MediaPipe索引的映射（1号颈部点无对应）
+OPENPOSE18_TO_MEDIAPIPE = (0, None, 12, 14, 16, 11, 13, 15, 24, 26, 28, 23, 25, 27, 5, 2, 8, 7)
+
+
+class PoseBackend:
+    """姿态推理后端基类"""
+
+    name = 'base'
+    # 网络输入尺寸 (宽, 高)，None表示对输入分辨率没有要求（如回放后端）
+    input_size = None
+    # process_batch是否一次运行网络处理整批图像（默认逐张推理）
+    supports_batch = False
+
+    def process(self, image):
+        """
+        对单帧RGB图像进行姿态推理
+
+        Args:
+            image: RGB图像
+
+        Returns:
+            numpy.ndarray: (33, 4) 的 x, y, z, visibility（坐标按宽高归一化），未检测到时返回None
+        """
+        raise NotImplementedError
+
+    def process_batch(self, images):
+        """
+        批量推理（默认逐帧处理，支持批量的后端可覆盖）
+
+        Args:
+            images: RGB图像列表
+
+        Returns:
+            list: 每张图像的关键点或None
+        """
+        return [self.process(image) for image in images]
+
+    def close(self):
+        """释放模型资源"""
+        pass
+
+    def describe(self):
+        """后端描述（用于日志和基准测试报告）"""
+        return self.name
+
+
+class MediaPipePoseBackend(PoseBackend):
+    """MediaPipe Pose 推理后端"""
+
+    name = 'mediapipe'
+    # 姿态关键点模型输入为256x256（人体区域裁剪后缩放）
+    input_size = (256, 256)
+
+    def __init__(self, model_complexity=1, min_detection_confidence=0.5,
+                 min_tracking_confidence=0.5, static_image_mode=False):
+        """
+        初始化MediaPipe Pose
+
+        Args:
+            model_complexity: 模型复杂度，0（lite）/1（full）/2（heavy）
+            min_detection_confidence: 最小检测置信度
+            min_tracking_confidence: 最小跟踪置信度
+            static_image_mode: 是否逐帧独立检测（不使用跟踪）
+        """
+        import mediapipe as mp
+
+        self.model_complexity = model_complexity
+        self.pose = mp.solutions.pose.Pose(
+            static_image_mode=static_image_mode,
+            model_complexity=model_complexity,
+            min_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence
+        )
+
+    def process(self, image):
+        results = self.pose.process(image)
+        if not results.pose_landmarks:
+            return None
+        return np.array([(lm.x, lm.y, lm.z, lm.visibility)
+                         for lm in results.pose_landmarks.landmark], dtype=np.float32)
+
+    def close(self):
+        self.pose.close()
+
+    def describe(self):
+        return f'{self.name}(model_complexity={self.model_complexity})'
+
+
+def _keypoints_to_landmarks(keypoints, mapping):
+    """
+    将其他模型的关键点转换为MediaPipe布局
+
+    Args:
+        keypoints: (N, 3) 的 x, y, score（归一化坐标）
+        mapping: 源关键点索引到MediaPipe索引的映射
+
+    Returns:
+        numpy.ndarray: (33, 4) 关键点
+    """
+    landmarks = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    for source_index, target_index in enumerate(mapping):
+        if target_index is not None and source_index < len(keypoints):
+            x, y, score = keypoints[source_index]
+            landmarks[target_index] = (x, y, 0.0, score)
+    return landmarks
+
+
+class OpenCVDnnPoseBackend(PoseBackend):
+    """OpenCV DNN 推理后端（OpenPose COCO 18点热力图模型，支持Caffe/TensorFlow/ONNX格式）"""
+
+    name = 'opencv_dnn'
+
+    def __init__(self, model_path, config_path=None, input_size=(368, 368),
+                 min_confidence=0.1):
+        """
+        初始化OpenCV DNN模型
+
+        Args:
+            model_path: 模型权重文件
+            config_path: 模型结构文件（Caffe的prototxt，其他格式可为空）
+            input_size: 网络输入尺寸 (宽, 高)
+            min_confidence: 关键点最小置信度，肩肘腕均低于该值时视为未检测到
+        """
+        self.model_path = model_path
+        self.input_size = tuple(input_size)
+        self.min_confidence = min_confidence
+        if config_path:
+            self.net = cv2.dnn.readNet(model_path, config_path)
+        else:
+            self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+
+    def process(self, image):
+        blob = cv2.dnn.blobFromImage(image, 1.0 / 255, self.input_size, (0, 0, 0),
+                                     swapRB=True, crop=False)
+        self.net.setInput(blob)
+        heatmaps = self.net.forward()[0, :len(OPENPOSE18_TO_MEDIAPIPE)]
+        map_height, map_width = heatmaps.shape[1:]
+
+        flat = heatmaps.reshape(len(heatmaps), -1)
+        peaks = flat.argmax(axis=1)
+        keypoints = np.stack([
+            (peaks % map_width + 0.5) / map_width,
+            (peaks // map_width + 0.5) / map_height,
+            flat[np.arange(len(flat)), peaks]
+        ], axis=1)
+
+        landmarks = _keypoints_to_landmarks(keypoints, OPENPOSE18_TO_MEDIAPIPE)
+        arm = landmarks[[LANDMARK_INDEX['LEFT_SHOULDER'], LANDMARK_INDEX['LEFT_ELBOW'],
+                         LANDMARK_INDEX['LEFT_WRIST']], 3]
+        if arm.max() < self.min_confidence:
+            return None
+        return landmarks
+
+    def describe(self):
+        return f'{self.name}({os.path.basename(self.model_path)}, {self.input_size[0]}x{self.input_size[1]})'
+
+
+class OnnxPoseBackend(PoseBackend):
+    """ONNX Runtime CPU 推理后端（MoveNet单人模型，输出 [N, 1, 17, 3] 的 y, x, score）"""
+
+    name = 'onnx'
+
+    def __init__(self, model_path, input_size=None, min_confidence=0.2, num_threads=0):
+        """
+        初始化ONNX Runtime会话
+
+        Args:
+            model_path: ONNX模型文件
+            input_size: 输入尺寸 (宽, 高)，为空时从模型读取
+            min_confidence: 关键点最小置信度，肩肘腕均低于该值时视为未检测到
+            num_threads: 推理线程数，0表示由ONNX Runtime决定
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.model_path = model_path
+        self.session = ort.InferenceSession(model_path, sess_options=options,
+                                            providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_dtype = np.int32 if 'int32' in model_input.type else np.float32
+        if input_size is None:
+            height, width = model_input.shape[1:3]
+            input_size = (width if isinstance(width, int) else 192,
+                          height if isinstance(height, int) else 192)
+        self.input_size = tuple(input_size)
+        # 模型输入的批大小固定为1时只能逐帧推理
+        self.supports_batch = not isinstance(model_input.shape[0], int) or model_input.shape[0] != 1
+        self.min_confidence = min_confidence
+
+    def _prepare(self, image):
+        return cv2.resize(image, self.input_size).astype(self.input_dtype)
+
+    def _decode(self, output):
+        keypoints = output.reshape(-1, 3)[:, [1, 0, 2]]  # y, x, score -> x, y, score
+        landmarks = _keypoints_to_landmarks(keypoints, COCO17_TO_MEDIAPIPE)
+        arm = landmarks[[LANDMARK_INDEX['LEFT_SHOULDER'], LANDMARK_INDEX['LEFT_ELBOW'],
+                         LANDMARK_INDEX['LEFT_WRIST']], 3]
+        if arm.max() < self.min_confidence:
+            return None
+        return landmarks
+
+    def process(self, image):
+        output = self.session.run(None, {self.input_name: self._prepare(image)[np.newaxis]})[0]
+        return self._decode(output[0])
+
+    def process_batch(self, images):
+        if not self.supports_batch or len(images) <= 1:
+            return super().process_batch(images)
+        batch = np.stack([self._prepare(image) for image in images])
+        outputs = self.session.run(None, {self.input_name: batch})[0]
+        return [self._decode(output) for output in outputs]
+
+    def describe(self):
+        return f'{self.name}({os.path.basename(self.model_path)}, {self.input_size[0]}x{self.input_size[1]})'
+
+
+class ReplayPoseBackend(PoseBackend):
+    """关键点回放后端：按帧顺序返回预先录制的关键点，不做实际推理"""
+
+    name = 'replay'
+
+    def __init__(self, path, loop=False):
+        """
+        加载录制的关键点
+
+        Args:
+            path: 录制文件，.jsonl（每行一帧，未检测到为null）或.npz（landmarks数组，未检测到为NaN）
+            loop: 回放结束后是否从头循环
+        """
+        self.path = path
+        self.loop = loop
+        self.index = 0
+        self.frames = load_landmarks(path)
+        Logger.info(f"PoseBackend: 加载回放关键点 {path}，共 {len(self.frames)} 帧")
+
+    def process(self, image):
+        if self.index >= len(self.frames):
+            if not self.loop or not self.frames:
+                return None
+            self.index = 0
+        landmarks = self.frames[self.index]
+        self.index += 1
+        return landmarks
+
+    def describe(self):
+        return f'{self.name}({os.path.basename(self.path)})'
+
+
+class RecordingBackend(PoseBackend):
+    """录制包装：调用内部后端推理，并把每帧关键点追加写入JSONL文件供回放使用"""
+
+    def __init__(self, backend, path):
+        """
+        Args:
+            backend: 实际推理后端
+            path: 录制文件路径（.jsonl）
+        """
+        self.backend = backend
+        self.name = backend.name
+        # 网络输入尺寸影响摄像头采集模式的协商，与内部后端保持一致
+        self.input_size = backend.input_size
+        self.supports_batch = backend.supports_batch
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def process(self, image):
+        landmarks = self.backend.process(image)
+        self._write(landmarks)
+        return landmarks
+
+    def process_batch(self, images):
+        # 交给内部后端批量推理，录制结果按图像顺序逐行写入
+        batch = self.backend.process_batch(images)
+        for landmarks in batch:
+            self._write(landmarks)
+        return batch
+
+    def _write(self, landmarks):
+        self.file.write(json.dumps(None if landmarks is None
+                                   else np.round(landmarks, 5).tolist()) + '\n')
+
+    def close(self):
+        self.file.close()
+        self.backend.close()
+
+    def describe(self):
+        return f'{self.backend.describe()} -> {self.path}'
+
+
+def load_landmarks(path):
+    """
+    读取录制的关键点
+
+    Returns:
+        list: 每帧的 (33, 4) 关键点数组或None
+    """
+    if path.endswith('.npz'):
+        with np.load(path) as data:
+            array = data['landmarks'].astype(np.float32)
+        return [None if np.isnan(frame).any() else frame for frame in array]
+
+    frames = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            value = json.loads(line)
+            frames.append(None if value is None else np.array(value, dtype=np.float32))
+    return frames
+
+
+def save_landmarks(path, frames):
+    """
+    保存关键点序列（格式由扩展名决定，.npz或.jsonl）
+
+    Args:
+        path: 输出路径
+        frames: 每帧的 (33, 4) 关键点数组或None
+    """
+    if path.endswith('.npz'):
+        array = np.full((len(frames), NUM_LANDMARKS, 4), np.nan, dtype=np.float32)
+        for index, frame in enumerate(frames):
+            if frame is not None:
+                array[index] = frame
+        np.savez_compressed(path, landmarks=array)
+        return
+
+    with open(path, 'w', encoding='utf-8') as f:
+        for frame in frames:
+            f.write(json.dumps(None if frame is None else np.round(frame, 5).tolist()) + '\n')
+
+
+def create_pose_backend(spec=None):
+    """
+    根据描述字符串创建推理后端
+
+    支持的格式：
+        mediapipe[?model_complexity=0&static=1]
+        dnn:<模型文件>[?config=<prototxt>&width=368&height=368]
+        onnx:<模型文件>[?width=192&height=192&threads=2]
+        replay:<录制文件>[?loop=1]
+    所有格式都可以加上 record=<路径> 参数，把推理结果录制为回放文件
+
+    Args:
+        spec: 描述字符串或PoseBackend对象，为空时使用MediaPipe
+
+    Returns:
+        PoseBackend: 推理后端
+    """
+    if isinstance(spec, PoseBackend):
+        return spec
+
+    scheme, path, options = parse_spec(spec or 'mediapipe', ('mediapipe', 'dnn', 'onnx', 'replay'))
+
+    def size(default):
+        return (int(options.get('width', default[0])), int(options.get('height', default[1])))
+
+    if scheme == 'mediapipe':
+        backend = MediaPipePoseBackend(
+            model_complexity=int(options.get('model_complexity', 1)),
+            min_detection_confidence=float(options.get('min_detection_confidence', 0.5)),
+            min_tracking_confidence=float(options.get('min_tracking_confidence', 0.5)),
+            static_image_mode=option_flag(options, 'static', False)
+        )
+    elif scheme == 'dnn':
+        backend = OpenCVDnnPoseBackend(path, config_path=options.get('config'),
+                                       input_size=size((368, 368)))
+    elif scheme == 'onnx':
+        backend = OnnxPoseBackend(path,
+                                  input_size=size((192, 192)) if 'width' in options else None,
+                                  num_threads=int(options.get('threads', 0)))
+    elif scheme == 'replay':
+        backend = ReplayPoseBackend(path, loop=option_flag(options, 'loop', False))
+    else:
+        raise ValueError(f"未知的推理后端: {spec}")
+
+    if options.get('record'):
+        backend = RecordingBackend(backend, options['record'])
+
+    Logger.info(f"PoseBackend: 使用推理后端 {backend.describe()}")
+    return backend
@@ -5,36 +5,40 @@
 移植自原项目的sprot2.py，适配移动端使用
 """
 
+import os
 import cv2
-import mediapipe as mp
 import numpy as np
 import threading
 import time
 from kivy.logger import Logger
 from kivy.clock import Clock
 
+from core.pose_backends import LANDMARK_INDEX, POSE_CONNECTIONS, create_pose_backend
+from core.rep_events import RepRecorder
+
+from utils.latency import FrameRateMeter, now
+from utils.tracing import tracer
+
 
 class PoseDetector:
     """俯卧撑姿态检测器"""
     
-    def __init__(self, callback=None):
+    def __init__(self, callback=None, backend=None):
         """
         初始化姿态检测器
         
         Args:
             callback: 检测结果回调函数，接收(frame, counter, stage, arm_angle, leg_angle)
+            backend: 推理后端（PoseBackend对象或描述字符串，见create_pose_backend），
+                     默认读取环境变量PUSHUP_POSE_BACKEND，未设置时使用MediaPipe Pose
         """
-        # MediaPipe初始化
-        self.mp_drawing = mp.solutions.drawing_utils
-        self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        # 推理后端初始化
+        self.backend = create_pose_backend(backend or os.environ.get('PUSHUP_POSE_BACKEND'))
         
         # 计数相关变量
         self.counter = 0
         self.stage = None
+        self.rep_recorder = RepRecorder()
         
         # 角度阈值（移动端优化后的参数）
         self.max_angle = 160      # 完成俯卧撑的最大角度
@@ -44,7 +48,9 @@ class PoseDetector:
         
         # 性能优化参数
         self.process_interval = 3  # 每3帧处理一次（移动端优化）
+        self.max_frame_width = 640  # 超过该宽度的帧先缩小
         self.frame_count = 0
+        self.inference_rate = FrameRateMeter()
         
         # 回调函数
         self.callback = callback
@@ -120,12 +126,27 @@ class PoseDetector:
             Logger.warning(f"PoseDetector: 直方图均衡化失败: {e}")
             return image
     
-    def process_frame(self, frame):
+    def get_capture_requirements(self):
+        """
+        获取对摄像头采集分辨率的要求，供CameraHandler选择采集模式
+        
+        Returns:
+            tuple: (最小宽度, 最小高度)；帧较短边需覆盖网络输入，
+                   宽度超过max_frame_width的部分会被缩小丢弃
+        """
+        input_size = self.backend.input_size
+        if input_size is None:
+            return (0, 0)
+        side = max(input_size)
+        return (min(side, self.max_frame_width), side)
+    
+    def process_frame(self, frame, timing=None):
         """
         处理单帧图像
         
         Args:
             frame: 输入帧
+            timing: 可选的FrameTiming，记录推理开始和结束时间
             
         Returns:
             tuple: (处理后的帧, 是否检测到姿态)
@@ -133,11 +154,13 @@ class PoseDetector:
         if frame is None:
             return None, False
         
+        frame_id = timing.frame_id if timing is not None else self.frame_count + 1
+        
         # 降低分辨率以提高处理速度（移动端优化）
         height, width = frame.shape[:2]
-        if width > 640:
-            scale = 640 / width
-            new_width = 640
+        if width > self.max_frame_width:
+            scale = self.max_frame_width / width
+            new_width = self.max_frame_width
             new_height = int(height * scale)
             frame = cv2.resize(frame, (new_width, new_height))
         
@@ -147,19 +170,26 @@ class PoseDetector:
             return frame, False
         
         try:
-            # 图像预处理（简化版本）
-            processed_frame = self.deblur_image(frame)
-            
-            # BGR转RGB
-            image = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
-            
-            # 直方图均衡化
-            image = self.histogram_equalization(image)
-            
-            image.flags.writeable = False
+            with tracer.span('preprocess', frame_id):
+                # 图像预处理（简化版本）
+                processed_frame = self.deblur_image(frame)
+                
+                # BGR转RGB
+                image = cv2.cvtColor(processed_frame, cv2.COLOR_BGR2RGB)
+                
+                # 直方图均衡化
+                image = self.histogram_equalization(image)
+                
+                image.flags.writeable = False
             
-            # MediaPipe姿态检测
-            results = self.pose.process(image)
+            # 姿态推理
+            with tracer.span('inference', frame_id):
+                if timing is not None:
+                    timing.inference_start = now()
+                landmarks = self.backend.process(image)
+                if timing is not None:
+                    timing.inference_end = now()
+            self.inference_rate.tick()
             
             # 转回BGR
             image.flags.writeable = True
@@ -170,48 +200,20 @@ class PoseDetector:
             arm_angle = 0
             leg_angle = 0
             
-            if results.pose_landmarks:
+            if landmarks is not None:
                 pose_detected = True
-                landmarks = results.pose_landmarks.landmark
                 
-                # 获取关键点坐标
-                shoulder = [landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].x,
-                           landmarks[self.mp_pose.PoseLandmark.LEFT_SHOULDER.value].y]
-                elbow = [landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].x,
-                        landmarks[self.mp_pose.PoseLandmark.LEFT_ELBOW.value].y]
-                wrist = [landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].x,
-                        landmarks[self.mp_pose.PoseLandmark.LEFT_WRIST.value].y]
+                with tracer.span('counter', frame_id):
+                    # 记录单次动作事件（优先使用帧的采集时间）
+                    timestamp = timing.capture if timing is not None and timing.capture is not None else now()
+                    arm_angle, leg_angle = self.update_count(landmarks, timestamp)
                 
-                hip = [landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].x,
-                      landmarks[self.mp_pose.PoseLandmark.LEFT_HIP.value].y]
-                knee = [landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].x,
-                       landmarks[self.mp_pose.PoseLandmark.LEFT_KNEE.value].y]
-                ankle = [landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].x,
-                        landmarks[self.mp_pose.PoseLandmark.LEFT_ANKLE.value].y]
-                
-                # 计算角度
-                arm_angle = self.calculate_angle(shoulder, elbow, wrist)
-                leg_angle = self.calculate_angle(hip, knee, ankle)
-                
-                # 俯卧撑计数逻辑
-                if arm_angle > self.max_angle and leg_angle > 160:
-                    self.stage = "down"
-                    Logger.debug(f"PoseDetector: Down - Arm: {arm_angle:.1f}°, Leg: {leg_angle:.1f}°")
-                
-                if arm_angle < self.min_angle and leg_angle < 180 and self.stage == 'down':
-                    self.stage = "up"
-                    self.counter += 1
-                    Logger.info(f"PoseDetector: Up - Counter: {self.counter}")
-                
-                # 绘制关键点和连接线
-                self.mp_drawing.draw_landmarks(
-                    image, results.pose_landmarks, self.mp_pose.POSE_CONNECTIONS,
-                    self.mp_drawing.DrawingSpec(color=(245, 117, 66), thickness=2, circle_radius=2),
-                    self.mp_drawing.DrawingSpec(color=(245, 66, 230), thickness=2, circle_radius=2)
-                )
-                
-                # 在图像上显示信息
-                self._draw_info(image, arm_angle, leg_angle)
+                with tracer.span('draw', frame_id):
+                    # 绘制关键点和连接线
+                    self.draw_landmarks(image, landmarks)
+                    
+                    # 在图像上显示信息
+                    self._draw_info(image, arm_angle, leg_angle)
             
             # 调用回调函数
             if self.callback:
@@ -223,6 +225,77 @@ class PoseDetector:
             Logger.error(f"PoseDetector: 处理帧时出错: {e}")
             return frame, False
     
+    def update_count(self, landmarks, timestamp, state=None):
+        """
+        根据关键点更新俯卧撑计数
+        
+        Args:
+            landmarks: (33, 4) 关键点
+            timestamp: 帧采集时间
+            state: 保存计数状态的对象（需有counter、stage、rep_recorder属性），
+                   默认为检测器本身；多人模式下每个跟踪目标各有一份
+            
+        Returns:
+            tuple: (手臂角度, 腿部角度)
+        """
+        if state is None:
+            state = self
+        
+        # 获取关键点坐标
+        shoulder = self._point(landmarks, 'LEFT_SHOULDER')
+        elbow = self._point(landmarks, 'LEFT_ELBOW')
+        wrist = self._point(landmarks, 'LEFT_WRIST')
+        
+        hip = self._point(landmarks, 'LEFT_HIP')
+        knee = self._point(landmarks, 'LEFT_KNEE')
+        ankle = self._point(landmarks, 'LEFT_ANKLE')
+        
+        # 计算角度
+        arm_angle = self.calculate_angle(shoulder, elbow, wrist)
+        leg_angle = self.calculate_angle(hip, knee, ankle)
+        
+        # 俯卧撑计数逻辑
+        at_top = arm_angle > self.max_angle and leg_angle > 160
+        if at_top:
+            state.stage = "down"
+            Logger.debug(f"PoseDetector: Down - Arm: {arm_angle:.1f}°, Leg: {leg_angle:.1f}°")
+        
+        counted = False
+        if arm_angle < self.min_angle and leg_angle < 180 and state.stage == 'down':
+            state.stage = "up"
+            state.counter += 1
+            counted = True
+            Logger.info(f"PoseDetector: Up - Counter: {state.counter}")
+        
+        state.rep_recorder.update(timestamp, arm_angle, leg_angle, at_top, counted)
+        return arm_angle, leg_angle
+    
+    @staticmethod
+    def _point(landmarks, name):
+        """获取关键点的 [x, y] 坐标"""
+        landmark = landmarks[LANDMARK_INDEX[name]]
+        return [landmark[0], landmark[1]]
+    
+    def draw_landmarks(self, image, landmarks, min_visibility=0.5):
+        """
+        绘制关键点和连接线
+        
+        Args:
+            image: BGR图像（原地绘制）
+            landmarks: (33, 4) 关键点
+            min_visibility: 低于该可见度的关键点不绘制
+        """
+        height, width = image.shape[:2]
+        visible = landmarks[:, 3] >= min_visibility
+        points = [(int(x * width), int(y * height)) for x, y in landmarks[:, :2]]
+        
+        for start, end in POSE_CONNECTIONS:
+            if visible[start] and visible[end]:
+                cv2.line(image, points[start], points[end], (245, 66, 230), 2)
+        for index, point in enumerate(points):
+            if visible[index]:
+                cv2.circle(image, point, 2, (245, 117, 66), 2)
+    
     def _draw_info(self, image, arm_angle, leg_angle):
         """在图像上绘制信息"""
         height, width = image.shape[:2]
@@ -253,6 +326,7 @@ class PoseDetector:
         """重置计数器"""
         self.counter = 0
         self.stage = None
+        self.rep_recorder.reset()
         Logger.info("PoseDetector: 计数器已重置")
     
     def get_counter(self):
@@ -263,8 +337,38 @@ class PoseDetector:
         """获取当前阶段"""
         return self.stage
     
+    def get_rep_events(self):
+        """
+        获取本次训练每个俯卧撑的事件
+        
+        Returns:
+            dict: 列名 -> float32数组（见core.rep_events.REP_COLUMNS）
+        """
+        return self.rep_recorder.columns()
+    
+    def snapshot_state(self):
+        """
+        保存计数状态（应用切到后台、模型可能被释放时调用）
+        
+        Returns:
+            dict: counter、stage、reps（见RepRecorder.snapshot）
+        """
+        return {'counter': self.counter, 'stage': self.stage, 'reps': self.rep_recorder.snapshot()}
+    
+    def restore_state(self, state):
+        """
+        恢复snapshot_state保存的计数状态
+        
+        Args:
+            state: snapshot_state的返回值
+        """
+        self.counter = state['counter']
+        self.stage = state['stage']
+        self.rep_recorder.restore(state['reps'])
+        Logger.info(f"PoseDetector: 恢复计数 {self.counter}")
+    
     def cleanup(self):
         """清理资源"""
-        if hasattr(self, 'pose'):
-            self.pose.close()
+        if hasattr(self, 'backend'):
+            self.backend.close()
         Logger.info("PoseDetector: 资源已清理")
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多进程检测流水线
+采集和推理分别运行在独立进程中，不再与界面线程争用GIL：
+采集进程把帧写入共享内存环形缓冲区，推理进程取最新帧检测并把绘制后的帧写入另一个缓冲区，
+只有计数、角度和时间戳等小消息经队列传给界面进程，重置计数、切换摄像头等控制命令经命令队列发给子进程
+"""
+
+import multiprocessing
+import queue
+import time
+from collections import deque
+
+import cv2
+from kivy.logger import Logger
+
+from utils.latency import FrameRateMeter, FrameTiming, now
+from utils.shared_frames import SharedFrameRing
+
+
+def _next_command(commands):
+    """取出一条控制命令，没有时返回None"""
+    try:
+        return commands.get_nowait()
+    except queue.Empty:
+        return None
+
+
+def _switch_camera(cap, camera_index):
+    """
+    打开另一个摄像头替换当前摄像头，打不开时保留原摄像头
+
+    Returns:
+        tuple: (摄像头, 摄像头索引)
+    """
+    new_index = 1 - camera_index
+    new_cap = cv2.VideoCapture(new_index)
+    if not new_cap.isOpened():
+        new_cap.release()
+        Logger.warning(f"ProcessPipeline: 无法打开摄像头 {new_index}，继续使用摄像头 {camera_index}")
+        return cap, camera_index
+    cap.release()
+    Logger.info(f"ProcessPipeline: 切换到摄像头 {new_index}")
+    return new_cap, new_index
+
+
+def _capture_main(source, camera_index, ring, fps, opened, commands, ready_event, stop_event, done_event):
+    """采集进程：读取帧源或摄像头，缩放到缓冲区尺寸后写入共享内存"""
+    # 先打开帧源（与推理进程加载模型并行），通过opened把结果告诉父进程
+    cap = None
+    try:
+        if source is not None:
+            from utils.frame_sources import create_frame_source
+            cap = create_frame_source(source)
+            cap.open()
+            interval = 1.0 / (cap.fps or fps) if cap.realtime else 0
+        else:
+            cap = cv2.VideoCapture(camera_index)
+            interval = 0  # 摄像头读取本身按帧率阻塞
+        is_opened = cap.isOpened()
+    except Exception as e:
+        Logger.error(f"ProcessPipeline: 采集进程打开帧源失败: {e}")
+        is_opened = False
+    opened.send(is_opened)
+    opened.close()
+    height, width = ring.shape[:2]
+
+    try:
+        if not is_opened:
+            return
+        # 等推理进程加载完模型再开始采集，避免启动期间的帧全部被跳过
+        while not ready_event.wait(0.1):
+            if stop_event.is_set():
+                return
+
+        next_time = now()
+        while not stop_event.is_set() and cap.isOpened():
+            command = _next_command(commands)
+            if command == 'switch' and source is None:
+                cap, camera_index = _switch_camera(cap, camera_index)
+            ret, frame = cap.read()
+            capture_time = now()
+            if not ret:
+                if getattr(cap, 'exhausted', False) or source is None:
+                    break
+                continue
+            if frame.shape != ring.shape:
+                frame = cv2.resize(frame, (width, height))
+            ring.write(frame, capture_time)
+
+            if interval:
+                next_time += interval
+                delay = next_time - now()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        if cap is not None:
+            cap.release()
+        done_event.set()
+        # 唤醒等待新帧的推理进程
+        with ring.condition:
+            ring.condition.notify_all()
+
+
+def _inference_main(backend, capture_ring, display_ring, results, commands, ready_event, stop_event, done_event):
+    """推理进程：总是处理最新一帧，结果帧写入共享内存，计数等信息放入消息队列"""
+    from core.pose_detector import PoseDetector
+
+    detector = PoseDetector(backend=backend)
+    detector.process_interval = 1
+    ready_event.set()
+    state = {}
+    detector.callback = lambda image, counter, stage, arm_angle, leg_angle: state.update(
+        counter=counter, stage=stage, arm_angle=float(arm_angle), leg_angle=float(leg_angle))
+
+    last = 0
+    frames = 0
+    skipped = 0
+    resets = 0
+    buffer = None
+    while not stop_event.is_set():
+        if _next_command(commands) == 'reset':
+            detector.reset_counter()
+            resets += 1
+        if not capture_ring.wait(last, timeout=0.1):
+            if done_event.is_set() and capture_ring.latest <= last:
+                break
+            continue
+        seq, capture_time, buffer = capture_ring.read_latest(last, out=buffer)
+        skipped += seq - last - 1
+        last = seq
+
+        timing = FrameTiming(seq, capture_time)
+        image, detected = detector.process_frame(buffer, timing=timing)
+        if image.shape != display_ring.shape:
+            image = cv2.resize(image, (display_ring.shape[1], display_ring.shape[0]))
+        display_ring.write(image, capture_time)
+        frames += 1
+
+        message = {
+            'type': 'frame', 'seq': seq, 'capture': capture_time,
+            'inference_start': timing.inference_start, 'inference_end': timing.inference_end,
+            'detected': detected, 'counter': detector.counter, 'stage': detector.stage,
+            'arm_angle': state.get('arm_angle', 0.0), 'leg_angle': state.get('leg_angle', 0.0),
+            'skipped': skipped, 'resets': resets
+        }
+        try:
+            results.put_nowait(message)
+        except queue.Full:
+            pass  # 界面来不及处理时丢弃中间结果，最新计数随下一条消息送达
+
+    results.put({'type': 'final', 'counter': detector.counter, 'frames': frames,
+                 'skipped': skipped, 'reps': detector.get_rep_events()})
+    detector.cleanup()
+
+
+class ProcessPipeline:
+    """采集进程 + 推理进程 + 界面进程的检测流水线"""
+
+    def __init__(self, source=None, camera_index=0, backend=None, frame_size=(640, 480),
+                 fps=30, slots=4, start_method='spawn'):
+        """
+        初始化流水线
+
+        Args:
+            source: 帧源描述字符串（见create_frame_source），为空时使用摄像头
+            camera_index: 摄像头索引
+            backend: 推理后端描述字符串（对象无法传给子进程）
+            frame_size: 共享内存中帧的尺寸 (宽, 高)，采集的帧缩放到该尺寸
+            fps: 帧源未指定帧率时的目标帧率
+            slots: 每个环形缓冲区的槽位数
+            start_method: 子进程启动方式，默认spawn（已创建窗口/GL上下文的进程不宜fork）
+        """
+        self.source = source
+        self.camera_index = camera_index
+        self.backend = backend
+        self.shape = (frame_size[1], frame_size[0], 3)
+        self.fps = fps
+        self.slots = slots
+        self.context = multiprocessing.get_context(start_method)
+
+        self.capture_ring = None
+        self.display_ring = None
+        self.final = None
+        self.frames = 0
+        self._processes = []
+        self._display_buffer = None
+        self._display_seq = 0
+        # 界面进程按收到的帧消息统计推理帧率和采集帧率（供性能浮层显示）
+        self.inference_rate = FrameRateMeter()
+        self._captures = deque()
+        self._skipped = 0
+        self._resets = 0
+
+    def start(self, open_timeout=10.0):
+        """
+        启动采集和推理进程，等待采集进程打开帧源
+
+        Args:
+            open_timeout: 等待采集进程报告打开结果的最长时间（秒）
+
+        Returns:
+            bool: 帧源是否打开成功，失败时流水线已停止
+        """
+        ctx = self.context
+        self.capture_ring = SharedFrameRing(self.shape, self.slots, condition=ctx.Condition())
+        self.display_ring = SharedFrameRing(self.shape, self.slots, condition=ctx.Condition())
+        self._results = ctx.Queue(maxsize=64)
+        self._capture_commands = ctx.Queue()
+        self._inference_commands = ctx.Queue()
+        # 同步对象需在父进程中保持引用，直到子进程完成连接（spawn方式按名称重新打开信号量）
+        self._ready_event = ctx.Event()
+        self._stop_event = ctx.Event()
+        self._done_event = ctx.Event()
+        opened_reader, opened_writer = ctx.Pipe(duplex=False)
+        self.final = None
+        self.frames = 0
+        self._display_seq = 0
+        self.inference_rate.reset()
+        self._captures.clear()
+        self._skipped = 0
+        self._resets = 0
+
+        self._processes = [
+            ctx.Process(target=_capture_main, name='PipelineCapture',
+                        args=(self.source, self.camera_index, self.capture_ring, self.fps, opened_writer,
+                              self._capture_commands, self._ready_event, self._stop_event, self._done_event)),
+            ctx.Process(target=_inference_main, name='PipelineInference',
+                        args=(self.backend, self.capture_ring, self.display_ring, self._results,
+                              self._inference_commands, self._ready_event, self._stop_event, self._done_event)),
+        ]
+        for process in self._processes:
+            process.daemon = True
+            process.start()
+        # 关闭父进程中的写端，采集进程未报告就退出时读端得到EOF
+        opened_writer.close()
+        try:
+            opened = opened_reader.poll(open_timeout) and opened_reader.recv()
+        except EOFError:
+            opened = False
+        finally:
+            opened_reader.close()
+        if not opened:
+            Logger.error("ProcessPipeline: 采集进程无法打开帧源")
+            self.stop()
+            return False
+        Logger.info(f"ProcessPipeline: 启动采集和推理进程，帧尺寸 {self.shape[1]}x{self.shape[0]}")
+        return True
+
+    @property
+    def finished(self):
+        """推理进程是否已结束（帧源播放完毕或已停止）"""
+        return self.final is not None
+
+    def poll(self):
+        """
+        取出推理进程发来的消息（界面线程定时调用，不阻塞）
+
+        Returns:
+            list: 帧消息字典，见_inference_main
+        """
+        messages = []
+        while True:
+            try:
+                message = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if message['type'] == 'final':
+                self.final = message
+            elif message['resets'] >= self._resets:
+                # 丢弃重置命令生效前发出的消息，避免旧计数覆盖已清零的计数
+                messages.append(message)
+                self.inference_rate.tick()
+                self._captures.append((message['capture'], message['seq']))
+                self._skipped = message['skipped']
+        self.frames += len(messages)
+        return messages
+
+    def reset_counter(self):
+        """让推理进程清零计数（计数状态在推理进程中）"""
+        if self._processes:
+            self._inference_commands.put('reset')
+            self._resets += 1
+            Logger.info("ProcessPipeline: 重置计数")
+
+    def switch_camera(self):
+        """
+        让采集进程切换前后摄像头
+
+        Returns:
+            bool: 是否已发出切换命令，使用帧源或流水线未运行时返回False
+        """
+        if self.source is not None or not self._processes:
+            Logger.info("ProcessPipeline: 使用帧源时不支持切换摄像头")
+            return False
+        self._capture_commands.put('switch')
+        return True
+
+    def get_stats(self):
+        """
+        获取流水线统计（由推理进程发来的帧消息计算）
+
+        Returns:
+            dict: 采集帧率、推理帧率、跳过的帧数和帧尺寸
+        """
+        # 按帧消息中的采集序号和采集时间估算采集帧率（两个进程共用单调时钟）
+        while len(self._captures) > 1 and self._captures[-1][0] - self._captures[0][0] > 1.0:
+            self._captures.popleft()
+        capture_fps = 0.0
+        if len(self._captures) > 1:
+            (first_time, first_seq), (last_time, last_seq) = self._captures[0], self._captures[-1]
+            if last_time > first_time:
+                capture_fps = (last_seq - first_seq) / (last_time - first_time)
+        return {
+            'capture_fps': capture_fps,
+            'inference_fps': self.inference_rate.rate(),
+            'skipped': self._skipped,
+            'resolution': (self.shape[1], self.shape[0])
+        }
+
+    def read_display(self):
+        """
+        读取最新的结果帧（复用同一个缓冲区）
+
+        Returns:
+            tuple: (序号, 采集时间, 帧)，没有新帧时返回None
+        """
+        result = self.display_ring.read_latest(self._display_seq, out=self._display_buffer)
+        if result is not None:
+            self._display_seq, _, self._display_buffer = result
+        return result
+
+    @staticmethod
+    def timing_from_message(message):
+        """把帧消息转换为FrameTiming（显示时间由界面在显示后填写）"""
+        timing = FrameTiming(message['seq'], message['capture'])
+        timing.inference_start = message['inference_start']
+        timing.inference_end = message['inference_end']
+        return timing
+
+    def stop(self, timeout=5.0):
+        """
+        停止流水线并释放共享内存
+
+        Returns:
+            dict: 推理进程的最终状态（counter、frames、skipped、reps），未收到时返回None
+        """
+        if not self._processes:
+            return self.final
+        self._stop_event.set()
+        deadline = now() + timeout
+        while self.final is None and now() < deadline:
+            try:
+                message = self._results.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if message['type'] == 'final':
+                self.final = message
+        for process in self._processes:
+            process.join(max(0.0, deadline - now()))
+            if process.is_alive():
+                Logger.warning(f"ProcessPipeline: {process.name} 未退出，强制结束")
+                process.terminate()
+        self._processes = []
+        self._results.close()
+        self._capture_commands.close()
+        self._inference_commands.close()
+        self.capture_ring.close()
+        self.display_ring.close()
+        Logger.info("ProcessPipeline: 已停止")
+        return self.final
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+单次动作事件模块
+记录每个俯卧撑的起止时间和动作指标，按列（float32数组）存储，统计时使用NumPy向量化计算
+"""
+
+import base64
+
+import numpy as np
+
+
+# 列：动作开始时间、回到顶部的时间（相对训练开始，秒）、最小手臂角度、最低点时的腿部角度
+REP_COLUMNS = ('start', 'end', 'min_arm_angle', 'leg_angle')
+REP_DTYPE = np.dtype('<f4')
+
+
+def empty_columns():
+    """创建空的列数据"""
+    return {name: np.zeros(0, dtype=REP_DTYPE) for name in REP_COLUMNS}
+
+
+def columns_to_bytes(columns):
+    """
+    把列数据转换为字节串（SQLite BLOB）
+
+    Args:
+        columns: 列名 -> 数组
+
+    Returns:
+        dict: 列名 -> 小端float32字节串
+    """
+    return {name: np.asarray(columns[name], dtype=REP_DTYPE).tobytes() for name in REP_COLUMNS}
+
+
+def columns_from_bytes(blobs):
+    """把字节串还原为列数据"""
+    return {name: np.frombuffer(blobs[name], dtype=REP_DTYPE) for name in REP_COLUMNS}
+
+
+def encode_columns(columns):
+    """
+    把列数据编码为base64字符串（JSON存储）
+
+    Returns:
+        dict: 列名 -> base64字符串
+    """
+    return {name: base64.b64encode(blob).decode('ascii')
+            for name, blob in columns_to_bytes(columns).items()}
+
+
+def decode_columns(encoded):
+    """把base64字符串还原为列数据"""
+    return columns_from_bytes({name: base64.b64decode(encoded[name]) for name in REP_COLUMNS})
+
+
+def concat_columns(column_list):
+    """
+    合并多次训练的列数据
+
+    Args:
+        column_list: 列数据列表
+
+    Returns:
+        dict: 合并后的列数据
+    """
+    column_list = list(column_list)
+    if not column_list:
+        return empty_columns()
+    return {name: np.concatenate([columns[name] for columns in column_list]) for name in REP_COLUMNS}
+
+
+def summarize_reps(columns):
+    """
+    计算动作统计（向量化）
+
+    Args:
+        columns: 列数据
+
+    Returns:
+        dict: reps（次数）、mean_tempo/median_tempo（单次从顶部下落到回到顶部的平均/中位耗时，秒）、
+              mean_min_arm_angle（平均最低手臂角度）、mean_leg_angle（最低点腿部平均角度）
+    """
+    tempo = columns['end'] - columns['start']
+    count = int(tempo.size)
+    if not count:
+        return {'reps': 0, 'mean_tempo': 0.0, 'median_tempo': 0.0,
+                'mean_min_arm_angle': 0.0, 'mean_leg_angle': 0.0}
+    return {
+        'reps': count,
+        'mean_tempo': round(float(tempo.mean()), 3),
+        'median_tempo': round(float(np.median(tempo)), 3),
+        'mean_min_arm_angle': round(float(columns['min_arm_angle'].mean()), 1),
+        'mean_leg_angle': round(float(columns['leg_angle'].mean()), 1),
+    }
+
+
+class RepRecorder:
+    """在检测过程中记录每个俯卧撑的事件"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """清空记录（开始新的训练）"""
+        self.origin = None
+        self._rows = []
+        self._start = None
+        self._min_arm = None
+        self._leg = None
+        self._counted = False
+        self._last = None
+        self._resume_offset = 0.0
+        self._in_progress = None
+
+    def update(self, timestamp, arm_angle, leg_angle, at_top, counted):
+        """
+        处理一帧的角度
+
+        Args:
+            timestamp: 帧时间（秒，单调时钟）
+            arm_angle: 手臂角度
+            leg_angle: 腿部角度
+            at_top: 手臂伸直（处于顶部）
+            counted: 该帧完成一次计数
+        """
+        if self.origin is None:
+            # 恢复的训练从暂停时的相对时间继续，后台期间不计入
+            self.origin = timestamp - self._resume_offset
+            if self._in_progress is not None:
+                # 暂停时进行中的动作接着记录
+                start, self._min_arm, self._leg = self._in_progress
+                self._start = self.origin + start
+                self._in_progress = None
+        self._last = timestamp
+        if at_top:
+            # 计数后回到顶部时动作结束；最后一次处于顶部的时间作为下一次动作开始
+            if self._counted:
+                self._rows.append(self._pending_row(timestamp))
+            self._start = timestamp
+            self._min_arm = None
+            self._counted = False
+            return
+        if self._start is None:
+            return
+
+        # 计数后继续跟踪最低点，直到回到顶部
+        if self._min_arm is None or arm_angle < self._min_arm:
+            self._min_arm = arm_angle
+            self._leg = leg_angle
+        if counted:
+            self._counted = True
+
+    def _pending_row(self, end):
+        """已计数但尚未回到顶部的动作，以end为结束时间"""
+        return (self._start - self.origin, end - self.origin, self._min_arm, self._leg)
+
+    def _completed_rows(self):
+        """全部已计数的动作（最后一次未回到顶部时以最后一帧为结束）"""
+        if self._counted:
+            return self._rows + [self._pending_row(self._last)]
+        return self._rows
+
+    def __len__(self):
+        return len(self._rows) + self._counted
+
+    def snapshot(self):
+        """
+        保存已计数的事件和进行中的动作（应用切到后台时调用）
+
+        Returns:
+            dict: rows（事件行）、elapsed（最后一帧的相对时间，秒）、
+                  in_progress（已开始但未计数的动作的相对开始时间、最小手臂角度和腿部角度，没有时为None）
+        """
+        if self.origin is None:
+            # 恢复后还没有新的帧
+            return {'rows': list(self._rows), 'elapsed': self._resume_offset,
+                    'in_progress': self._in_progress}
+        in_progress = None
+        if self._start is not None and not self._counted:
+            in_progress = (self._start - self.origin, self._min_arm, self._leg)
+        return {'rows': list(self._completed_rows()), 'elapsed': self._last - self.origin,
+                'in_progress': in_progress}
+
+    def restore(self, state):
+        """
+        恢复snapshot保存的事件，之后的帧时间接在elapsed之后
+
+        Args:
+            state: snapshot的返回值
+        """
+        self.reset()
+        self._rows = list(state['rows'])
+        self._resume_offset = state['elapsed']
+        self._in_progress = state.get('in_progress')
+
+    def columns(self):
+        """
+        获取已记录的事件
+
+        Returns:
+            dict: 列名 -> float32数组
+        """
+        rows = self._completed_rows()
+        if not rows:
+            return empty_columns()
+        table = np.asarray(rows, dtype=REP_DTYPE)
+        return {name: np.ascontiguousarray(table[:, i]) for i, name in enumerate(REP_COLUMNS)}
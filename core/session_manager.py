@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多摄像头会话管理
+一台设备同时为多名运动员计数：每个会话有自己的CameraHandler和PoseDetector（独立计数），
+所有会话的推理由固定大小的工作线程池执行，调度线程按轮转顺序为各会话分配推理，
+并按每个会话的目标帧率限速。
+
+推理总需求（各会话目标帧率之和 x 单帧推理耗时）不超过工作线程数时，每个会话都能达到目标帧率；
+超过时各会话按轮转平分推理能力，延迟随会话数线性增长，而不会出现个别会话饿死
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.logger import Logger
+
+from core.detector_pool import detector_pool
+from utils.camera_handler import CameraHandler
+from utils.latency import FrameRateMeter, FrameTiming, LatencyMonitor, now
+
+
+class CameraSession:
+    """单个摄像头会话：采集、检测器、计数和统计"""
+
+    def __init__(self, session_id, source=None, camera_index=0, backend=None, target_fps=15,
+                 callback=None, frame_event=None):
+        """
+        初始化会话
+
+        Args:
+            session_id: 会话标识
+            source: 帧源描述字符串或FrameSource，为空时使用摄像头
+            camera_index: 摄像头索引
+            backend: 推理后端描述字符串
+            target_fps: 目标推理帧率
+            callback: 每帧检测完成后的回调，接收(session, image, detected)，在工作线程中调用
+            frame_event: 采集到新帧时set的threading.Event（唤醒调度线程）
+        """
+        self.session_id = session_id
+        self.backend = backend
+        self.target_fps = target_fps
+        self.callback = callback
+        self.camera = CameraHandler(camera_index=camera_index, source=source)
+        self.camera.set_frame_event(frame_event)
+        self.detector = None
+        self.final_counter = 0
+        self.latency = LatencyMonitor()
+        self.inference_rate = FrameRateMeter(window=2.0)
+        self.processed = 0
+        self.skipped = 0
+        self.last_frame_id = 0
+        self.next_due = 0.0
+        self.in_flight = False
+        self.closing = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._process_interval = None
+
+    def start(self):
+        """获取检测器并开始采集"""
+        self.detector = detector_pool.acquire(backend=self.backend)
+        # 帧率由调度器控制，采集到的帧不再按间隔跳过
+        self._process_interval = self.detector.process_interval
+        self.detector.process_interval = 1
+        if not self.camera.start_capture():
+            self._release_detector()
+            return False
+        self.next_due = now()
+        return True
+
+    def stop(self):
+        """停止采集，等待正在进行的推理完成后归还检测器"""
+        self.closing = True
+        self.camera.stop_capture()
+        self._idle.wait()
+        self._release_detector()
+
+    def _release_detector(self):
+        if self.detector is not None:
+            # 归还后检测器计数被重置，保留最终计数供移除会话后读取
+            self.final_counter = self.detector.counter
+            self.detector.process_interval = self._process_interval
+            detector_pool.release(self.detector, self.backend)
+            self.detector = None
+
+    @property
+    def counter(self):
+        """当前计数"""
+        detector = self.detector
+        return detector.counter if detector is not None else self.final_counter
+
+    @property
+    def finished(self):
+        """帧源已播放完毕且最后一帧已处理"""
+        latest = self.camera.latest_capture
+        return (not self.camera.is_running and not self.in_flight
+                and (latest is None or latest[1].frame_id <= self.last_frame_id))
+
+    def has_new_frame(self):
+        """是否有尚未处理的新帧"""
+        latest = self.camera.latest_capture
+        return latest is not None and latest[1].frame_id > self.last_frame_id
+
+    def is_ready(self, t):
+        """是否可以调度下一帧：没有进行中的推理、有新帧且已到目标帧率的时间点"""
+        if self.in_flight or self.closing or t < self.next_due:
+            return False
+        return self.has_new_frame()
+
+    def claim(self, t):
+        """
+        取出最新一帧准备推理
+
+        Returns:
+            tuple: (帧, FrameTiming)
+        """
+        frame, captured = self.camera.latest_capture
+        self.skipped += max(0, captured.frame_id - self.last_frame_id - 1)
+        self.last_frame_id = captured.frame_id
+        # 落后超过一个间隔时从当前时间重新开始，不补跑错过的帧
+        self.next_due = max(self.next_due + 1.0 / self.target_fps, t)
+        self.in_flight = True
+        self._idle.clear()
+        timing = FrameTiming(captured.frame_id, captured.capture)
+        timing.dispatch = t
+        return frame, timing
+
+    def cancel(self):
+        """放弃已取出但未能提交的帧"""
+        self.in_flight = False
+        self._idle.set()
+
+    def run(self, frame, timing):
+        """在工作线程中执行推理并记录统计"""
+        try:
+            image, detected = self.detector.process_frame(frame, timing=timing)
+            if self.callback:
+                self.callback(self, image, detected)
+            timing.display = now()
+            self.latency.record(timing)
+            self.inference_rate.tick(timing.display)
+            self.processed += 1
+        finally:
+            self.cancel()
+
+    def get_stats(self):
+        """
+        获取会话统计
+
+        Returns:
+            dict: 计数、推理帧率、处理/跳过帧数和端到端延迟
+        """
+        latency = self.latency.summary(recent=True)['glass_to_glass']
+        return {
+            'session': self.session_id,
+            'counter': self.counter,
+            'fps': round(self.inference_rate.rate(), 1),
+            'target_fps': self.target_fps,
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'latency_p50': latency['p50'],
+            'latency_p95': latency['p95'],
+        }
+
+
+class SessionManager:
+    """多会话推理调度器"""
+
+    def __init__(self, workers=2):
+        """
+        初始化调度器
+
+        Args:
+            workers: 推理工作线程数（同时进行的推理数上限）
+        """
+        self.workers = workers
+        self.sessions = []
+        self.is_running = False
+        self._lock = threading.Lock()
+        self._cursor = 0
+        self._slots = threading.Semaphore(workers)
+        self._wakeup = threading.Event()
+        self._executor = None
+        self._dispatch_thread = None
+
+    def add_session(self, session_id, source=None, camera_index=0, backend=None, target_fps=15,
+                    callback=None):
+        """
+        添加并启动一个会话（调度器运行中也可添加）
+
+        Args:
+            见CameraSession
+
+        Returns:
+            CameraSession: 新会话，采集启动失败时返回None
+        """
+        if self.get_session(session_id) is not None:
+            raise ValueError(f"会话已存在: {session_id}")
+        session = CameraSession(session_id, source=source, camera_index=camera_index,
+                                backend=backend, target_fps=target_fps, callback=callback,
+                                frame_event=self._wakeup)
+        if not session.start():
+            Logger.error(f"SessionManager: 会话 {session_id} 启动失败")
+            return None
+        with self._lock:
+            self.sessions.append(session)
+        Logger.info(f"SessionManager: 添加会话 {session_id}，目标帧率 {target_fps}，"
+                    f"共 {len(self.sessions)} 个会话")
+        return session
+
+    def get_session(self, session_id):
+        """按标识查找会话"""
+        with self._lock:
+            for session in self.sessions:
+                if session.session_id == session_id:
+                    return session
+        return None
+
+    def remove_session(self, session_id):
+        """
+        停止并移除会话
+
+        Returns:
+            CameraSession: 被移除的会话（可读取最终计数），不存在时返回None
+        """
+        with self._lock:
+            session = next((s for s in self.sessions if s.session_id == session_id), None)
+            if session is None:
+                return None
+            # 在调度锁内标记，之后调度线程不会再取出该会话的帧
+            session.closing = True
+        session.stop()
+        with self._lock:
+            self.sessions.remove(session)
+        Logger.info(f"SessionManager: 移除会话 {session_id}，计数 {session.counter}")
+        return session
+
+    def start(self):
+        """启动调度线程和推理线程池"""
+        if self.is_running:
+            return
+        self.is_running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='SessionInference')
+        self._dispatch_thread = threading.Thread(target=self._dispatch_loop, name='SessionDispatch')
+        self._dispatch_thread.daemon = True
+        self._dispatch_thread.start()
+        Logger.info(f"SessionManager: 启动调度，工作线程 {self.workers} 个")
+
+    def stop(self):
+        """停止调度并停止所有会话"""
+        self.is_running = False
+        self._wakeup.set()
+        if self._dispatch_thread is not None:
+            self._dispatch_thread.join(timeout=2.0)
+            self._dispatch_thread = None
+        for session in list(self.sessions):
+            self.remove_session(session.session_id)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        Logger.info("SessionManager: 已停止")
+
+    def _claim_next(self, t):
+        """
+        从轮转位置开始查找下一个可调度的会话并取出其最新帧
+
+        Returns:
+            tuple: (会话, 帧, FrameTiming)，没有就绪的会话时返回None
+        """
+        with self._lock:
+            count = len(self.sessions)
+            for i in range(count):
+                index = (self._cursor + i) % count
+                session = self.sessions[index]
+                if session.is_ready(t):
+                    # 下次从该会话之后开始查找，保证各会话轮流获得空闲的工作线程
+                    self._cursor = index + 1
+                    return (session,) + session.claim(t)
+        return None
+
+    def _earliest_due(self):
+        """
+        已有新帧、只在等待目标帧率时间点的会话中最早的时间点
+
+        Returns:
+            float: 时间点，没有这样的会话时返回None（等待新帧或推理完成的通知）
+        """
+        with self._lock:
+            due = [session.next_due for session in self.sessions
+                   if not session.in_flight and not session.closing and session.has_new_frame()]
+        return min(due) if due else None
+
+    def _dispatch_loop(self):
+        """
+        调度循环：有空闲工作线程时按轮转顺序为就绪的会话提交推理
+
+        没有就绪的会话时等待到最早的目标时间点；新帧到达、推理完成和停止时通过_wakeup提前唤醒
+        """
+        while self.is_running:
+            if not self._slots.acquire(timeout=0.1):
+                continue
+            # 先清除再检查，检查之后到达的通知不会丢失
+            self._wakeup.clear()
+            claimed = self._claim_next(now())
+            if claimed is None:
+                self._slots.release()
+                due = self._earliest_due()
+                self._wakeup.wait(None if due is None else max(0.0, due - now()))
+                continue
+            try:
+                self._executor.submit(self._run, *claimed)
+            except RuntimeError:
+                # 线程池已关闭（正在停止）
+                claimed[0].cancel()
+                self._slots.release()
+                break
+
+    def _run(self, session, frame, timing):
+        try:
+            session.run(frame, timing)
+        except Exception as e:
+            Logger.error(f"SessionManager: 会话 {session.session_id} 推理出错: {e}")
+        finally:
+            self._slots.release()
+            self._wakeup.set()
+
+    @property
+    def finished(self):
+        """所有会话的帧源都已播放完毕"""
+        with self._lock:
+            return bool(self.sessions) and all(session.finished for session in self.sessions)
+
+    def get_stats(self):
+        """
+        获取调度统计
+
+        Returns:
+            dict: sessions为各会话统计列表，total_fps为所有会话的推理帧率之和
+        """
+        with self._lock:
+            sessions = [session.get_stats() for session in self.sessions]
+        return {
+            'workers': self.workers,
+            'sessions': sessions,
+            'total_fps': round(sum(stats['fps'] for stats in sessions), 1),
+        }
@@ -5,68 +5,169 @@
 处理用户注册、登录、数据存储等功能
 """
 
-import json
 import os
 import hashlib
+import threading
+from collections import Counter, OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
+from kivy.clock import Clock
 from kivy.logger import Logger
 
+from core.history_io import export_history, import_history
+from core.persistence import PersistenceWorker
+from core.rep_events import concat_columns, encode_columns, summarize_reps
+from core.user_stats import RECENT_SIZE, UserStats
+from core.user_store import create_user_store
+from utils.platform_probe import android_storage
+
 
 class UserManager:
     """用户管理类"""
     
-    def __init__(self):
+    def __init__(self, backend='sqlite', data_dir=None, max_resident_users=32,
+                 background=True, fsync_policy='batch'):
+        """
+        初始化用户管理器
+        
+        Args:
+            backend: 存储后端，'sqlite'（默认，首次使用时自动迁移旧版users.json）或 'json'
+            data_dir: 数据目录，默认为应用私有目录
+            max_resident_users: 内存中最多保留的用户数，超出时按最近最少使用淘汰
+            background: 是否在后台线程中写入训练记录
+            fsync_policy: 后台写入的fsync策略（见PersistenceWorker）
+        """
+        self.data_dir = data_dir or self._get_data_dir()
         self.users_file = self._get_users_file_path()
-        self.users_data = {}
+        self.max_resident_users = max_resident_users
+        # 启动时只加载用户名索引，用户资料和记录在用到时按需加载
+        self.usernames = set()
+        self.users_data = OrderedDict()
+        self.user_stats = {}
+        # 各用户尚未写入存储的记录数：有待写记录的用户不会被淘汰，
+        # 因此从存储加载的用户数据和统计总是完整的，读取时无需等待后台写入
+        self._pending_writes = Counter()
+        self._pending_lock = threading.Lock()
+        self.store = create_user_store(backend, self.data_dir)
+        self.persistence = PersistenceWorker(self.store, fsync_policy=fsync_policy) if background else None
         self.load_users()
     
-    def _get_users_file_path(self):
-        """获取用户数据文件路径"""
+    def _get_data_dir(self):
+        """获取数据目录"""
         # 在Android上使用应用私有目录
-        try:
-            from android.storage import app_storage_path
-            data_dir = app_storage_path()
-        except ImportError:
+        if android_storage is not None:
+            data_dir = android_storage.app_storage_path()
+        else:
             # 桌面环境下使用当前目录
             data_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
             os.makedirs(data_dir, exist_ok=True)
         
-        return os.path.join(data_dir, 'users.json')
+        return data_dir
+    
+    def _get_users_file_path(self):
+        """获取用户数据文件路径（JSON存储）"""
+        return os.path.join(self.data_dir, 'users.json')
     
     def _hash_password(self, password):
         """密码哈希处理"""
         return hashlib.sha256(password.encode()).hexdigest()
     
     def load_users(self):
-        """从文件加载用户数据"""
+        """从存储加载用户名索引（用户数据在首次访问时加载）"""
+        self.flush()
+        self.users_data.clear()
+        self.user_stats.clear()
         try:
-            if os.path.exists(self.users_file):
-                with open(self.users_file, 'r', encoding='utf-8') as f:
-                    self.users_data = json.load(f)
-                Logger.info(f"UserManager: 加载了 {len(self.users_data)} 个用户")
-            else:
-                self.users_data = {}
-                Logger.info("UserManager: 创建新的用户数据文件")
+            self.usernames = set(self.store.list_users())
+            Logger.info(f"UserManager: 加载了 {len(self.usernames)} 个用户")
         except Exception as e:
             Logger.error(f"UserManager: 加载用户数据失败: {e}")
-            self.users_data = {}
+            self.usernames = set()
+    
+    def _get_user(self, username):
+        """
+        获取用户数据，不在内存中时从存储加载
+        
+        Args:
+            username: 用户名
+        
+        Returns:
+            dict: 用户数据，用户不存在或加载失败时返回None
+        """
+        user_data = self.users_data.get(username)
+        if user_data is not None:
+            self.users_data.move_to_end(username)
+            return user_data
+        if username not in self.usernames:
+            return None
+        
+        try:
+            user_data = self.store.load_user(username)
+        except Exception as e:
+            Logger.error(f"UserManager: 加载用户 {username} 失败: {e}")
+            return None
+        if user_data is not None:
+            self._cache_user(username, user_data)
+        return user_data
+    
+    def _cache_user(self, username, user_data):
+        """放入内存缓存，淘汰最久未使用的用户（只淘汰数据已全部持久化的用户）"""
+        self.users_data[username] = user_data
+        self.users_data.move_to_end(username)
+        excess = len(self.users_data) - self.max_resident_users
+        if excess <= 0:
+            return
+        with self._pending_lock:
+            evicted = [name for name in self.users_data
+                       if name != username and not self._pending_writes[name]][:excess]
+        for name in evicted:
+            del self.users_data[name]
+            self.user_stats.pop(name, None)
     
     def save_users(self):
-        """保存用户数据到文件"""
+        """完整保存内存中的用户数据（注册和添加记录时已单独保存）"""
+        # 记录可能被直接修改过，统计在下次查询时从重新写入的汇总加载
+        self.user_stats.clear()
+        self.flush()
         try:
-            os.makedirs(os.path.dirname(self.users_file), exist_ok=True)
-            with open(self.users_file, 'w', encoding='utf-8') as f:
-                json.dump(self.users_data, f, ensure_ascii=False, indent=2)
+            self.store.save_all(self.users_data)
             Logger.info("UserManager: 用户数据已保存")
         except Exception as e:
             Logger.error(f"UserManager: 保存用户数据失败: {e}")
     
+    def flush(self):
+        """等待后台写入全部完成（应用暂停、退出前调用）"""
+        if self.persistence is not None:
+            self.persistence.flush()
+    
+    def close(self):
+        """写完剩余记录并关闭存储"""
+        if self.persistence is not None:
+            self.persistence.stop()
+        self.store.close()
+    
+    def _persist(self, func, *args):
+        """
+        执行一次存储写入（后台模式下入队后立即返回）
+        
+        Returns:
+            Future: 写入完成后设置结果
+        """
+        if self.persistence is not None:
+            return self.persistence.submit(func, *args)
+        future = Future()
+        try:
+            future.set_result(func(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    
     def register(self, username, password, name=""):
         """用户注册"""
         if not username or not password:
             return False, "用户名和密码不能为空"
         
-        if username in self.users_data:
+        if username in self.usernames:
             return False, "用户名已存在"
         
         # 创建用户数据
@@ -79,75 +180,241 @@ class UserManager:
             'best_session': 0
         }
         
-        self.users_data[username] = user_data
-        self.save_users()
+        try:
+            self.store.create_user(username, user_data)
+        except Exception as e:
+            Logger.error(f"UserManager: 保存用户失败: {e}")
+            return False, "注册失败，请重试"
+        self.usernames.add(username)
+        self._cache_user(username, user_data)
         
         Logger.info(f"UserManager: 用户 {username} 注册成功")
         return True, "注册成功"
     
     def authenticate(self, username, password):
         """用户认证"""
-        if username not in self.users_data:
+        user_data = self._get_user(username)
+        if user_data is None:
             return False
         
-        stored_hash = self.users_data[username]['password_hash']
+        stored_hash = user_data['password_hash']
         input_hash = self._hash_password(password)
         
         return stored_hash == input_hash
     
     def get_user_info(self, username):
         """获取用户信息"""
-        return self.users_data.get(username, {})
+        return self._get_user(username) or {}
     
-    def add_pushup_record(self, username, count, duration=None):
-        """添加俯卧撑记录"""
-        if username not in self.users_data:
+    def add_pushup_record(self, username, count, duration=None, reps=None):
+        """
+        添加俯卧撑记录并等待写入完成（界面线程中请使用submit_pushup_record）
+        
+        Returns:
+            bool: 记录是否已保存到存储
+        """
+        future = self.submit_pushup_record(username, count, duration, reps)
+        if future is None:
             return False
+        return future.exception() is None
+    
+    def submit_pushup_record(self, username, count, duration=None, reps=None):
+        """
+        添加俯卧撑记录，内存中的数据立即更新，存储写入在后台完成
+        
+        Args:
+            username: 用户名
+            count: 俯卧撑次数
+            duration: 训练时长（秒）
+            reps: 每个俯卧撑的事件列数据（见PoseDetector.get_rep_events），按列压缩保存
+        
+        Returns:
+            Future: 写入完成（按策略落盘）后设置结果，用户不存在时返回None
+        """
+        user_data = self._get_user(username)
+        if user_data is None:
+            return None
         
         record = {
             'count': count,
             'date': datetime.now().isoformat(),
             'duration': duration
         }
+        if reps is not None and len(reps['start']):
+            record['reps'] = encode_columns(reps)
         
-        user_data = self.users_data[username]
+        # 统计需在记录入队前加载，之后随内存数据一起增量更新
+        stats = self._get_stats(username, user_data)
         user_data['pushup_records'].append(record)
         user_data['total_pushups'] += count
         user_data['best_session'] = max(user_data['best_session'], count)
+        stats.add(record)
         
-        self.save_users()
+        with self._pending_lock:
+            self._pending_writes[username] += 1
+        future = self._persist(self.store.add_record, username, record)
+        future.add_done_callback(lambda f: self._on_record_saved(username, f))
         Logger.info(f"UserManager: 为用户 {username} 添加记录: {count} 个俯卧撑")
-        return True
+        return future
+    
+    def _on_record_saved(self, username, future):
+        """记录写入完成（后台写入线程中调用）"""
+        with self._pending_lock:
+            self._pending_writes[username] -= 1
+            if not self._pending_writes[username]:
+                del self._pending_writes[username]
+        if future.exception() is not None:
+            Logger.error(f"UserManager: 保存训练记录失败: {future.exception()}")
     
     def get_user_statistics(self, username):
-        """获取用户统计信息"""
-        if username not in self.users_data:
+        """获取用户统计信息（增量维护，与历史记录数量无关）"""
+        user_data = self._get_user(username)
+        if user_data is None:
             return None
         
-        user_data = self.users_data[username]
-        records = user_data['pushup_records']
-        
-        if not records:
-            return {
-                'total_pushups': 0,
-                'total_sessions': 0,
-                'best_session': 0,
-                'average_per_session': 0,
-                'recent_records': []
-            }
-        
-        total_sessions = len(records)
-        total_pushups = user_data['total_pushups']
-        best_session = user_data['best_session']
-        average_per_session = total_pushups / total_sessions if total_sessions > 0 else 0
-        
-        # 获取最近10条记录
-        recent_records = sorted(records, key=lambda x: x['date'], reverse=True)[:10]
-        
-        return {
-            'total_pushups': total_pushups,
-            'total_sessions': total_sessions,
-            'best_session': best_session,
-            'average_per_session': round(average_per_session, 1),
-            'recent_records': recent_records
-        }
+        return self._get_stats(username, user_data).summary()
+    
+    def get_training_volume(self, username, period='day', start=None, end=None):
+        """
+        获取用户按日/周/月汇总的训练量
+        
+        Args:
+            username: 用户名
+            period: 'day'、'week' 或 'month'
+            start: 起始日期（包含），date/datetime/ISO字符串
+            end: 结束日期（包含）
+        
+        Returns:
+            list: 按时间升序的汇总（period、reps、sessions、duration、best），用户不存在时返回None
+        """
+        user_data = self._get_user(username)
+        if user_data is None:
+            return None
+        
+        return self._get_stats(username, user_data).volume(period, start, end)
+    
+    def _read(self, username, func, callback=None):
+        """
+        执行一次存储读取，排在已提交的写入之后（后台模式下在写入线程中执行）
+        
+        Args:
+            username: 用户名，不存在时结果为None
+            func: 读取函数
+            callback: 为空时等待并返回结果（不应在界面线程中使用）；
+                      否则立即返回，结果在主线程中传给callback，失败时为None
+        
+        Returns:
+            读取结果，失败时为None；指定callback时返回None
+        """
+        if username in self.usernames:
+            future = self._persist(func)
+        else:
+            future = Future()
+            future.set_result(None)
+        if callback is None:
+            return self._read_result(future)
+        future.add_done_callback(
+            lambda f: Clock.schedule_once(lambda dt: callback(self._read_result(f)), 0))
+        return None
+    
+    @staticmethod
+    def _read_result(future):
+        """等待读取完成并返回结果，失败时记录错误并返回None"""
+        try:
+            return future.result()
+        except Exception as e:
+            Logger.error(f"UserManager: 读取存储失败: {e}")
+            return None
+
+    def query_history(self, username, start=None, end=None, limit=20, cursor=None, descending=True,
+                      callback=None):
+        """
+        按日期范围分页查询训练记录
+        
+        Args:
+            username: 用户名
+            start: 起始日期（包含），date/datetime/'YYYY-MM-DD'
+            end: 结束日期（包含当天）
+            limit: 每页条数
+            cursor: 上一页返回的游标，None表示第一页
+            descending: 是否按日期从新到旧排列
+            callback: 界面线程中调用时传入，查询在后台写入线程中执行，结果在主线程中传给callback
+        
+        Returns:
+            dict: {'records': 记录列表, 'next_cursor': 下一页游标或None}，
+                  用户不存在或查询失败时返回None（指定callback时结果传给callback）
+        """
+        def query():
+            records, next_cursor = self.store.query_history(
+                username, start, end, limit, cursor, descending)
+            return {'records': records, 'next_cursor': next_cursor}
+        
+        return self._read(username, query, callback)
+    
+    def get_rep_events(self, username, start=None, end=None, callback=None):
+        """
+        获取日期范围内全部俯卧撑的事件
+        
+        Args:
+            username: 用户名
+            start: 起始日期（包含）
+            end: 结束日期（包含当天）
+            callback: 同query_history
+        
+        Returns:
+            dict: 列名 -> float32数组（多次训练合并），用户不存在时返回None
+        """
+        def load():
+            return concat_columns(self.store.load_rep_events(username, start, end))
+        
+        return self._read(username, load, callback)
+    
+    def get_rep_metrics(self, username, start=None, end=None):
+        """
+        获取日期范围内的动作统计（如最近一个月的平均单次节奏）
+        
+        Returns:
+            dict: 见core.rep_events.summarize_reps，用户不存在时返回None
+        """
+        columns = self.get_rep_events(username, start, end)
+        if columns is None:
+            return None
+        return summarize_reps(columns)
+    
+    def export_history(self, path):
+        """
+        流式导出全部用户的训练记录
+        
+        Args:
+            path: 输出文件路径（.csv 或 .npz）
+        
+        Returns:
+            dict: 导出的用户数和记录数
+        """
+        self.flush()
+        return export_history(self.store, path)
+    
+    def import_history(self, path):
+        """
+        流式导入训练记录（如从其他设备导出的文件），导入后重新加载用户索引
+        
+        Args:
+            path: 输入文件路径（.csv 或 .npz）
+        
+        Returns:
+            dict: 新建用户数、导入记录数、跳过的重复记录数
+        """
+        self.flush()
+        result = import_history(self.store, path)
+        self.load_users()
+        return result
+    
+    def _get_stats(self, username, user_data):
+        """获取用户的增量统计，首次访问时读取存储中持久化的汇总和最近记录（不遍历历史记录）"""
+        stats = self.user_stats.get(username)
+        if stats is None:
+            # 统计随有待写记录的用户常驻内存，此时存储中的汇总已包含该用户的全部记录
+            recent, _ = self.store.query_history(username, limit=RECENT_SIZE)
+            stats = UserStats.from_rollups(self.store.load_rollups(username), recent)
+            self.user_stats[username] = stats
+        return stats
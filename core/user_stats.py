@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用户统计模块
+在新增训练记录时增量维护汇总数据、最近记录和按日/周/月的训练量，查询时无需遍历全部历史记录；
+按时间段的汇总同时由存储持久化（见core.user_store的rollups），加载用户统计时直接读取汇总
+"""
+
+import bisect
+from datetime import date, datetime
+
+
+PERIODS = ('day', 'week', 'month')
+# 默认保留的最近记录条数
+RECENT_SIZE = 10
+
+
+def period_key(day, period):
+    """
+    获取日期所在时间段的键（字符串，按字典序即按时间排序）
+
+    Args:
+        day: date对象
+        period: 'day'、'week'（ISO周）或 'month'
+
+    Returns:
+        str: 如 '2024-01-05'、'2024-W01'、'2024-01'
+    """
+    if period == 'day':
+        return day.isoformat()
+    if period == 'week':
+        year, week, _ = day.isocalendar()
+        return f'{year}-W{week:02d}'
+    if period == 'month':
+        return f'{day.year}-{day.month:02d}'
+    raise ValueError(f"未知的时间段: {period}")
+
+
+def period_keys(value):
+    """
+    获取记录日期在各时间段的键
+
+    Args:
+        value: date/datetime/ISO字符串
+
+    Returns:
+        list: (时间段, 键)
+    """
+    day = to_date(value)
+    return [(period, period_key(day, period)) for period in PERIODS]
+
+
+def new_bucket(key):
+    """创建一个时间段的空汇总"""
+    return {'period': key, 'reps': 0, 'sessions': 0, 'duration': 0.0, 'best': 0}
+
+
+def add_to_bucket(bucket, record):
+    """把一条记录计入时间段汇总"""
+    bucket['reps'] += record['count']
+    bucket['sessions'] += 1
+    bucket['duration'] += record.get('duration') or 0.0
+    bucket['best'] = max(bucket['best'], record['count'])
+
+
+def to_date(value):
+    """把date/datetime/ISO字符串转换为date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value[:10])
+
+
+class UserStats:
+    """单个用户的增量统计"""
+
+    def __init__(self, records=(), recent_size=RECENT_SIZE):
+        """
+        初始化统计（加载用户时对已有记录计算一次）
+
+        Args:
+            records: 已有的训练记录
+            recent_size: 保留的最近记录条数
+        """
+        self.recent_size = recent_size
+        self.total_pushups = 0
+        self.total_sessions = 0
+        self.best_session = 0
+        # 按日期升序排列的最近记录及其日期，最多recent_size条
+        self._recent = []
+        self._recent_dates = []
+        # 时间段 -> {键: 汇总}，以及按顺序排列的键，用于范围查询
+        self._buckets = {period: {} for period in PERIODS}
+        self._bucket_keys = {period: [] for period in PERIODS}
+
+        for record in records:
+            self.add(record)
+
+    @classmethod
+    def from_rollups(cls, rollups, recent, recent_size=RECENT_SIZE):
+        """
+        根据存储中持久化的汇总创建统计（不读取全部历史记录）
+
+        Args:
+            rollups: 时间段 -> 按键升序排列的汇总列表（见store.load_rollups）
+            recent: 按日期从新到旧排列的最近记录
+            recent_size: 保留的最近记录条数
+
+        Returns:
+            UserStats: 统计对象
+        """
+        stats = cls(recent_size=recent_size)
+        for period in PERIODS:
+            buckets = rollups.get(period, [])
+            stats._buckets[period] = {bucket['period']: dict(bucket) for bucket in buckets}
+            stats._bucket_keys[period] = sorted(stats._buckets[period])
+        # 总量由月汇总累加（条目数为月数）
+        for bucket in stats._buckets['month'].values():
+            stats.total_pushups += bucket['reps']
+            stats.total_sessions += bucket['sessions']
+            stats.best_session = max(stats.best_session, bucket['best'])
+        stats._recent = list(reversed(recent[:recent_size]))
+        stats._recent_dates = [record['date'] for record in stats._recent]
+        return stats
+
+    def add(self, record):
+        """
+        计入一条新记录（O(log k)，k为最近记录条数）
+
+        Args:
+            record: 训练记录字典（count、date、duration）
+        """
+        count = record['count']
+        self.total_pushups += count
+        self.total_sessions += 1
+        self.best_session = max(self.best_session, count)
+
+        # 日期为ISO格式字符串，可直接按字符串排序；补录的旧记录插入到正确位置
+        if len(self._recent) < self.recent_size or record['date'] >= self._recent_dates[0]:
+            index = bisect.bisect_right(self._recent_dates, record['date'])
+            self._recent.insert(index, record)
+            self._recent_dates.insert(index, record['date'])
+            if len(self._recent) > self.recent_size:
+                self._recent.pop(0)
+                self._recent_dates.pop(0)
+
+        for period, key in period_keys(record['date']):
+            self._add_to_bucket(period, key, record)
+
+    def _add_to_bucket(self, period, key, record):
+        """把记录计入一个时间段（O(1)，新时间段O(log b)）"""
+        buckets = self._buckets[period]
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = new_bucket(key)
+            buckets[key] = bucket
+            bisect.insort(self._bucket_keys[period], key)
+        add_to_bucket(bucket, record)
+
+    def volume(self, period='day', start=None, end=None):
+        """
+        获取时间段内的训练量序列
+
+        Args:
+            period: 'day'、'week' 或 'month'
+            start: 起始日期（包含），date/datetime/ISO字符串，None表示不限
+            end: 结束日期（包含），None表示不限
+
+        Returns:
+            list: 按时间升序排列的汇总字典（period、reps、sessions、duration、best），
+                  没有训练的时间段不出现
+        """
+        keys = self._bucket_keys[period]
+        low = 0 if start is None else bisect.bisect_left(keys, period_key(to_date(start), period))
+        high = len(keys) if end is None else bisect.bisect_right(keys, period_key(to_date(end), period))
+        buckets = self._buckets[period]
+        return [dict(buckets[key]) for key in keys[low:high]]
+
+    @property
+    def average_per_session(self):
+        """平均每次的俯卧撑数"""
+        if not self.total_sessions:
+            return 0
+        return round(self.total_pushups / self.total_sessions, 1)
+
+    def recent_records(self):
+        """
+        获取最近记录
+
+        Returns:
+            list: 按日期从新到旧排列的记录
+        """
+        return self._recent[::-1]
+
+    def summary(self):
+        """
+        获取统计信息
+
+        Returns:
+            dict: 与UserManager.get_user_statistics相同格式的统计
+        """
+        return {
+            'total_pushups': self.total_pushups,
+            'total_sessions': self.total_sessions,
+            'best_session': self.best_session,
+            'average_per_session': self.average_per_session,
+            'recent_records': self.recent_records()
+        }
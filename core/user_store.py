@@ -0,0 +1,1025 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+用户数据存储模块
+为UserManager提供可替换的持久化后端：JSON快照+追加日志存储和SQLite（WAL模式）事务存储
+"""
+
+import bisect
+import json
+import os
+import pathlib
+import shutil
+import sqlite3
+import threading
+from datetime import timedelta
+from urllib.parse import quote
+
+from kivy.logger import Logger
+
+from core.rep_events import (REP_COLUMNS, columns_from_bytes, columns_to_bytes, decode_columns,
+                              encode_columns)
+from core.user_stats import PERIODS, add_to_bucket, new_bucket, period_keys, to_date
+
+
+def date_bounds(start, end):
+    """
+    把日期范围转换为ISO日期字符串的半开区间
+
+    Args:
+        start: 起始日期（包含），date/datetime/'YYYY-MM-DD'，None表示不限
+        end: 结束日期（包含当天），None表示不限
+
+    Returns:
+        tuple: (下界（包含）, 上界（不包含）)，不限时为None
+    """
+    low = to_date(start).isoformat() if start is not None else None
+    high = (to_date(end) + timedelta(days=1)).isoformat() if end is not None else None
+    return low, high
+
+
+def encode_cursor(date, record_id):
+    """生成分页游标（最后一条记录的日期和编号）"""
+    return f'{date}|{record_id}'
+
+
+def decode_cursor(cursor):
+    """解析分页游标"""
+    date, _, record_id = cursor.rpartition('|')
+    return date, int(record_id)
+
+
+class JsonUserStore:
+    """
+    JSON文件存储
+
+    users.json 为快照（格式与旧版相同，另含按日/周/月的汇总rollups），注册和新增记录以单行JSON追加到每个用户的日志文件，
+    日志累积到一定大小后在后台压缩进快照；加载时先读快照再按序号重放日志。
+    存储持有自己的一份用户数据，只在锁内修改，可以从后台写入线程调用
+    """
+
+    name = 'json'
+
+    def __init__(self, path, fsync=True, min_compact_bytes=256 * 1024, compact_ratio=0.5):
+        """
+        Args:
+            path: users.json 快照文件路径
+            fsync: 每次追加日志后是否调用fsync（关闭后崩溃可能丢失最近的记录）
+            min_compact_bytes: 触发压缩的最小日志字节数
+            compact_ratio: 日志字节数超过快照大小的该比例时触发压缩
+        """
+        self.path = path
+        self.journal_dir = os.path.join(os.path.dirname(path), 'journal')
+        self.compacting_dir = self.journal_dir + '.compacting'
+        self.fsync = fsync
+        self.min_compact_bytes = min_compact_bytes
+        self.compact_ratio = compact_ratio
+        self.users_data = {}
+        # 用户名 -> 按(日期, 记录位置)排序的历史索引，查询时按需建立
+        self._history_index = {}
+        # 已写入但尚未fsync的日志文件
+        self._unsynced = set()
+
+        self._lock = threading.RLock()
+        self._compact_thread = None
+        self._journal_bytes = 0
+        self._snapshot_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+
+        # 写放大统计：实际写入字节数 / 记录本身的字节数
+        self.stats = {'logical_bytes': 0, 'journal_bytes': 0, 'snapshot_bytes': 0, 'compactions': 0}
+
+    def _journal_path(self, directory, username):
+        return os.path.join(directory, quote(username, safe='') + '.jsonl')
+
+    def load_all(self):
+        """
+        加载全部用户数据（快照 + 日志重放）
+
+        Returns:
+            dict: 用户名 -> 用户数据（与UserManager.users_data格式相同）
+        """
+        with self._lock:
+            self._wait_compaction()
+            if os.path.exists(self.path):
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.users_data = json.load(f)
+            else:
+                self.users_data = {}
+            self._history_index = {}
+            # 旧版快照没有汇总，重放日志前根据快照中的记录计算一次（下次压缩时写入快照）
+            for user_data in self.users_data.values():
+                self._ensure_rollups(user_data)
+
+            # 先重放上次未完成压缩的日志，再重放当前日志
+            self._journal_bytes = 0
+            replayed = 0
+            for directory in (self.compacting_dir, self.journal_dir):
+                if not os.path.isdir(directory):
+                    continue
+                for name in sorted(os.listdir(directory)):
+                    if name.endswith('.jsonl'):
+                        replayed += self._replay(os.path.join(directory, name))
+                        if directory == self.journal_dir:
+                            self._journal_bytes += os.path.getsize(os.path.join(directory, name))
+            if replayed:
+                Logger.info(f"UserStore: 重放了 {replayed} 条日志")
+            return self.users_data
+
+    def list_users(self):
+        """
+        获取全部用户名（JSON快照无法按用户读取，需完整加载一次）
+
+        Returns:
+            list: 用户名列表
+        """
+        return list(self.load_all().keys())
+
+    def load_user(self, username):
+        """
+        获取单个用户的数据
+
+        Returns:
+            dict: 用户数据，不存在时返回None
+        """
+        with self._lock:
+            user_data = self.users_data.get(username)
+            return self._copy_user(user_data) if user_data is not None else None
+
+    @staticmethod
+    def _copy_user(user_data):
+        """复制用户数据（记录列表单独复制，记录本身不会被修改）"""
+        data = {key: value for key, value in user_data.items() if key not in ('journal_seq', 'rollups')}
+        data['pushup_records'] = list(user_data.get('pushup_records', []))
+        return data
+
+    def _replay(self, journal_path):
+        """重放单个日志文件，返回应用的条目数"""
+        applied = 0
+        valid_end = 0
+        with open(journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    # 崩溃时写了一半的行，截掉，避免之后追加的内容接在残行后面
+                    Logger.warning(f"UserStore: 丢弃不完整的日志行: {journal_path}")
+                    break
+                valid_end += len(line)
+                if self._apply(entry):
+                    applied += 1
+        if valid_end < os.path.getsize(journal_path):
+            with open(journal_path, 'r+b') as f:
+                f.truncate(valid_end)
+        return applied
+
+    def _apply(self, entry):
+        """应用一条日志，已包含在快照中的条目（序号不大于journal_seq）会被跳过"""
+        username = entry['user']
+        user_data = self.users_data.get(username)
+        if user_data is not None and entry['seq'] <= user_data.get('journal_seq', 0):
+            return False
+
+        if entry['op'] == 'create':
+            user_data = dict(entry['data'])
+            self._ensure_rollups(user_data)
+            self.users_data[username] = user_data
+        elif entry['op'] == 'record' and user_data is not None:
+            self._apply_record(user_data, entry['record'])
+        else:
+            return False
+        user_data['journal_seq'] = entry['seq']
+        return True
+
+    @staticmethod
+    def _apply_record(user_data, record):
+        count = record['count']
+        user_data['pushup_records'].append(record)
+        user_data['total_pushups'] += count
+        user_data['best_session'] = max(user_data['best_session'], count)
+        rollups = user_data['rollups']
+        for period, key in period_keys(record['date']):
+            bucket = rollups[period].get(key)
+            if bucket is None:
+                bucket = rollups[period][key] = new_bucket(key)
+            add_to_bucket(bucket, record)
+
+    @classmethod
+    def _ensure_rollups(cls, user_data):
+        """用户数据没有汇总时根据已有记录计算"""
+        if 'rollups' in user_data:
+            return
+        records = user_data.get('pushup_records', [])
+        user_data['rollups'] = {period: {} for period in PERIODS}
+        user_data['pushup_records'] = []
+        user_data['total_pushups'] = user_data['best_session'] = 0
+        for record in records:
+            cls._apply_record(user_data, record)
+
+    def _append(self, username, user_data, entry):
+        """追加一条日志（单行写入，按配置fsync）"""
+        entry['user'] = username
+        entry['seq'] = user_data.get('journal_seq', 0) + 1
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        data = line.encode('utf-8')
+
+        os.makedirs(self.journal_dir, exist_ok=True)
+        journal_path = self._journal_path(self.journal_dir, username)
+        with open(journal_path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+            else:
+                self._unsynced.add(journal_path)
+        user_data['journal_seq'] = entry['seq']
+
+        self._journal_bytes += len(data)
+        self.stats['journal_bytes'] += len(data)
+        return len(data)
+
+    def save_all(self, users_data):
+        """立即把给定用户的数据合并写入快照并清空日志（未给出的用户保持不变）"""
+        with self._lock:
+            self._wait_compaction()
+            for username, user_data in users_data.items():
+                copied = self._copy_user(user_data)
+                self._ensure_rollups(copied)
+                existing = self.users_data.get(username)
+                if existing is not None and 'journal_seq' in existing:
+                    copied['journal_seq'] = existing['journal_seq']
+                self.users_data[username] = copied
+            self._history_index = {}
+            self._rotate_journal()
+            self._write_snapshot(json.dumps(self.users_data, ensure_ascii=False))
+
+    def create_user(self, username, user_data):
+        """保存新用户（追加一条create日志）"""
+        with self._lock:
+            user_data = self._copy_user(user_data)
+            self._append(username, user_data, {'op': 'create', 'data': self._copy_user(user_data)})
+            self._ensure_rollups(user_data)
+            self.users_data[username] = user_data
+            self._maybe_compact()
+
+    def add_record(self, username, record):
+        """
+        保存新的训练记录（追加一条record日志，与历史记录数量无关）
+
+        Args:
+            username: 用户名
+            record: 新记录
+        """
+        with self._lock:
+            user_data = self.users_data[username]
+            self._apply_record(user_data, record)
+            index = self._history_index.get(username)
+            if index is not None:
+                bisect.insort(index, (record['date'], len(user_data['pushup_records']) - 1))
+            written = self._append(username, user_data, {'op': 'record', 'record': record})
+            self.stats['logical_bytes'] += len(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+            self._maybe_compact()
+            return written
+
+    def query_history(self, username, start=None, end=None, limit=20, cursor=None, descending=True):
+        """
+        按日期范围分页查询训练记录（内存中的有序索引，二分定位）
+
+        Args:
+            username: 用户名
+            start: 起始日期（包含）
+            end: 结束日期（包含当天）
+            limit: 每页条数
+            cursor: 上一页返回的游标，None表示第一页
+            descending: 是否按日期从新到旧排列
+
+        Returns:
+            tuple: (记录列表, 下一页游标)，没有更多记录时游标为None
+        """
+        with self._lock:
+            user_data = self.users_data.get(username)
+            if user_data is None:
+                return [], None
+            index = self._get_history_index(username, user_data)
+            lo, hi = self._index_range(index, start, end)
+            if cursor is not None:
+                key = decode_cursor(cursor)
+                if descending:
+                    hi = min(hi, bisect.bisect_left(index, key))
+                else:
+                    lo = max(lo, bisect.bisect_right(index, key))
+
+            if descending:
+                page = index[max(lo, hi - limit):hi][::-1]
+                has_more = hi - limit > lo
+            else:
+                page = index[lo:min(hi, lo + limit)]
+                has_more = lo + limit < hi
+
+            records = [dict(user_data['pushup_records'][i]) for _, i in page]
+            next_cursor = encode_cursor(*page[-1]) if has_more and page else None
+            return records, next_cursor
+
+    def load_rollups(self, username):
+        """
+        读取持久化的按日/周/月汇总
+
+        Returns:
+            dict: 时间段 -> 按键升序排列的汇总列表（period、reps、sessions、duration、best）
+        """
+        with self._lock:
+            user_data = self.users_data.get(username)
+            if user_data is None:
+                return {period: [] for period in PERIODS}
+            return {period: [dict(buckets[key]) for key in sorted(buckets)]
+                    for period, buckets in user_data['rollups'].items()}
+
+    def load_rep_events(self, username, start=None, end=None):
+        """
+        加载日期范围内各次训练的动作事件
+
+        Args:
+            username: 用户名
+            start: 起始日期（包含）
+            end: 结束日期（包含当天）
+
+        Returns:
+            list: 每次训练的列数据（列名 -> float32数组）
+        """
+        with self._lock:
+            user_data = self.users_data.get(username)
+            if user_data is None:
+                return []
+            index = self._get_history_index(username, user_data)
+            lo, hi = self._index_range(index, start, end)
+            records = user_data['pushup_records']
+            encoded = [records[i]['reps'] for _, i in index[lo:hi] if records[i].get('reps')]
+        return [decode_columns(reps) for reps in encoded]
+
+    def _get_history_index(self, username, user_data):
+        """获取用户按(日期, 记录位置)排序的索引，不存在时建立"""
+        index = self._history_index.get(username)
+        if index is None:
+            records = user_data['pushup_records']
+            index = sorted((record['date'], i) for i, record in enumerate(records))
+            self._history_index[username] = index
+        return index
+
+    @staticmethod
+    def _index_range(index, start, end):
+        """二分定位日期范围在索引中的位置"""
+        low, high = date_bounds(start, end)
+        lo = bisect.bisect_left(index, (low,)) if low else 0
+        hi = bisect.bisect_left(index, (high,)) if high else len(index)
+        return lo, hi
+
+    def iter_users(self):
+        """
+        逐个获取用户资料（不含训练记录）
+
+        Yields:
+            tuple: (用户名, 资料字典：password_hash、name、created_at)
+        """
+        with self._lock:
+            usernames = sorted(self.users_data)
+        for username in usernames:
+            with self._lock:
+                user_data = self.users_data.get(username)
+                if user_data is None:
+                    continue
+                profile = {key: user_data.get(key) for key in ('password_hash', 'name', 'created_at')}
+            yield username, profile
+
+    def iter_sessions(self, username):
+        """
+        逐条获取用户的训练记录（按写入顺序）
+
+        Yields:
+            dict: 训练记录（有动作事件时包含reps）
+        """
+        with self._lock:
+            user_data = self.users_data.get(username)
+            records = list(user_data['pushup_records']) if user_data is not None else []
+        for record in records:
+            yield dict(record)
+
+    def session_dates(self, username):
+        """获取用户已有训练记录的日期集合（导入时去重）"""
+        with self._lock:
+            user_data = self.users_data.get(username)
+            if user_data is None:
+                return set()
+            return {record['date'] for record in user_data['pushup_records']}
+
+    def import_records(self, username, records):
+        """
+        批量追加训练记录（导入时使用）
+
+        Args:
+            username: 用户名（需已存在）
+            records: 训练记录列表
+        """
+        with self._lock:
+            user_data = self.users_data[username]
+            for record in records:
+                self._apply_record(user_data, record)
+                self._append(username, user_data, {'op': 'record', 'record': record})
+            self._history_index.pop(username, None)
+            self._maybe_compact()
+
+    def set_fsync(self, enabled):
+        """设置每次追加日志后是否立即fsync"""
+        with self._lock:
+            self.fsync = enabled
+
+    def sync(self):
+        """把之前未fsync的日志同步到磁盘（批量写入结束时调用）"""
+        with self._lock:
+            for journal_path in self._unsynced:
+                try:
+                    fd = os.open(journal_path, os.O_RDONLY)
+                except FileNotFoundError:
+                    # 已被压缩进快照
+                    continue
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            self._unsynced.clear()
+
+    def _maybe_compact(self):
+        """日志足够大时启动后台压缩"""
+        threshold = max(self.min_compact_bytes, self._snapshot_bytes * self.compact_ratio)
+        if self._journal_bytes >= threshold and self._compact_thread is None:
+            self.compact(background=True)
+
+    def compact(self, background=False):
+        """
+        把日志压缩进快照
+
+        Args:
+            background: 是否在后台线程中序列化和写入快照
+        """
+        with self._lock:
+            self._wait_compaction()
+            # 轮转日志目录后复制一份当前数据（记录本身不会再被修改，浅复制即可）
+            self._rotate_journal()
+            # 汇总会被之后的写入原地修改，需逐个复制
+            snapshot = {username: dict(user_data, pushup_records=list(user_data['pushup_records']),
+                                       rollups={period: {key: dict(bucket) for key, bucket in buckets.items()}
+                                                for period, buckets in user_data['rollups'].items()})
+                        for username, user_data in self.users_data.items()}
+
+            if background:
+                self._compact_thread = threading.Thread(
+                    target=self._finish_compaction, args=(snapshot,), name='JournalCompaction')
+                self._compact_thread.daemon = True
+                self._compact_thread.start()
+            else:
+                self._finish_compaction(snapshot)
+
+    def _rotate_journal(self):
+        """把当前日志目录移为待压缩目录，之后的追加写入新目录"""
+        # 改名前先同步，保证已确认的写入在快照完成前也不会丢失
+        self.sync()
+        if os.path.isdir(self.journal_dir):
+            if os.path.isdir(self.compacting_dir):
+                # 上次压缩未完成（如崩溃），合并进本次压缩
+                for name in os.listdir(self.journal_dir):
+                    source = os.path.join(self.journal_dir, name)
+                    with open(source, 'rb') as src, \
+                            open(os.path.join(self.compacting_dir, name), 'ab') as dst:
+                        shutil.copyfileobj(src, dst)
+                shutil.rmtree(self.journal_dir)
+            else:
+                os.replace(self.journal_dir, self.compacting_dir)
+        self._journal_bytes = 0
+
+    def _finish_compaction(self, snapshot):
+        """序列化快照、原子替换，然后删除已压缩的日志"""
+        try:
+            self._write_snapshot(json.dumps(snapshot, ensure_ascii=False))
+            self.stats['compactions'] += 1
+            Logger.info(f"UserStore: 日志压缩完成，快照 {self._snapshot_bytes} 字节")
+        except Exception as e:
+            Logger.error(f"UserStore: 日志压缩失败: {e}")
+        finally:
+            self._compact_thread = None
+
+    def _write_snapshot(self, text):
+        """原子写入快照（临时文件 + fsync + 改名），成功后删除待压缩日志"""
+        data = text.encode('utf-8')
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        if os.path.isdir(self.compacting_dir):
+            shutil.rmtree(self.compacting_dir)
+
+        self._snapshot_bytes = len(data)
+        self.stats['snapshot_bytes'] += len(data)
+
+    def _wait_compaction(self):
+        thread = self._compact_thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def write_amplification(self):
+        """写放大系数：实际写入的字节数 / 记录本身的字节数"""
+        logical = self.stats['logical_bytes']
+        if not logical:
+            return 0.0
+        return (self.stats['journal_bytes'] + self.stats['snapshot_bytes']) / logical
+
+    def close(self):
+        """同步未落盘的日志并等待后台压缩结束"""
+        self.sync()
+        self._wait_compaction()
+
+
+class SQLiteUserStore:
+    """SQLite存储（WAL模式），用户和训练记录分表保存，新增记录为单行插入并累加按日/周/月的汇总"""
+
+    name = 'sqlite'
+
+    SCHEMA_VERSION = 3
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password_hash TEXT NOT NULL,
+            name TEXT NOT NULL DEFAULT '',
+            created_at TEXT NOT NULL,
+            total_pushups INTEGER NOT NULL DEFAULT 0,
+            best_session INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL REFERENCES users(username),
+            date TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            duration REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_user_date ON sessions(username, date);
+        CREATE TABLE IF NOT EXISTS rep_events (
+            session_id INTEGER PRIMARY KEY REFERENCES sessions(id) ON DELETE CASCADE,
+            reps INTEGER NOT NULL,
+            start_time BLOB NOT NULL,
+            end_time BLOB NOT NULL,
+            min_arm_angle BLOB NOT NULL,
+            leg_angle BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rollups (
+            username TEXT NOT NULL,
+            period TEXT NOT NULL,
+            key TEXT NOT NULL,
+            reps INTEGER NOT NULL DEFAULT 0,
+            sessions INTEGER NOT NULL DEFAULT 0,
+            duration REAL NOT NULL DEFAULT 0,
+            best INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (username, period, key)
+        ) WITHOUT ROWID;
+    """
+
+    # rep_events表中各列对应的REP_COLUMNS
+    REP_EVENT_FIELDS = ('start_time', 'end_time', 'min_arm_angle', 'leg_angle')
+
+    def __init__(self, path, json_path=None):
+        """
+        打开（或创建）数据库
+
+        Args:
+            path: 数据库文件路径
+            json_path: 旧版users.json路径，数据库首次创建时从该文件迁移数据
+        """
+        self.path = path
+        self.json_path = json_path
+        self._lock = threading.RLock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        self._init_schema()
+
+    def _init_schema(self):
+        """创建表结构，并在首次创建时迁移旧版JSON数据"""
+        with self._lock:
+            version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+            self.conn.executescript(self.SCHEMA)
+            if version == 0:
+                migrated = None
+                with self.conn:
+                    migrated = self._migrate_from_json()
+                    self.conn.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+                if migrated is not None:
+                    # 迁移提交后再改名，保证只迁移一次且不丢数据
+                    migrated_path = self.json_path + '.migrated'
+                    json_dir = os.path.dirname(self.json_path)
+                    for path in (self.json_path, os.path.join(json_dir, 'journal'),
+                                 os.path.join(json_dir, 'journal.compacting')):
+                        if os.path.exists(path):
+                            os.replace(path, path + '.migrated')
+                    Logger.info(f"UserStore: 已从 {self.json_path} 迁移 {migrated} 个用户，"
+                                f"原文件保存为 {migrated_path}")
+            elif version < self.SCHEMA_VERSION:
+                # 新增的表已由CREATE TABLE IF NOT EXISTS创建，汇总表需根据已有记录填充一次
+                with self.conn:
+                    if version < 3:
+                        self._backfill_rollups()
+                    self.conn.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+
+    def _backfill_rollups(self):
+        """根据已有训练记录计算汇总表（升级数据库时在事务中调用一次）"""
+        rollups = {}
+        for row in self.conn.execute('SELECT username, date, count, duration FROM sessions'):
+            for period, key in period_keys(row['date']):
+                bucket = rollups.get((row['username'], period, key))
+                if bucket is None:
+                    bucket = rollups[(row['username'], period, key)] = new_bucket(key)
+                add_to_bucket(bucket, self._record_from_row(row))
+        self.conn.execute('DELETE FROM rollups')
+        self.conn.executemany(
+            'INSERT INTO rollups (username, period, key, reps, sessions, duration, best) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [(username, period, key, b['reps'], b['sessions'], b['duration'], b['best'])
+             for (username, period, key), b in rollups.items()])
+        Logger.info(f"UserStore: 已生成 {len(rollups)} 条训练量汇总")
+
+    def _migrate_from_json(self):
+        """
+        一次性迁移旧版users.json（在事务中调用）
+
+        Returns:
+            int: 迁移的用户数，没有可迁移的文件时返回None
+        """
+        if not self.json_path:
+            return None
+        json_dir = os.path.dirname(self.json_path)
+        if not any(os.path.exists(path) for path in (
+                self.json_path, os.path.join(json_dir, 'journal'),
+                os.path.join(json_dir, 'journal.compacting'))):
+            return None
+        try:
+            # 通过JsonUserStore加载，包含尚未压缩进快照的日志
+            users_data = JsonUserStore(self.json_path).load_all()
+        except Exception as e:
+            Logger.error(f"UserStore: 读取旧版用户数据失败，跳过迁移: {e}")
+            return None
+
+        self._write_users(users_data)
+        return len(users_data)
+
+    def _write_users(self, users_data):
+        """
+        写入用户及其全部记录（在事务中调用）
+
+        load_user不加载动作事件，内存中没有reps的记录沿用数据库中同一次训练（日期和次数相同）已保存的事件
+        """
+        fields = ', '.join(self.REP_EVENT_FIELDS)
+        for username, user_data in users_data.items():
+            self.conn.execute(
+                'INSERT OR REPLACE INTO users '
+                '(username, password_hash, name, created_at, total_pushups, best_session) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (username, user_data['password_hash'], user_data.get('name', ''),
+                 user_data['created_at'], user_data.get('total_pushups', 0),
+                 user_data.get('best_session', 0)))
+            saved_reps = {
+                (row['date'], row['count']): tuple(row)[2:] for row in self.conn.execute(
+                    f'SELECT s.date, s.count, e.reps, {fields} FROM sessions s '
+                    'JOIN rep_events e ON e.session_id = s.id WHERE s.username = ?', (username,))}
+            self.conn.execute(
+                'DELETE FROM rep_events WHERE session_id IN (SELECT id FROM sessions WHERE username = ?)',
+                (username,))
+            self.conn.execute('DELETE FROM sessions WHERE username = ?', (username,))
+            self.conn.execute('DELETE FROM rollups WHERE username = ?', (username,))
+            for record in user_data.get('pushup_records', []):
+                session_id = self._insert_session(username, record)
+                reps = None if record.get('reps') else saved_reps.pop((record['date'], record['count']), None)
+                if reps is not None:
+                    self.conn.execute(
+                        f'INSERT INTO rep_events (session_id, reps, {fields}) VALUES (?, ?, ?, ?, ?, ?)',
+                        (session_id, *reps))
+
+    def _insert_session(self, username, record):
+        """
+        插入一条训练记录及其动作事件，并计入各时间段的汇总（在事务中调用）
+
+        Returns:
+            int: 训练记录的id
+        """
+        cursor = self.conn.execute(
+            'INSERT INTO sessions (username, date, count, duration) VALUES (?, ?, ?, ?)',
+            (username, record['date'], record['count'], record.get('duration')))
+        self.conn.executemany(
+            'INSERT INTO rollups (username, period, key, reps, sessions, duration, best) '
+            'VALUES (?, ?, ?, ?, 1, ?, ?) '
+            'ON CONFLICT (username, period, key) DO UPDATE SET '
+            'reps = reps + excluded.reps, sessions = sessions + 1, '
+            'duration = duration + excluded.duration, best = MAX(best, excluded.best)',
+            [(username, period, key, record['count'], record.get('duration') or 0.0, record['count'])
+             for period, key in period_keys(record['date'])])
+        if record.get('reps'):
+            blobs = columns_to_bytes(decode_columns(record['reps']))
+            self.conn.execute(
+                f'INSERT INTO rep_events (session_id, reps, {", ".join(self.REP_EVENT_FIELDS)}) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (cursor.lastrowid, len(blobs['start']) // 4,
+                 *(blobs[name] for name in REP_COLUMNS)))
+        return cursor.lastrowid
+
+    @staticmethod
+    def _user_from_row(row):
+        return {
+            'password_hash': row['password_hash'],
+            'name': row['name'],
+            'created_at': row['created_at'],
+            'pushup_records': [],
+            'total_pushups': row['total_pushups'],
+            'best_session': row['best_session']
+        }
+
+    @staticmethod
+    def _record_from_row(row):
+        return {'count': row['count'], 'date': row['date'], 'duration': row['duration']}
+
+    def load_all(self):
+        """
+        加载全部用户数据
+
+        Returns:
+            dict: 用户名 -> 用户数据（与UserManager.users_data格式相同）
+        """
+        with self._lock:
+            users_data = {}
+            for row in self.conn.execute('SELECT * FROM users'):
+                users_data[row['username']] = self._user_from_row(row)
+            for row in self.conn.execute(
+                    'SELECT username, date, count, duration FROM sessions ORDER BY id'):
+                user_data = users_data.get(row['username'])
+                if user_data is not None:
+                    user_data['pushup_records'].append(self._record_from_row(row))
+            return users_data
+
+    def list_users(self):
+        """
+        获取全部用户名（只读索引列）
+
+        Returns:
+            list: 用户名列表
+        """
+        with self._lock:
+            return [row[0] for row in self.conn.execute('SELECT username FROM users')]
+
+    def load_user(self, username):
+        """
+        加载单个用户的资料和记录
+
+        Returns:
+            dict: 用户数据，不存在时返回None
+        """
+        with self._lock:
+            row = self.conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+            if row is None:
+                return None
+            user_data = self._user_from_row(row)
+            user_data['pushup_records'] = [
+                self._record_from_row(record) for record in self.conn.execute(
+                    'SELECT date, count, duration FROM sessions WHERE username = ? ORDER BY id',
+                    (username,))]
+            return user_data
+
+    def save_all(self, users_data):
+        """写入给定用户的全部数据（正常流程中每次修改已单独提交，无需调用）"""
+        with self._lock, self.conn:
+            self._write_users(users_data)
+
+    def create_user(self, username, user_data):
+        """保存新用户"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                'INSERT INTO users (username, password_hash, name, created_at, total_pushups, best_session) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (username, user_data['password_hash'], user_data.get('name', ''),
+                 user_data['created_at'], user_data.get('total_pushups', 0),
+                 user_data.get('best_session', 0)))
+
+    def add_record(self, username, record):
+        """
+        保存新的训练记录（单行插入并更新用户汇总，与历史记录数量无关）
+
+        Args:
+            username: 用户名
+            record: 新记录
+        """
+        with self._lock, self.conn:
+            self._insert_session(username, record)
+            self.conn.execute(
+                'UPDATE users SET total_pushups = total_pushups + ?, best_session = MAX(best_session, ?) '
+                'WHERE username = ?',
+                (record['count'], record['count'], username))
+
+    def query_history(self, username, start=None, end=None, limit=20, cursor=None, descending=True):
+        """
+        按日期范围分页查询训练记录（基于(username, date)索引的键集分页，与页码无关）
+
+        Args:
+            username: 用户名
+            start: 起始日期（包含）
+            end: 结束日期（包含当天）
+            limit: 每页条数
+            cursor: 上一页返回的游标，None表示第一页
+            descending: 是否按日期从新到旧排列
+
+        Returns:
+            tuple: (记录列表, 下一页游标)，没有更多记录时游标为None
+        """
+        conditions = ['username = ?']
+        params = [username]
+        low, high = date_bounds(start, end)
+        if low:
+            conditions.append('date >= ?')
+            params.append(low)
+        if high:
+            conditions.append('date < ?')
+            params.append(high)
+        if cursor is not None:
+            conditions.append('(date, id) < (?, ?)' if descending else '(date, id) > (?, ?)')
+            params.extend(decode_cursor(cursor))
+        order = 'DESC' if descending else 'ASC'
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self.conn.execute(
+                f'SELECT id, date, count, duration FROM sessions WHERE {" AND ".join(conditions)} '
+                f'ORDER BY date {order}, id {order} LIMIT ?', params).fetchall()
+
+        records = [self._record_from_row(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last['date'], last['id'])
+        return records, next_cursor
+
+    def load_rollups(self, username):
+        """
+        读取持久化的按日/周/月汇总（主键范围读取，与历史记录数量无关）
+
+        Returns:
+            dict: 时间段 -> 按键升序排列的汇总列表（period、reps、sessions、duration、best）
+        """
+        rollups = {period: [] for period in PERIODS}
+        with self._lock:
+            rows = self.conn.execute(
+                'SELECT period, key, reps, sessions, duration, best FROM rollups '
+                'WHERE username = ? ORDER BY period, key', (username,)).fetchall()
+        for row in rows:
+            rollups[row['period']].append({'period': row['key'], 'reps': row['reps'],
+                                           'sessions': row['sessions'], 'duration': row['duration'],
+                                           'best': row['best']})
+        return rollups
+
+    def load_rep_events(self, username, start=None, end=None):
+        """
+        加载日期范围内各次训练的动作事件
+
+        Args:
+            username: 用户名
+            start: 起始日期（包含）
+            end: 结束日期（包含当天）
+
+        Returns:
+            list: 每次训练的列数据（列名 -> float32数组）
+        """
+        conditions = ['s.username = ?']
+        params = [username]
+        low, high = date_bounds(start, end)
+        if low:
+            conditions.append('s.date >= ?')
+            params.append(low)
+        if high:
+            conditions.append('s.date < ?')
+            params.append(high)
+        with self._lock:
+            rows = self.conn.execute(
+                f'SELECT {", ".join("r." + field for field in self.REP_EVENT_FIELDS)} '
+                'FROM sessions s JOIN rep_events r ON r.session_id = s.id '
+                f'WHERE {" AND ".join(conditions)} ORDER BY s.date, s.id', params).fetchall()
+        return [columns_from_bytes(dict(zip(REP_COLUMNS, row))) for row in rows]
+
+    def iter_users(self):
+        """
+        逐个获取用户资料（不含训练记录）
+
+        Yields:
+            tuple: (用户名, 资料字典：password_hash、name、created_at)
+        """
+        for row in self._iter_rows('SELECT username, password_hash, name, created_at FROM users '
+                                   'ORDER BY username'):
+            yield row['username'], {'password_hash': row['password_hash'], 'name': row['name'],
+                                    'created_at': row['created_at']}
+
+    def iter_sessions(self, username):
+        """
+        逐条获取用户的训练记录（按写入顺序）
+
+        Yields:
+            dict: 训练记录（有动作事件时包含reps）
+        """
+        query = (f'SELECT s.date, s.count, s.duration, '
+                 f'{", ".join("r." + field for field in self.REP_EVENT_FIELDS)} '
+                 'FROM sessions s LEFT JOIN rep_events r ON r.session_id = s.id '
+                 'WHERE s.username = ? ORDER BY s.id')
+        for row in self._iter_rows(query, (username,)):
+            record = self._record_from_row(row)
+            if row['start_time'] is not None:
+                record['reps'] = encode_columns(columns_from_bytes(
+                    {name: row[field] for name, field in zip(REP_COLUMNS, self.REP_EVENT_FIELDS)}))
+            yield record
+
+    def _iter_rows(self, query, params=(), batch_size=1000):
+        """
+        使用独立的只读连接分批读取（WAL模式下不阻塞写入线程）
+
+        Yields:
+            sqlite3.Row: 查询结果行
+        """
+        # 路径中的?、#、%等字符需转义，否则会被当作URI的查询参数或片段
+        conn = sqlite3.connect(f'{pathlib.Path(os.path.abspath(self.path)).as_uri()}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+
+    def session_dates(self, username):
+        """获取用户已有训练记录的日期集合（导入时去重）"""
+        with self._lock:
+            return {row[0] for row in self.conn.execute(
+                'SELECT date FROM sessions WHERE username = ?', (username,))}
+
+    def import_records(self, username, records):
+        """
+        批量追加训练记录（导入时使用，单个事务）
+
+        Args:
+            username: 用户名（需已存在）
+            records: 训练记录列表
+        """
+        if not records:
+            return
+        with self._lock, self.conn:
+            for record in records:
+                self._insert_session(username, record)
+            counts = [record['count'] for record in records]
+            self.conn.execute(
+                'UPDATE users SET total_pushups = total_pushups + ?, best_session = MAX(best_session, ?) '
+                'WHERE username = ?',
+                (sum(counts), max(counts), username))
+
+    def set_fsync(self, enabled):
+        """设置每次提交是否fsync（FULL），否则WAL只在检查点时同步（NORMAL）"""
+        with self._lock:
+            self.conn.execute(f'PRAGMA synchronous={"FULL" if enabled else "NORMAL"}')
+
+    def sync(self):
+        """执行WAL检查点，把已提交的事务同步到磁盘"""
+        with self._lock:
+            self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self.conn.close()
+
+
+def create_user_store(backend, data_dir):
+    """
+    创建用户数据存储
+
+    Args:
+        backend: 'sqlite' 或 'json'
+        data_dir: 数据目录
+
+    Returns:
+        存储对象
+    """
+    json_path = os.path.join(data_dir, 'users.json')
+    if backend == 'json':
+        return JsonUserStore(json_path)
+    if backend == 'sqlite':
+        return SQLiteUserStore(os.path.join(data_dir, 'users.db'), json_path=json_path)
+    raise ValueError(f"未知的存储后端: {backend}")
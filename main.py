@@ -6,42 +6,40 @@
 """
 
 import os
+
+# 启动计时起点，需在其他模块之前导入
+from utils.startup import startup_timeline
+
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager, Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
-from kivy.uix.filechooser import FileChooserIconView
-from kivy.uix.popup import Popup
-from kivy.uix.progressbar import ProgressBar
 from kivy.logger import Logger
 from kivy.config import Config
-from kivy.core.text import LabelBase
 from kivy.clock import Clock
-from kivy.graphics.texture import Texture
-from kivy.uix.image import Image
-from kivy.uix.camera import Camera
 
 # 配置Kivy
 Config.set('graphics', 'width', '360')
 Config.set('graphics', 'height', '640')
 Config.set('graphics', 'resizable', False)
 
-# 导入自定义模块
+# 导入自定义模块（摄像头、文件选择器等较重的模块在首次使用时才导入）
 try:
-    from utils.permissions import request_permissions
-    from utils.camera_handler import CameraHandler
+    from utils.permissions import request_permissions, permission_manager
     from assets.fonts import register_fonts, get_font_name
 except ImportError as e:
     Logger.warning(f"PushupCounter: 导入模块失败: {e}")
     request_permissions = None
-    CameraHandler = None
+    permission_manager = None
     register_fonts = None
     get_font_name = lambda: 'Roboto'
+startup_timeline.mark('imports')
 
-# 注册字体
+# 注册字体（有缓存时直接注册，否则在后台探测系统字体，创建第一个控件前再等待）
 if register_fonts:
-    register_fonts()
+    register_fonts(background=True)
+startup_timeline.mark('fonts')
 
 
 class MainScreen(Screen):
@@ -70,6 +68,7 @@ class MainScreen(Screen):
         # 添加摄像头预览区域
         self.camera_layout = BoxLayout(size_hint_y=0.4)
         try:
+            from kivy.uix.camera import Camera
             self.camera = Camera(play=False, resolution=(640, 480))
             self.camera_layout.add_widget(self.camera)
         except Exception as e:
@@ -128,6 +127,22 @@ class MainScreen(Screen):
 
         self.add_widget(layout)
 
+    def pause_session(self, release_model=False):
+        """应用切到后台时停止摄像头预览"""
+        camera = getattr(self, 'camera', None)
+        self.camera_was_playing = bool(camera and camera.play)
+        if self.camera_was_playing:
+            camera.play = False
+        return {'count': self.count}
+
+    def resume_session(self):
+        """应用恢复时重新打开之前在预览的摄像头"""
+        if getattr(self, 'camera_was_playing', False):
+            self.camera.play = True
+            self.camera_was_playing = False
+            return True
+        return False
+
     def increment_count(self, instance):
         """增加计数"""
         self.count += 1
@@ -157,6 +172,9 @@ class MainScreen(Screen):
     def upload_video(self, instance):
         """上传视频文件"""
         try:
+            from kivy.uix.filechooser import FileChooserIconView
+            from kivy.uix.popup import Popup
+
             # 创建文件选择器弹窗
             content = BoxLayout(orientation='vertical', spacing=10, padding=10)
 
@@ -208,6 +226,8 @@ class MainScreen(Screen):
         """处理视频上传"""
         try:
             Logger.info(f"PushupCounter: Processing video upload: {file_path}")
+            from kivy.uix.popup import Popup
+            from kivy.uix.progressbar import ProgressBar
 
             # 创建上传进度弹窗
             content = BoxLayout(orientation='vertical', spacing=10, padding=20)
@@ -248,6 +268,9 @@ class MainScreen(Screen):
 class PushupCounterApp(App):
     """俯卧撑计数应用主类"""
 
+    # 切到后台时常驻内存超过该值则同时释放姿态模型
+    model_release_rss = 256 * 1024 * 1024
+
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.screen_manager = None
@@ -256,10 +279,8 @@ class PushupCounterApp(App):
         """构建应用界面"""
         # 创建屏幕管理器
         self.screen_manager = ScreenManager()
-
-        # 添加主屏幕
-        main_screen = MainScreen(name='main')
-        self.screen_manager.add_widget(main_screen)
+        self.screen_manager.add_widget(MainScreen(name='main'))
+        startup_timeline.mark('ui_build')
 
         return self.screen_manager
 
@@ -267,6 +288,12 @@ class PushupCounterApp(App):
         """应用启动时的初始化"""
         Logger.info("PushupCounter: Application started")
 
+        # on_start在首帧绘制前调用，下一帧时首帧已显示
+        def on_first_frame(dt):
+            startup_timeline.mark('first_frame')
+            startup_timeline.log_report()
+        Clock.schedule_once(on_first_frame, 0)
+
         # 请求权限
         if request_permissions:
             try:
@@ -278,15 +305,35 @@ class PushupCounterApp(App):
     def on_pause(self):
         """应用暂停时保存数据"""
         Logger.info("PushupCounter: Application paused")
+        # 释放摄像头（内存紧张时连同模型），保存训练状态
+        from utils.latency import get_process_rss
+        release_model = get_process_rss() > self.model_release_rss
+        for screen in self.screen_manager.screens:
+            if hasattr(screen, 'pause_session'):
+                screen.pause_session(release_model=release_model)
+
+        # 应用可能在后台被系统结束，先写完排队中的训练记录
+        user_manager = getattr(self, 'user_manager', None)
+        if user_manager is not None:
+            user_manager.flush()
         return True
 
     def on_resume(self):
         """应用恢复时的处理"""
         Logger.info("PushupCounter: Application resumed")
+        # 用户可能在后台时修改了系统权限设置
+        if permission_manager is not None:
+            permission_manager.refresh()
+        for screen in self.screen_manager.screens:
+            if hasattr(screen, 'resume_session'):
+                screen.resume_session()
 
     def on_stop(self):
         """应用停止时的清理"""
         Logger.info("PushupCounter: Application stopped")
+        user_manager = getattr(self, 'user_manager', None)
+        if user_manager is not None:
+            user_manager.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+训练历史列表
+基于RecycleView，只为可见行创建控件，滚动接近底部时再按页加载更早的记录；
+每页在后台查询，结果到达后再追加，滚动时不阻塞界面线程
+"""
+
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.properties import StringProperty
+from kivy.metrics import dp
+from kivy.logger import Logger
+
+
+class HistoryRow(BoxLayout):
+    """单条训练记录（由RecycleView复用）"""
+
+    date_text = StringProperty('')
+    count_text = StringProperty('')
+    duration_text = StringProperty('')
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('orientation', 'horizontal')
+        kwargs.setdefault('spacing', dp(10))
+        super().__init__(**kwargs)
+
+        # 日期
+        date_label = Label(
+            font_size=dp(14),
+            size_hint_x=0.4,
+            color=(0.4, 0.4, 0.4, 1)
+        )
+        self.add_widget(date_label)
+
+        # 次数
+        count_label = Label(
+            font_size=dp(16),
+            size_hint_x=0.3,
+            color=(0.2, 0.2, 0.2, 1),
+            bold=True
+        )
+        self.add_widget(count_label)
+
+        # 时长
+        duration_label = Label(
+            font_size=dp(14),
+            size_hint_x=0.3,
+            color=(0.6, 0.6, 0.6, 1)
+        )
+        self.add_widget(duration_label)
+
+        self.bind(date_text=date_label.setter('text'),
+                  count_text=count_label.setter('text'),
+                  duration_text=duration_label.setter('text'))
+
+
+class HistoryList(RecycleView):
+    """分页加载的训练历史列表"""
+
+    def __init__(self, page_size=30, **kwargs):
+        """
+        初始化历史列表
+
+        Args:
+            page_size: 每次加载的记录数
+        """
+        super().__init__(**kwargs)
+        self.page_size = page_size
+        self.viewclass = HistoryRow
+
+        layout = RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, dp(40)),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            spacing=dp(5)
+        )
+        layout.bind(minimum_height=layout.setter('height'))
+        self.add_widget(layout)
+        # 已加载的内容不足一屏时无法滚动，不会触发_on_scroll，内容或视图高度变化后自行加载下一页
+        layout.bind(height=self._fill_viewport)
+        self.bind(height=self._fill_viewport)
+
+        self.page_loader = None
+        self.on_page = None
+        self.next_cursor = None
+        self.exhausted = True
+        self.loading = False
+        # 每次reload递增，丢弃上一次加载中迟到的结果
+        self._generation = 0
+        self.bind(scroll_y=self._on_scroll)
+
+    def reload(self, page_loader, on_page=None):
+        """
+        清空列表并加载第一页
+
+        Args:
+            page_loader: 函数 (cursor, callback)，在主线程中以
+                         {'records': [...], 'next_cursor': ...} 调用callback，
+                         见UserManager.query_history；结果为None表示无数据
+            on_page: 每页追加到列表后调用的函数（无参数）
+        """
+        self.page_loader = page_loader
+        self.on_page = on_page
+        self.next_cursor = None
+        self.exhausted = False
+        self.loading = False
+        self._generation += 1
+        self.data = []
+        self.scroll_y = 1
+        self.load_more()
+
+    def load_more(self):
+        """请求下一页，结果到达后追加到列表末尾"""
+        if self.exhausted or self.loading or self.page_loader is None:
+            return
+        self.loading = True
+        generation = self._generation
+        try:
+            self.page_loader(self.next_cursor, lambda page: self._on_page_loaded(generation, page))
+        except Exception as e:
+            Logger.error(f"HistoryList: 加载历史记录失败: {e}")
+            self._on_page_loaded(generation, None)
+
+    def _on_page_loaded(self, generation, page):
+        """追加一页记录（主线程中调用）"""
+        if generation != self._generation:
+            return
+        self.loading = False
+        if not page:
+            self.exhausted = True
+        else:
+            self.data.extend(self.format_record(record) for record in page['records'])
+            self.next_cursor = page['next_cursor']
+            self.exhausted = self.next_cursor is None
+        if self.on_page:
+            self.on_page()
+
+    def _fill_viewport(self, *args):
+        """内容高度不超过视图高度（无法滚动）时加载下一页"""
+        if self.data and self.children and self.children[0].height <= self.height:
+            self.load_more()
+
+    def _on_scroll(self, instance, scroll_y):
+        """剩余未显示的内容不足一屏时预取下一页"""
+        hidden = self.children[0].height - self.height if self.children else 0
+        if hidden <= 0 or scroll_y * hidden < self.height:
+            self.load_more()
+
+    @staticmethod
+    def format_record(record):
+        """
+        把记录转换为列表行数据
+
+        Args:
+            record: 训练记录字典
+
+        Returns:
+            dict: HistoryRow的属性
+        """
+        duration_text = ''
+        if record.get('duration'):
+            duration_text = f'{record["duration"]:.1f}s'
+        return {
+            'date_text': record['date'][:10],  # 只显示日期部分
+            'count_text': f'{record["count"]} 个',
+            'duration_text': duration_text
+        }
@@ -158,6 +158,10 @@ class LoginScreen(Screen):
         if app.login_user(username, password):
             self.show_message('成功', '登录成功！', self.on_login_success)
             Logger.info(f"LoginScreen: 用户 {username} 登录成功")
+            
+            # 用户即将开始训练，在后台提前加载姿态模型
+            from core.detector_pool import detector_pool
+            detector_pool.prewarm()
         else:
             self.show_message('错误', '用户名或密码错误！')
             Logger.warning(f"LoginScreen: 用户 {username} 登录失败")
@@ -5,6 +5,7 @@
 包含摄像头检测、视频上传、实时显示等功能
 """
 
+import os
 import cv2
 import numpy as np
 from kivy.uix.screenmanager import Screen
@@ -13,15 +14,17 @@ from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.image import Image
 from kivy.uix.popup import Popup
-from kivy.uix.filechooser import FileChooserIconView
 from kivy.graphics.texture import Texture
 from kivy.clock import Clock
 from kivy.metrics import dp
 from kivy.logger import Logger
 
-from core.pose_detector import PoseDetector
+from core.detector_pool import detector_pool
 from utils.camera_handler import CameraHandler
 from utils.permissions import permission_manager
+from utils.latency import FrameTiming, LatencyMonitor, get_process_rss, now
+from utils.tracing import tracer
+from screens.perf_hud import PerfHUD
 
 
 class MainScreen(Screen):
@@ -32,14 +35,39 @@ class MainScreen(Screen):
         
         # 初始化组件
         self.pose_detector = None
+        self.detection_start_time = None
+        self.first_frame_event = 'start_to_first_frame'
         self.camera_handler = None
         self.is_detecting = False
         self.current_frame = None
         
+        # 应用切到后台时保存的会话状态（见pause_session）
+        self.paused_state = None
+        
+        # 多进程模式：采集和推理在独立进程中运行（多核桌面设备）
+        self.multiprocess = os.environ.get('PUSHUP_MULTIPROCESS') == '1'
+        self.pipeline = None
+        self.pipeline_event = None
+        
+        # 上传视频分析：视频文件和逐帧处理的定时器（暂停时取消定时器，保留文件读取位置）
+        self.video_capture = None
+        self.video_event = None
+        
+        # 帧源（为空时使用真实摄像头），如 synthetic 或 video:/sdcard/test.mp4
+        self.camera_source = os.environ.get('PUSHUP_CAMERA_SOURCE')
+        
         # 统计信息
         self.session_start_time = None
         self.session_counter = 0
         
+        # 延迟统计（当前处理中的帧时间戳和上次会话的报告）
+        self.latency_monitor = LatencyMonitor()
+        self.frame_timing = None
+        self.last_latency_report = None
+        
+        # 追踪文件路径（为空时不开启追踪），如 /sdcard/pushup_trace.json
+        self.trace_path = os.environ.get('PUSHUP_TRACE')
+        
         self.build_ui()
     
     def build_ui(self):
@@ -60,6 +88,12 @@ class MainScreen(Screen):
         self.build_stats_area(main_layout)
         
         self.add_widget(main_layout)
+        
+        # 性能浮层（覆盖在界面上方）
+        self.perf_hud = PerfHUD(self.get_performance_snapshot)
+        self.add_widget(self.perf_hud)
+        if os.environ.get('PUSHUP_HUD') == '1':
+            self.perf_hud.show()
     
     def build_top_bar(self, parent_layout):
         """构建顶部信息栏"""
@@ -83,6 +117,17 @@ class MainScreen(Screen):
         )
         top_layout.add_widget(self.user_label)
         
+        # 性能浮层开关
+        hud_button = Button(
+            text='性能',
+            size_hint_x=None,
+            width=dp(60),
+            font_size=dp(14),
+            background_color=(0.4, 0.4, 0.4, 1)
+        )
+        hud_button.bind(on_press=self.on_toggle_hud)
+        top_layout.add_widget(hud_button)
+        
         # 登出按钮
         logout_button = Button(
             text='登出',
@@ -221,19 +266,38 @@ class MainScreen(Screen):
                 frame_rgb = frame
 
             # 创建纹理
-            height, width = frame_rgb.shape[:2]
-            texture = Texture.create(size=(width, height))
-            texture.blit_buffer(frame_rgb.flatten(), colorfmt='rgb', bufferfmt='ubyte')
-            texture.flip_vertical()
-
-            # 更新图像
-            self.video_image.texture = texture
+            frame_id = self.frame_timing.frame_id if self.frame_timing is not None else None
+            with tracer.span('ui_upload', frame_id):
+                height, width = frame_rgb.shape[:2]
+                texture = Texture.create(size=(width, height))
+                texture.blit_buffer(frame_rgb.flatten(), colorfmt='rgb', bufferfmt='ubyte')
+                texture.flip_vertical()
+
+                # 更新图像
+                self.video_image.texture = texture
+
+            # 记录显示时间（每帧只记录一次）
+            if self.frame_timing is not None:
+                self.frame_timing.display = now()
+                self.latency_monitor.record(self.frame_timing)
+                self.frame_timing = None
 
         except Exception as e:
             Logger.error(f"MainScreen: 更新视频显示失败: {e}")
 
     def on_frame_callback(self, frame, counter, stage, arm_angle, leg_angle):
         """帧处理回调函数"""
+        # 从点击开始（或从后台恢复）到第一帧完成推理的耗时
+        if self.detection_start_time is not None:
+            elapsed = now() - self.detection_start_time
+            self.latency_monitor.record_event(self.first_frame_event, elapsed)
+            Logger.info(f"MainScreen: {self.first_frame_event} {elapsed * 1000:.0f} ms")
+            self.detection_start_time = None
+
+        # 标记计数增加的帧，用于统计计数事件延迟
+        if counter > self.session_counter and self.frame_timing is not None:
+            self.frame_timing.rep = True
+
         # 更新显示
         self.update_video_display(frame)
 
@@ -262,46 +326,212 @@ class MainScreen(Screen):
             return
 
         try:
-            # 初始化姿态检测器
-            self.pose_detector = PoseDetector(callback=self.on_frame_callback)
+            start_time = now()
 
-            # 初始化摄像头
-            self.camera_handler = CameraHandler()
-            self.camera_handler.set_frame_callback(self.on_camera_frame)
+            if self.multiprocess:
+                started = self.start_pipeline()
+            else:
+                # 获取已加载模型的姿态检测器
+                self.pose_detector = detector_pool.acquire(callback=self.on_frame_callback)
+
+                # 初始化摄像头
+                started = self.start_camera()
 
-            if self.camera_handler.start_capture():
+            if started:
                 self.is_detecting = True
                 self.start_button.text = '停止检测'
                 self.start_button.background_color = (0.8, 0.3, 0.3, 1)
 
                 # 重置计数器
                 self.session_counter = 0
+                self.session_start_time = now()
+                self.latency_monitor.reset()
+                self.detection_start_time = start_time
+                self.first_frame_event = 'start_to_first_frame'
+                self.start_tracing()
 
                 Logger.info("MainScreen: 开始俯卧撑检测")
             else:
+                if self.pose_detector:
+                    detector_pool.release(self.pose_detector)
+                    self.pose_detector = None
                 self.show_message('错误', '无法启动摄像头')
 
         except Exception as e:
             Logger.error(f"MainScreen: 启动检测失败: {e}")
             self.show_message('错误', f'启动检测失败: {str(e)}')
 
+    def start_camera(self):
+        """
+        创建并启动摄像头（帧交给当前的检测器）
+
+        Returns:
+            bool: 是否启动成功
+        """
+        self.camera_handler = CameraHandler(source=self.camera_source)
+        self.camera_handler.set_frame_callback(self.on_camera_frame)
+        # 按推理需要的分辨率采集，避免采集过大的帧再缩小
+        self.camera_handler.set_requirements(*self.pose_detector.get_capture_requirements())
+        if self.camera_handler.start_capture():
+            return True
+        self.camera_handler = None
+        return False
+
+    def start_pipeline(self):
+        """
+        多进程模式：启动采集进程和推理进程，界面定时取回结果
+
+        Returns:
+            bool: 是否启动成功
+        """
+        from core.process_pipeline import ProcessPipeline
+
+        self.pipeline = ProcessPipeline(source=self.camera_source,
+                                        backend=os.environ.get('PUSHUP_POSE_BACKEND'))
+        if not self.pipeline.start():
+            self.pipeline = None
+            return False
+        self.pipeline_event = Clock.schedule_interval(self.poll_pipeline, 1 / 60.0)
+        return True
+
+    def poll_pipeline(self, dt):
+        """多进程模式：显示推理进程的最新结果帧，帧源结束时停止检测"""
+        if self.pipeline is None:
+            return False
+        messages = self.pipeline.poll()
+        if messages:
+            message = messages[-1]
+            display = self.pipeline.read_display()
+            if display is not None:
+                self.frame_timing = self.pipeline.timing_from_message(message)
+                self.on_frame_callback(display[2], message['counter'], message['stage'],
+                                       message['arm_angle'], message['leg_angle'])
+        if self.pipeline.finished:
+            self.stop_detection()
+            return False
+        return True
+
+    def stop_pipeline(self):
+        """
+        多进程模式：停止流水线
+
+        Returns:
+            dict: 动作事件列数据，未取得最终状态时返回None
+        """
+        if self.pipeline_event is not None:
+            self.pipeline_event.cancel()
+            self.pipeline_event = None
+        final = self.pipeline.stop()
+        self.pipeline = None
+        if final is None:
+            return None
+        self.session_counter = max(self.session_counter, final['counter'])
+        return final['reps']
+
+    def pause_session(self, release_model=False):
+        """
+        应用切到后台：释放摄像头，保存会话状态
+
+        Args:
+            release_model: 是否同时释放姿态模型（内存紧张时），恢复时重新加载
+
+        Returns:
+            dict: 保存的会话状态，未在检测时返回None
+        """
+        if not self.is_detecting:
+            return None
+        if self.pipeline is not None:
+            # 多进程模式不保留后台会话，直接结束并保存
+            self.stop_detection()
+            return None
+        self.is_detecting = False
+        if self.camera_handler:
+            self.camera_handler.stop_capture()
+            self.camera_handler = None
+        if self.video_event is not None:
+            # 视频分析只停止逐帧处理，视频文件保持打开，恢复时从当前位置继续
+            self.video_event.cancel()
+            self.video_event = None
+
+        self.paused_state = {
+            'detector': self.pose_detector.snapshot_state(),
+            'session_counter': self.session_counter,
+            'elapsed': now() - self.session_start_time if self.session_start_time else 0.0,
+            'video': self.video_capture is not None
+        }
+        if release_model:
+            # 只释放本界面的检测器，池中其他空闲检测器（如预热好的）保持不变
+            self.pose_detector.cleanup()
+            self.pose_detector = None
+
+        Logger.info(f"MainScreen: 暂停训练（计数 {self.session_counter}，"
+                    f"{'已' if release_model else '未'}释放模型）")
+        return self.paused_state
+
+    def resume_session(self):
+        """
+        应用回到前台：恢复pause_session保存的会话，重新打开摄像头或继续处理视频
+
+        Returns:
+            bool: 是否恢复了训练
+        """
+        state, self.paused_state = self.paused_state, None
+        if state is None:
+            return False
+        resume_time = now()
+
+        try:
+            if self.pose_detector is None:
+                self.pose_detector = detector_pool.acquire(callback=self.on_frame_callback)
+            # 无论模型是否被释放都重新恢复，动作事件的时间原点随之后移，后台期间不计入
+            self.pose_detector.restore_state(state['detector'])
+            self.session_counter = state['session_counter']
+            self.session_start_time = resume_time - state['elapsed']
+
+            if state['video']:
+                started = self.video_capture is not None
+                if started:
+                    self.schedule_video_frames()
+            else:
+                started = self.start_camera()
+            if started:
+                self.is_detecting = True
+                self.detection_start_time = resume_time
+                self.first_frame_event = 'resume_to_first_frame'
+                Logger.info(f"MainScreen: 恢复训练（计数 {self.session_counter}）")
+                return True
+        except Exception as e:
+            Logger.error(f"MainScreen: 恢复训练失败: {e}")
+
+        # 无法继续时保存已完成的部分
+        self.show_message('错误', '无法恢复摄像头，训练已结束')
+        self.stop_detection()
+        return False
+
     def stop_detection(self):
         """停止检测"""
         try:
+            stop_time = now()
             self.is_detecting = False
 
             # 停止摄像头
             if self.camera_handler:
                 self.camera_handler.stop_capture()
                 self.camera_handler = None
+            self.stop_video()
+            reps = self.stop_pipeline() if self.pipeline is not None else None
 
-            # 保存结果
-            if self.pose_detector and self.session_counter > 0:
-                self.save_session_result()
+            # 保存结果（后台写入，弹窗立即显示）
+            if (self.pose_detector or reps is not None) and self.session_counter > 0:
+                if self.save_session_result(reps):
+                    self.latency_monitor.record_event('stop_to_popup', now() - stop_time)
 
-            # 清理资源
+            # 输出延迟报告
+            self.finish_latency_report()
+
+            # 归还检测器（保留模型供下次使用）
             if self.pose_detector:
-                self.pose_detector.cleanup()
+                detector_pool.release(self.pose_detector)
                 self.pose_detector = None
 
             # 更新UI
@@ -317,26 +547,115 @@ class MainScreen(Screen):
     def on_camera_frame(self, frame):
         """摄像头帧回调"""
         if self.pose_detector and frame is not None:
-            processed_frame, detected = self.pose_detector.process_frame(frame)
-            if not detected:
-                # 如果没有检测到姿态，直接显示原始帧
-                self.update_video_display(frame)
-
-    def save_session_result(self):
-        """保存本次训练结果"""
+            self.frame_timing = self.camera_handler.last_timing if self.camera_handler else None
+            frame_id = self.frame_timing.frame_id if self.frame_timing is not None else None
+            with tracer.span('frame', frame_id):
+                processed_frame, detected = self.pose_detector.process_frame(
+                    frame, timing=self.frame_timing)
+                if not detected:
+                    # 如果没有检测到姿态，直接显示原始帧
+                    self.update_video_display(frame)
+            self.frame_timing = None
+
+    def start_tracing(self):
+        """开启帧流水线追踪（配置了追踪文件路径时）"""
+        if self.trace_path:
+            tracer.start(self.trace_path)
+
+    def get_performance_snapshot(self):
+        """
+        获取当前性能指标（供性能浮层显示）
+        
+        Returns:
+            dict: 采集帧率、推理帧率、丢帧数、推理p95延迟、处理间隔、采集分辨率、模型输入尺寸和常驻内存
+        """
+        snapshot = {
+            'capture_fps': 0.0,
+            'inference_fps': 0.0,
+            'dropped_frames': 0,
+            'inference_p95': self.latency_monitor.stats['inference'].summary(recent=True)['p95'],
+            'process_interval': None,
+            'resolution': None,
+            'input_size': None,
+            'rss': get_process_rss()
+        }
+        if self.pipeline is not None:
+            # 多进程模式下采集和推理在子进程中，使用流水线根据帧消息统计的数据
+            pipeline_stats = self.pipeline.get_stats()
+            snapshot['capture_fps'] = pipeline_stats['capture_fps']
+            snapshot['inference_fps'] = pipeline_stats['inference_fps']
+            snapshot['dropped_frames'] = pipeline_stats['skipped']
+            snapshot['process_interval'] = 1
+            snapshot['resolution'] = pipeline_stats['resolution']
+        if self.camera_handler:
+            capture_stats = self.camera_handler.get_capture_stats()
+            snapshot['capture_fps'] = capture_stats['fps']
+            snapshot['dropped_frames'] = capture_stats['dropped']
+            snapshot['resolution'] = capture_stats['resolution']
+        if self.pose_detector:
+            snapshot['inference_fps'] = self.pose_detector.inference_rate.rate()
+            snapshot['process_interval'] = self.pose_detector.process_interval
+            snapshot['input_size'] = self.pose_detector.backend.input_size
+        return snapshot
+
+    def on_toggle_hud(self, instance):
+        """性能浮层开关按钮事件"""
+        self.perf_hud.toggle()
+
+    def finish_latency_report(self):
+        """生成本次会话的延迟报告，并写出追踪文件"""
+        if self.latency_monitor.frames:
+            self.last_latency_report = self.latency_monitor.summary()
+            self.latency_monitor.log_report()
+        tracer.stop()
+
+    def get_latency_summary(self, recent=True):
+        """
+        获取运行时延迟统计
+
+        Args:
+            recent: True只统计最近的帧
+
+        Returns:
+            dict: 统计项名称 -> 分布摘要（毫秒）
+        """
+        return self.latency_monitor.summary(recent)
+
+    def save_session_result(self, reps=None):
+        """
+        保存本次训练结果
+
+        Args:
+            reps: 动作事件列数据，默认从检测器获取
+
+        Returns:
+            bool: 是否已显示结果弹窗
+        """
         try:
             app = self.get_app()
             if app and app.current_user:
-                # 保存到用户管理器
-                app.user_manager.add_pushup_record(app.current_user, self.session_counter)
+                # 提交到后台写入，不等待写盘
+                duration = now() - self.session_start_time if self.session_start_time else None
+                future = app.user_manager.submit_pushup_record(
+                    app.current_user, self.session_counter, duration=duration,
+                    reps=self.pose_detector.get_rep_events() if reps is None else reps)
+                if future is not None:
+                    future.add_done_callback(self.on_session_saved)
 
                 # 显示结果
                 self.show_session_result()
 
                 Logger.info(f"MainScreen: 保存训练结果: {self.session_counter} 个俯卧撑")
+                return True
 
         except Exception as e:
             Logger.error(f"MainScreen: 保存结果失败: {e}")
+        return False
+
+    def on_session_saved(self, future):
+        """训练结果写入完成（在后台写入线程中调用）"""
+        if future.exception() is not None:
+            Clock.schedule_once(lambda dt: self.show_message('错误', '训练记录保存失败'), 0)
 
     def show_session_result(self):
         """显示训练结果"""
@@ -349,6 +668,9 @@ class MainScreen(Screen):
 
     def show_file_chooser(self):
         """显示文件选择器"""
+        # 文件选择器只在上传视频时使用，首次打开时再导入
+        from kivy.uix.filechooser import FileChooserIconView
+
         content = BoxLayout(orientation='vertical', spacing=dp(10))
 
         # 文件选择器
@@ -401,42 +723,65 @@ class MainScreen(Screen):
         try:
             Logger.info(f"MainScreen: 开始处理视频: {video_path}")
 
-            # 初始化姿态检测器
-            self.pose_detector = PoseDetector(callback=self.on_frame_callback)
+            # 获取已加载模型的姿态检测器
+            self.pose_detector = detector_pool.acquire(callback=self.on_frame_callback)
 
             # 打开视频文件
             cap = cv2.VideoCapture(video_path)
 
             if not cap.isOpened():
+                detector_pool.release(self.pose_detector)
+                self.pose_detector = None
                 self.show_message('错误', '无法打开视频文件')
                 return
 
             # 重置计数器
             self.session_counter = 0
+            self.session_start_time = now()
             self.is_detecting = True
+            self.latency_monitor.reset()
+            self.start_tracing()
 
             # 处理视频帧
-            Clock.schedule_interval(lambda dt: self.process_video_frame(cap), 1.0/30.0)
+            self.video_capture = cap
+            self.schedule_video_frames()
 
         except Exception as e:
             Logger.error(f"MainScreen: 处理视频失败: {e}")
             self.show_message('错误', f'处理视频失败: {str(e)}')
 
-    def process_video_frame(self, cap):
+    def schedule_video_frames(self):
+        """开始（或暂停后继续）按30fps处理视频帧"""
+        self.video_event = Clock.schedule_interval(lambda dt: self.process_video_frame(), 1.0/30.0)
+
+    def stop_video(self):
+        """停止处理视频并关闭视频文件"""
+        if self.video_event is not None:
+            self.video_event.cancel()
+            self.video_event = None
+        if self.video_capture is not None:
+            self.video_capture.release()
+            self.video_capture = None
+
+    def process_video_frame(self):
         """处理视频帧"""
+        cap = self.video_capture
+        if cap is None:
+            return False
         try:
             ret, frame = cap.read()
 
             if not ret:
                 # 视频结束
-                cap.release()
+                self.stop_video()
                 self.is_detecting = False
+                self.finish_latency_report()
 
                 if self.session_counter > 0:
                     self.save_session_result()
 
                 if self.pose_detector:
-                    self.pose_detector.cleanup()
+                    detector_pool.release(self.pose_detector)
                     self.pose_detector = None
 
                 self.set_default_image()
@@ -444,17 +789,26 @@ class MainScreen(Screen):
 
             # 处理帧
             if self.pose_detector:
-                self.pose_detector.process_frame(frame)
+                self.frame_timing = FrameTiming(int(cap.get(cv2.CAP_PROP_POS_FRAMES)))
+                self.frame_timing.dispatch = self.frame_timing.capture
+                self.pose_detector.process_frame(frame, timing=self.frame_timing)
+                self.frame_timing = None
 
             return True  # 继续调度
 
         except Exception as e:
             Logger.error(f"MainScreen: 处理视频帧失败: {e}")
+            self.stop_video()
             return False
 
     def on_switch_camera(self, instance):
         """切换摄像头按钮事件"""
-        if self.camera_handler and self.is_detecting:
+        if self.pipeline is not None:
+            if self.pipeline.switch_camera():
+                Logger.info("MainScreen: 切换摄像头")
+            else:
+                self.show_message('提示', '当前帧源不支持切换摄像头')
+        elif self.camera_handler and self.is_detecting:
             self.camera_handler.switch_camera()
             Logger.info("MainScreen: 切换摄像头")
         else:
@@ -464,6 +818,9 @@ class MainScreen(Screen):
         """重置计数器按钮事件"""
         if self.pose_detector:
             self.pose_detector.reset_counter()
+        if self.pipeline is not None:
+            # 多进程模式下计数在推理进程中
+            self.pipeline.reset_counter()
 
         self.session_counter = 0
         self.counter_label.text = '计数: 0'
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+性能浮层
+在检测界面上方显示采集帧率、推理帧率、丢帧、推理延迟、内存等运行指标
+"""
+
+from kivy.uix.label import Label
+from kivy.graphics import Color, Rectangle
+from kivy.clock import Clock
+from kivy.metrics import dp
+
+
+class PerfHUD(Label):
+    """性能指标浮层"""
+
+    def __init__(self, stats_provider, interval=0.5, **kwargs):
+        """
+        初始化性能浮层
+
+        Args:
+            stats_provider: 无参函数，返回性能指标字典（见MainScreen.get_performance_snapshot）
+            interval: 刷新间隔（秒），默认每秒刷新2次
+        """
+        kwargs.setdefault('size_hint', (None, None))
+        kwargs.setdefault('size', (dp(200), dp(130)))
+        kwargs.setdefault('pos_hint', {'x': 0.02, 'top': 0.86})
+        kwargs.setdefault('font_size', dp(11))
+        kwargs.setdefault('halign', 'left')
+        kwargs.setdefault('valign', 'top')
+        kwargs.setdefault('color', (0.2, 1, 0.2, 1))
+        super().__init__(**kwargs)
+
+        self.stats_provider = stats_provider
+        self.interval = interval
+        self.visible = False
+        self._event = None
+        self.opacity = 0
+
+        with self.canvas.before:
+            Color(0, 0, 0, 0.6)
+            self._background = Rectangle(pos=self.pos, size=self.size)
+        self.bind(pos=self._update_background, size=self._update_background)
+
+    def _update_background(self, *args):
+        self._background.pos = self.pos
+        self._background.size = self.size
+        self.text_size = (self.width - dp(10), self.height - dp(10))
+
+    def show(self):
+        """显示浮层并开始定时刷新"""
+        if self.visible:
+            return
+        self.visible = True
+        self.opacity = 1
+        self.refresh()
+        self._event = Clock.schedule_interval(self.refresh, self.interval)
+
+    def hide(self):
+        """隐藏浮层并停止刷新"""
+        self.visible = False
+        self.opacity = 0
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def toggle(self):
+        """切换显示状态"""
+        if self.visible:
+            self.hide()
+        else:
+            self.show()
+
+    def refresh(self, dt=None):
+        """刷新显示的指标"""
+        self.text = self.format_stats(self.stats_provider())
+
+    @staticmethod
+    def format_stats(stats):
+        """
+        格式化性能指标
+
+        Args:
+            stats: 性能指标字典
+
+        Returns:
+            str: 多行文本
+        """
+        def size_text(size):
+            return f'{size[0]}x{size[1]}' if size else '-'
+
+        interval = stats.get('process_interval')
+        return '\n'.join([
+            f"Capture FPS: {stats.get('capture_fps', 0):.1f}",
+            f"Inference FPS: {stats.get('inference_fps', 0):.1f}",
+            f"Dropped: {stats.get('dropped_frames', 0)}",
+            f"Inference p95: {stats.get('inference_p95', 0):.1f} ms",
+            f"Interval: {interval if interval is not None else '-'}",
+            f"Capture: {size_text(stats.get('resolution'))}",
+            f"Model input: {size_text(stats.get('input_size'))}",
+            f"RSS: {stats.get('rss', 0) / (1024 * 1024):.1f} MB",
+        ])
@@ -9,10 +9,11 @@ from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
-from kivy.uix.scrollview import ScrollView
 from kivy.metrics import dp
 from kivy.logger import Logger
 
+from screens.history_list import HistoryList
+
 
 class ResultScreen(Screen):
     """结果展示界面"""
@@ -99,7 +100,7 @@ class ResultScreen(Screen):
         """构建历史记录区域"""
         # 历史记录标题
         history_title = Label(
-            text='最近记录',
+            text='训练记录',
             font_size=dp(18),
             size_hint_y=None,
             height=dp(40),
@@ -107,19 +108,20 @@ class ResultScreen(Screen):
         )
         parent_layout.add_widget(history_title)
         
-        # 滚动视图
-        scroll = ScrollView()
-        
-        # 历史记录布局
-        self.history_layout = BoxLayout(
-            orientation='vertical',
+        # 无记录提示（有记录时隐藏）
+        self.no_data_label = Label(
+            text='暂无训练记录',
+            font_size=dp(16),
             size_hint_y=None,
-            spacing=dp(5)
+            height=0,
+            opacity=0,
+            color=(0.6, 0.6, 0.6, 1)
         )
-        self.history_layout.bind(minimum_height=self.history_layout.setter('height'))
+        parent_layout.add_widget(self.no_data_label)
         
-        scroll.add_widget(self.history_layout)
-        parent_layout.add_widget(scroll)
+        # 历史记录列表（只为可见行创建控件，滚动时分页加载）
+        self.history_list = HistoryList()
+        parent_layout.add_widget(self.history_list)
     
     def update_statistics(self):
         """更新统计信息"""
@@ -138,70 +140,24 @@ class ResultScreen(Screen):
                 self.average_label.text = f'平均每次: {stats["average_per_session"]} 个'
                 
                 # 更新历史记录
-                self.update_history(stats["recent_records"])
+                self.update_history(app.user_manager, app.current_user)
             
         except Exception as e:
             Logger.error(f"ResultScreen: 更新统计信息失败: {e}")
     
-    def update_history(self, records):
-        """更新历史记录"""
-        # 清空现有记录
-        self.history_layout.clear_widgets()
-        
-        if not records:
-            no_data_label = Label(
-                text='暂无训练记录',
-                font_size=dp(16),
-                size_hint_y=None,
-                height=dp(40),
-                color=(0.6, 0.6, 0.6, 1)
-            )
-            self.history_layout.add_widget(no_data_label)
-            return
-        
-        # 添加记录
-        for record in records:
-            record_layout = BoxLayout(
-                orientation='horizontal',
-                size_hint_y=None,
-                height=dp(40),
-                spacing=dp(10)
-            )
-            
-            # 日期
-            date_str = record['date'][:10]  # 只显示日期部分
-            date_label = Label(
-                text=date_str,
-                font_size=dp(14),
-                size_hint_x=0.4,
-                color=(0.4, 0.4, 0.4, 1)
-            )
-            record_layout.add_widget(date_label)
-            
-            # 次数
-            count_label = Label(
-                text=f'{record["count"]} 个',
-                font_size=dp(16),
-                size_hint_x=0.3,
-                color=(0.2, 0.2, 0.2, 1),
-                bold=True
-            )
-            record_layout.add_widget(count_label)
-            
-            # 时长（如果有）
-            duration_text = ''
-            if record.get('duration'):
-                duration_text = f'{record["duration"]:.1f}s'
-            
-            duration_label = Label(
-                text=duration_text,
-                font_size=dp(14),
-                size_hint_x=0.3,
-                color=(0.6, 0.6, 0.6, 1)
-            )
-            record_layout.add_widget(duration_label)
-            
-            self.history_layout.add_widget(record_layout)
+    def update_history(self, user_manager, username):
+        """更新历史记录（从最新一页开始加载）"""
+        page_size = self.history_list.page_size
+        self.history_list.reload(
+            lambda cursor, callback: user_manager.query_history(
+                username, limit=page_size, cursor=cursor, callback=callback),
+            on_page=self.update_no_data_label)
+    
+    def update_no_data_label(self):
+        """根据已加载的历史记录显示或隐藏“暂无记录”提示"""
+        has_records = bool(self.history_list.data)
+        self.no_data_label.height = 0 if has_records else dp(40)
+        self.no_data_label.opacity = 0 if has_records else 1
     
     def get_app(self):
         """获取应用实例"""
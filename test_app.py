@@ -9,7 +9,11 @@ import unittest
 import os
 import sys
 import tempfile
+import time
+import shutil
 import json
+import numpy as np
+from datetime import datetime
 from unittest.mock import Mock, patch, MagicMock
 
 # 添加项目路径
@@ -17,9 +21,17 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 # 导入测试模块
 from core.user_manager import UserManager
+from core.user_stats import UserStats
 from core.pose_detector import PoseDetector
+from core.pose_backends import ReplayPoseBackend, create_pose_backend, load_landmarks, save_landmarks
+from core.rep_events import summarize_reps
+from core.history_io import import_history
+from core.detector_pool import DetectorPool
 from utils.permissions import PermissionManager
 from utils.camera_handler import CameraHandler
+from utils.frame_sources import SyntheticPushupSource, ImageSequenceSource, create_frame_source
+from utils.latency import FrameTiming, FrameRateMeter, LatencyMonitor, get_process_rss
+from utils.tracing import FrameTracer, tracer
 
 
 class TestUserManager(unittest.TestCase):
@@ -28,15 +40,12 @@ class TestUserManager(unittest.TestCase):
     def setUp(self):
         """测试前准备"""
         self.temp_dir = tempfile.mkdtemp()
-        self.test_file = os.path.join(self.temp_dir, 'test_users.json')
-        self.user_manager = UserManager()
-        self.user_manager.users_file = self.test_file
+        self.user_manager = UserManager(data_dir=self.temp_dir)
     
     def tearDown(self):
         """测试后清理"""
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
-        os.rmdir(self.temp_dir)
+        self.user_manager.close()
+        shutil.rmtree(self.temp_dir)
     
     def test_user_registration(self):
         """测试用户注册"""
@@ -94,6 +103,341 @@ class TestUserManager(unittest.TestCase):
         self.assertEqual(stats['total_sessions'], 3)
         self.assertEqual(stats['best_session'], 20)
         self.assertEqual(stats['average_per_session'], 15.0)
+    
+    def test_incremental_statistics(self):
+        """测试增量维护的统计和最近记录"""
+        stats = UserStats(recent_size=3)
+        for day in (3, 1, 5, 2, 4):
+            stats.add({'count': day * 10, 'date': f'2024-01-0{day}T08:00:00', 'duration': 60.0})
+        summary = stats.summary()
+        self.assertEqual(summary['total_pushups'], 150)
+        self.assertEqual(summary['total_sessions'], 5)
+        self.assertEqual(summary['best_session'], 50)
+        self.assertEqual(summary['average_per_session'], 30.0)
+        self.assertEqual([r['count'] for r in summary['recent_records']], [50, 40, 30])
+        
+        # 按日/周/月汇总（2024-01-01为周一）
+        days = stats.volume('day', start='2024-01-02', end='2024-01-04')
+        self.assertEqual([d['period'] for d in days], ['2024-01-02', '2024-01-03', '2024-01-04'])
+        self.assertEqual(days[0]['reps'], 20)
+        stats.add({'count': 60, 'date': '2024-01-08T08:00:00', 'duration': None})
+        weeks = stats.volume('week')
+        self.assertEqual([(w['period'], w['sessions'], w['best']) for w in weeks],
+                         [('2024-W01', 5, 50), ('2024-W02', 1, 60)])
+        month = stats.volume('month', start=datetime(2024, 1, 15))[0]
+        self.assertEqual((month['reps'], month['duration']), (210, 300.0))
+        
+        self.user_manager.register("test_user", "password123")
+        for count in range(1, 13):
+            self.user_manager.add_pushup_record("test_user", count)
+        recent = self.user_manager.get_user_statistics("test_user")['recent_records']
+        self.assertEqual([r['count'] for r in recent], list(range(12, 2, -1)))
+        today = self.user_manager.get_training_volume("test_user", 'day', start=datetime.now())
+        self.assertEqual((today[0]['reps'], today[0]['sessions']), (78, 12))
+    
+    def test_lazy_loading(self):
+        """测试按需加载用户和LRU淘汰"""
+        for i in range(5):
+            self.user_manager.register(f"user{i}", "password123")
+            self.user_manager.add_pushup_record(f"user{i}", i + 1)
+        self.user_manager.close()
+        
+        user_manager = UserManager(data_dir=self.temp_dir, max_resident_users=2)
+        self.assertEqual(len(user_manager.usernames), 5)
+        self.assertEqual(len(user_manager.users_data), 0)
+        
+        for i in range(5):
+            self.assertTrue(user_manager.authenticate(f"user{i}", "password123"))
+            self.assertEqual(user_manager.get_user_statistics(f"user{i}")['total_pushups'], i + 1)
+        self.assertEqual(list(user_manager.users_data.keys()), ["user3", "user4"])
+        
+        # 被淘汰的用户重新加载后数据完整
+        user_manager.add_pushup_record("user0", 10)
+        self.assertEqual(user_manager.get_user_statistics("user0")['total_pushups'], 11)
+        self.assertFalse(user_manager.register("user1", "password456")[0])
+        self.user_manager = user_manager
+
+
+class TestUserStore(unittest.TestCase):
+    """用户数据存储测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_json_backend(self):
+        """测试JSON存储后端"""
+        user_manager = UserManager(backend='json', data_dir=self.temp_dir)
+        user_manager.register("json_user", "password123")
+        user_manager.add_pushup_record("json_user", 12)
+        user_manager.close()
+        
+        # 新记录只追加到日志，重新打开时重放
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'users.json')))
+        reopened = UserManager(backend='json', data_dir=self.temp_dir)
+        self.assertTrue(reopened.authenticate("json_user", "password123"))
+        stats = reopened.get_user_statistics("json_user")
+        self.assertEqual(stats['total_pushups'], 12)
+        self.assertEqual(stats['total_sessions'], 1)
+        reopened.close()
+    
+    def test_json_journal_compaction(self):
+        """测试日志压缩和崩溃后的重放"""
+        user_manager = UserManager(backend='json', data_dir=self.temp_dir)
+        user_manager.store.min_compact_bytes = 1024
+        user_manager.register("json_user", "password123")
+        for i in range(50):
+            user_manager.add_pushup_record("json_user", i)
+        user_manager.close()
+        self.assertGreater(user_manager.store.stats['compactions'], 0)
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'users.json')))
+        
+        # 模拟崩溃：日志最后一行只写了一半
+        journal_dir = os.path.join(self.temp_dir, 'journal')
+        # 最后一条记录恰好触发压缩时日志目录已被轮转
+        os.makedirs(journal_dir, exist_ok=True)
+        with open(os.path.join(journal_dir, 'json_user.jsonl'), 'a', encoding='utf-8') as f:
+            f.write('{"op": "record", "rec')
+        
+        reopened = UserManager(backend='json', data_dir=self.temp_dir)
+        reopened.add_pushup_record("json_user", 0)
+        stats = reopened.get_user_statistics("json_user")
+        self.assertEqual(stats['total_sessions'], 51)
+        self.assertEqual(stats['total_pushups'], sum(range(50)))
+        self.assertEqual(stats['best_session'], 49)
+        
+        # 手动压缩后日志清空，数据不变
+        reopened.store.compact()
+        reopened.close()
+        again = UserManager(backend='json', data_dir=self.temp_dir)
+        self.assertEqual(again.get_user_statistics("json_user")['total_sessions'], 51)
+        again.close()
+    
+    def test_persisted_rollups(self):
+        """测试按日/周/月汇总随记录持久化，加载统计时不遍历历史记录"""
+        import sqlite3
+        
+        for backend in ('json', 'sqlite'):
+            data_dir = os.path.join(self.temp_dir, backend)
+            user_manager = UserManager(backend=backend, data_dir=data_dir)
+            user_manager.register("rollup_user", "password123")
+            for count in (5, 7, 9):
+                user_manager.add_pushup_record("rollup_user", count, duration=30.0)
+            user_manager.close()
+            
+            reopened = UserManager(backend=backend, data_dir=data_dir)
+            rollups = reopened.store.load_rollups("rollup_user")
+            self.assertEqual([(b['reps'], b['sessions'], b['best']) for b in rollups['day']], [(21, 3, 9)])
+            with patch.object(UserStats, 'add') as add:
+                stats = reopened.get_user_statistics("rollup_user")
+                volume = reopened.get_training_volume("rollup_user", 'week')
+                add.assert_not_called()
+            self.assertEqual((stats['total_pushups'], stats['total_sessions'], stats['best_session']), (21, 3, 9))
+            self.assertEqual([r['count'] for r in stats['recent_records']], [9, 7, 5])
+            self.assertEqual((volume[0]['reps'], volume[0]['duration']), (21, 90.0))
+            reopened.add_pushup_record("rollup_user", 1)
+            self.assertEqual(reopened.get_training_volume("rollup_user", 'month')[0]['sessions'], 4)
+            reopened.close()
+        
+        # 旧版数据库升级时根据已有记录生成汇总
+        conn = sqlite3.connect(os.path.join(self.temp_dir, 'sqlite', 'users.db'))
+        with conn:
+            conn.execute('DELETE FROM rollups')
+            conn.execute('PRAGMA user_version=2')
+        conn.close()
+        upgraded = UserManager(backend='sqlite', data_dir=os.path.join(self.temp_dir, 'sqlite'))
+        self.assertEqual(upgraded.get_user_statistics("rollup_user")['total_pushups'], 22)
+        upgraded.close()
+    
+    def test_background_persistence(self):
+        """测试后台写入、批量fsync和刷新"""
+        for backend in ('json', 'sqlite'):
+            data_dir = os.path.join(self.temp_dir, backend)
+            user_manager = UserManager(backend=backend, data_dir=data_dir)
+            user_manager.register("bg_user", "password123")
+            futures = [user_manager.submit_pushup_record("bg_user", i % 7) for i in range(100)]
+            
+            # 内存中的统计立即更新
+            self.assertEqual(user_manager.get_user_statistics("bg_user")['total_sessions'], 100)
+            user_manager.flush()
+            self.assertTrue(all(future.done() and future.exception() is None for future in futures))
+            self.assertEqual(user_manager.persistence.writes, 100)
+            self.assertIsNone(user_manager.submit_pushup_record("nobody", 1))
+            user_manager.close()
+            
+            reopened = UserManager(backend=backend, data_dir=data_dir, background=False)
+            stats = reopened.get_user_statistics("bg_user")
+            self.assertEqual(stats['total_sessions'], 100)
+            self.assertEqual(stats['total_pushups'], sum(i % 7 for i in range(100)))
+            self.assertEqual(reopened.get_user_info("bg_user")['best_session'], 6)
+            reopened.close()
+    
+    def test_rep_events(self):
+        """测试动作事件的列存储和统计"""
+        reps = {
+            'start': np.array([0.0, 2.0, 4.0], dtype=np.float32),
+            'end': np.array([1.0, 3.5, 6.0], dtype=np.float32),
+            'min_arm_angle': np.array([60.0, 70.0, 80.0], dtype=np.float32),
+            'leg_angle': np.array([170.0, 172.0, 174.0], dtype=np.float32),
+        }
+        for backend in ('json', 'sqlite'):
+            data_dir = os.path.join(self.temp_dir, backend)
+            user_manager = UserManager(backend=backend, data_dir=data_dir)
+            user_manager.register("rep_user", "password123")
+            user_manager.add_pushup_record("rep_user", 3, duration=8.0, reps=reps)
+            user_manager.add_pushup_record("rep_user", 5)
+            user_manager.close()
+            
+            reopened = UserManager(backend=backend, data_dir=data_dir)
+            metrics = reopened.get_rep_metrics("rep_user", start=datetime.now())
+            self.assertEqual(metrics['reps'], 3)
+            self.assertAlmostEqual(metrics['mean_tempo'], 1.5, places=3)
+            self.assertAlmostEqual(metrics['mean_min_arm_angle'], 70.0, places=1)
+            self.assertEqual(reopened.get_rep_metrics("rep_user", end='2000-01-01')['reps'], 0)
+            self.assertEqual(reopened.get_user_statistics("rep_user")['recent_records'][1]['duration'], 8.0)
+            
+            # 完整保存加载过的用户（记录中不含动作事件）后事件仍然保留
+            self.assertTrue(reopened.authenticate("rep_user", "password123"))
+            reopened.save_users()
+            self.assertEqual(len(reopened.get_rep_events("rep_user")['start']), 3)
+            reopened.close()
+    
+    def test_export_import(self):
+        """测试流式导出和导入（CSV、NPZ，跨存储后端）"""
+        reps = {name: np.arange(3, dtype=np.float32) + i for i, name in enumerate(
+            ('start', 'end', 'min_arm_angle', 'leg_angle'))}
+        # 目录名中含URI特殊字符时只读连接仍打开同一个数据库
+        source = UserManager(data_dir=os.path.join(self.temp_dir, 'source ?#%'))
+        source.register("user_a", "password123", "甲")
+        source.register("user_b", "password456")
+        source.add_pushup_record("user_a", 3, duration=10.0, reps=reps)
+        for i in range(25):
+            source.add_pushup_record("user_b", i)
+        
+        for name in ('history.csv', 'history.npz'):
+            path = os.path.join(self.temp_dir, name)
+            self.assertEqual(source.export_history(path), {'users': 2, 'sessions': 26})
+            for backend in ('json', 'sqlite'):
+                data_dir = os.path.join(self.temp_dir, f'{backend}_{name}')
+                target = UserManager(backend=backend, data_dir=data_dir)
+                target.register("user_b", "password456")
+                with patch.object(target.store, 'sync', wraps=target.store.sync) as sync:
+                    result = import_history(target.store, path, chunk_size=10)
+                sync.assert_called_once_with()
+                target.load_users()
+                self.assertEqual(result, {'users': 1, 'sessions': 26, 'skipped': 0})
+                
+                self.assertTrue(target.authenticate("user_a", "password123"))
+                self.assertEqual(target.get_user_info("user_a")['name'], "甲")
+                stats = target.get_user_statistics("user_b")
+                self.assertEqual(stats['total_sessions'], 25)
+                self.assertEqual(stats['best_session'], 24)
+                events = target.get_rep_events("user_a")
+                self.assertEqual(events['leg_angle'].tolist(), [3.0, 4.0, 5.0])
+                self.assertEqual(target.get_user_statistics("user_a")['recent_records'][0]['duration'], 10.0)
+                
+                # 再次导入时全部视为重复
+                self.assertEqual(target.import_history(path)['skipped'], 26)
+                self.assertEqual(target.get_user_statistics("user_b")['total_sessions'], 25)
+                target.close()
+        source.close()
+    
+    def test_query_history(self):
+        """测试按日期范围分页查询（两种存储后端结果一致）"""
+        records = [{'count': i, 'date': f'2024-01-{1 + i // 3:02d}T{8 + i % 3:02d}:00:00',
+                    'duration': 60.0} for i in range(30)]
+        for backend in ('json', 'sqlite'):
+            data_dir = os.path.join(self.temp_dir, backend)
+            user_manager = UserManager(backend=backend, data_dir=data_dir)
+            user_manager.register("history_user", "password123")
+            user_manager.users_data["history_user"]['pushup_records'] = list(records)
+            user_manager.save_users()
+            
+            # 从新到旧翻页，直到没有更多记录
+            counts = []
+            cursor = None
+            while True:
+                page = user_manager.query_history("history_user", limit=7, cursor=cursor)
+                counts.extend(r['count'] for r in page['records'])
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+            self.assertEqual(counts, list(range(29, -1, -1)))
+            
+            # 日期范围（包含结束日期当天）和升序
+            page = user_manager.query_history("history_user", start='2024-01-03', end='2024-01-04',
+                                              limit=4, descending=False)
+            self.assertEqual([r['count'] for r in page['records']], [6, 7, 8, 9])
+            page = user_manager.query_history("history_user", start='2024-01-03', end='2024-01-04',
+                                              limit=4, cursor=page['next_cursor'], descending=False)
+            self.assertEqual([r['count'] for r in page['records']], [10, 11])
+            self.assertIsNone(page['next_cursor'])
+            
+            # 新增记录后可立即查到（查询排在待写入记录之后执行，无需先flush）
+            user_manager.submit_pushup_record("history_user", 99)
+            latest = user_manager.query_history("history_user", limit=1)['records'][0]
+            self.assertEqual(latest['count'], 99)
+            self.assertIsNone(user_manager.query_history("nobody"))
+            
+            # 界面线程的查询结果通过回调交付
+            pages = []
+            with patch('core.user_manager.Clock.schedule_once', lambda func, *args: func(0)):
+                user_manager.submit_pushup_record("history_user", 100)
+                user_manager.query_history("history_user", limit=2, callback=pages.append)
+                user_manager.flush()
+            self.assertEqual([r['count'] for r in pages[0]['records']], [100, 99])
+            user_manager.close()
+    
+    def test_history_list_fills_viewport(self):
+        """测试第一页不足一屏（无法滚动）时继续加载，直到内容超过视图高度"""
+        from kivy.clock import Clock
+        from screens.history_list import HistoryList
+        
+        records = [{'count': i, 'date': '2024-01-01T08:00:00', 'duration': 60.0} for i in range(20)]
+        cursors = []
+        
+        def page_loader(cursor, callback):
+            start = cursor or 0
+            cursors.append(start)
+            callback({'records': records[start:start + 3],
+                      'next_cursor': start + 3 if start + 3 < len(records) else None})
+        
+        history_list = HistoryList(page_size=3, size=(300, 400), size_hint=(None, None))
+        history_list.reload(page_loader)
+        for _ in range(20):
+            Clock.tick()
+        self.assertGreater(history_list.children[0].height, history_list.height)
+        self.assertLess(len(history_list.data), len(records))
+        self.assertEqual(cursors, list(range(0, len(history_list.data), 3)))
+    
+    def test_migration_from_json(self):
+        """测试从旧版users.json迁移到SQLite"""
+        json_manager = UserManager(backend='json', data_dir=self.temp_dir)
+        json_manager.register("old_user", "password123", "老用户")
+        json_manager.add_pushup_record("old_user", 10)
+        json_manager.add_pushup_record("old_user", 20)
+        
+        user_manager = UserManager(data_dir=self.temp_dir)
+        self.assertTrue(user_manager.authenticate("old_user", "password123"))
+        stats = user_manager.get_user_statistics("old_user")
+        self.assertEqual(stats['total_pushups'], 30)
+        self.assertEqual(stats['total_sessions'], 2)
+        self.assertEqual(stats['best_session'], 20)
+        
+        # 迁移只执行一次，原日志被改名保留
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'journal')))
+        self.assertTrue(os.path.exists(os.path.join(self.temp_dir, 'journal.migrated')))
+        user_manager.add_pushup_record("old_user", 5)
+        user_manager.close()
+        
+        reopened = UserManager(data_dir=self.temp_dir)
+        self.assertEqual(reopened.get_user_statistics("old_user")['total_sessions'], 3)
+        self.assertEqual(reopened.get_user_info("old_user")['name'], "老用户")
+        reopened.close()
 
 
 class TestPoseDetector(unittest.TestCase):
@@ -135,6 +479,75 @@ class TestPoseDetector(unittest.TestCase):
         self.assertEqual(self.pose_detector.counter, 0)
         self.assertIsNone(self.pose_detector.stage)
     
+    def test_rep_recorder(self):
+        """测试计数后继续跟踪最低点，回到顶部时动作结束"""
+        recorder = self.pose_detector.rep_recorder
+        recorder.update(0.0, 170, 175, at_top=True, counted=False)
+        recorder.update(0.5, 100, 172, at_top=False, counted=False)
+        recorder.update(1.0, 80, 171, at_top=False, counted=True)
+        recorder.update(1.2, 60, 168, at_top=False, counted=False)
+        recorder.update(1.6, 120, 172, at_top=False, counted=False)
+        # 尚未回到顶部时以最后一帧为结束
+        self.assertEqual(len(recorder), 1)
+        np.testing.assert_allclose(recorder.columns()['end'], [1.6])
+        
+        recorder.update(2.0, 170, 175, at_top=True, counted=False)
+        recorder.update(2.5, 120, 172, at_top=False, counted=False)
+        reps = recorder.columns()
+        np.testing.assert_allclose(reps['start'], [0.0])
+        np.testing.assert_allclose(reps['end'], [2.0])
+        np.testing.assert_allclose(reps['min_arm_angle'], [60])
+        np.testing.assert_allclose(reps['leg_angle'], [168])
+    
+    def test_state_snapshot(self):
+        """测试暂停时保存、恢复到新检测器的计数状态"""
+        recorder = self.pose_detector.rep_recorder
+        recorder.update(10.0, 170, 175, at_top=True, counted=False)
+        recorder.update(10.5, 70, 172, at_top=False, counted=False)
+        recorder.update(11.0, 165, 174, at_top=False, counted=True)
+        self.pose_detector.counter = 1
+        self.pose_detector.stage = 'up'
+        state = self.pose_detector.snapshot_state()
+        
+        # 模拟模型被释放后重新创建检测器，后台期间（100秒）不计入训练时间
+        detector = PoseDetector()
+        try:
+            detector.restore_state(state)
+            self.assertEqual((detector.get_counter(), detector.get_stage()), (1, 'up'))
+            recorder = detector.rep_recorder
+            recorder.update(111.0, 170, 175, at_top=True, counted=False)
+            recorder.update(112.0, 165, 174, at_top=False, counted=True)
+            reps = detector.get_rep_events()
+            np.testing.assert_allclose(reps['start'], [0.0, 1.0])
+            np.testing.assert_allclose(reps['end'], [1.0, 2.0])
+        finally:
+            detector.cleanup()
+    
+    def test_snapshot_mid_rep(self):
+        """测试在动作进行中暂停、恢复后，记录的动作事件数仍与计数一致"""
+        source = SyntheticPushupSource(width=320, height=240, cadence=60)
+        detector = self.pose_detector
+        index = 0
+        # 运行到一次计数之后、下一次动作已开始下落时暂停
+        while detector.counter < 1 or detector.stage != 'down' or \
+                source.arm_angle(index) > detector.max_angle - 10:
+            detector.update_count(source.landmarks(index), index / 30.0)
+            index += 1
+        state = detector.snapshot_state()
+        
+        resumed = PoseDetector()
+        try:
+            resumed.restore_state(state)
+            for i in range(index, 120):
+                resumed.update_count(source.landmarks(i), 100.0 + i / 30.0)
+            reps = resumed.get_rep_events()
+            self.assertEqual(resumed.get_counter(), source.expected_reps(120))
+            self.assertEqual(len(reps['start']), resumed.get_counter())
+            # 暂停时进行中的动作从暂停前的开始时间算起，后台期间不计入
+            self.assertTrue(np.all(reps['end'] - reps['start'] < 2.0))
+        finally:
+            resumed.cleanup()
+    
     @patch('cv2.imread')
     def test_image_processing(self, mock_imread):
         """测试图像处理"""
@@ -150,6 +563,304 @@ class TestPoseDetector(unittest.TestCase):
         self.assertEqual(processed.shape, mock_image.shape)
 
 
+class TestPoseBackends(unittest.TestCase):
+    """推理后端测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.source = SyntheticPushupSource(width=320, height=240, fps=30, cadence=60, num_frames=150)
+        self.frames = [self.source.landmarks(i) for i in range(150)]
+        self.frames[5] = None  # 模拟未检测到的帧
+    
+    def tearDown(self):
+        """测试后清理"""
+        for name in os.listdir(self.temp_dir):
+            os.remove(os.path.join(self.temp_dir, name))
+        os.rmdir(self.temp_dir)
+    
+    def test_landmark_files(self):
+        """测试关键点录制文件读写"""
+        for name in ('landmarks.jsonl', 'landmarks.npz'):
+            path = os.path.join(self.temp_dir, name)
+            save_landmarks(path, self.frames)
+            loaded = load_landmarks(path)
+            self.assertEqual(len(loaded), 150)
+            self.assertIsNone(loaded[5])
+            self.assertEqual(loaded[0].shape, (33, 4))
+            self.assertAlmostEqual(float(loaded[10][11][0]), float(self.frames[10][11][0]), places=4)
+    
+    def test_replay_backend_counting(self):
+        """测试回放后端驱动计数"""
+        path = os.path.join(self.temp_dir, 'landmarks.npz')
+        save_landmarks(path, self.frames)
+        
+        detector = PoseDetector(backend=f'replay:{path}')
+        detector.process_interval = 1
+        self.assertIsInstance(detector.backend, ReplayPoseBackend)
+        
+        self.source.open()
+        detected = 0
+        while True:
+            ret, frame = self.source.read()
+            if not ret:
+                break
+            timing = FrameTiming(self.source.frame_index, capture=self.source.frame_index / 30.0)
+            detected += detector.process_frame(frame, timing=timing)[1]
+        detector.cleanup()
+        
+        self.assertEqual(detected, 149)
+        self.assertEqual(detector.get_counter(), self.source.expected_reps(150))
+        
+        # 每次计数对应一条动作事件
+        reps = detector.get_rep_events()
+        self.assertEqual(len(reps['start']), detector.get_counter())
+        metrics = summarize_reps(reps)
+        self.assertTrue(0.2 < metrics['mean_tempo'] < 1.0)
+        self.assertLess(metrics['mean_min_arm_angle'], detector.min_angle)
+        self.assertGreater(metrics['mean_leg_angle'], 150)
+    
+    def test_detector_pool(self):
+        """测试检测器复用和预热"""
+        path = os.path.join(self.temp_dir, 'landmarks.npz')
+        save_landmarks(path, self.frames)
+        backend = f'replay:{path}'
+        
+        pool = DetectorPool()
+        pool.prewarm(backend)
+        detector = pool.acquire(callback=Mock(), backend=backend)
+        self.assertIsNotNone(pool.last_warmup_time)
+        detector.counter = 5
+        pool.release(detector, backend)
+        
+        # 再次获取时复用同一个检测器，只重置计数状态
+        again = pool.acquire(backend=backend)
+        self.assertIs(again, detector)
+        self.assertEqual(again.get_counter(), 0)
+        self.assertIsNone(again.callback)
+        self.assertIsNot(pool.acquire(backend=backend), detector)
+        pool.shutdown()
+    
+    def test_process_pipeline(self):
+        """测试多进程流水线（采集、推理在独立进程中）"""
+        from core.process_pipeline import ProcessPipeline
+        
+        path = os.path.join(self.temp_dir, 'landmarks.npz')
+        save_landmarks(path, self.frames[:60])
+        pipeline = ProcessPipeline(source='synthetic?width=320&height=240&cadence=60&frames=60',
+                                   backend=f'replay:{path}', frame_size=(320, 240))
+        self.assertTrue(pipeline.start())
+        try:
+            deadline = time.time() + 30.0
+            while not pipeline.finished and time.time() < deadline:
+                pipeline.poll()
+                time.sleep(0.01)
+            display = pipeline.read_display()
+        finally:
+            final = pipeline.stop()
+        
+        self.assertEqual(final['frames'] + final['skipped'], 60)
+        self.assertGreater(final['counter'], 0)
+        self.assertEqual(len(final['reps']['start']), final['counter'])
+        self.assertEqual(display[2].shape, (240, 320, 3))
+        
+        # 计数在推理进程中：重置命令发给推理进程，重置前发出的消息被丢弃
+        save_landmarks(path, self.frames)
+        pipeline = ProcessPipeline(source='synthetic?width=320&height=240&cadence=60&frames=150',
+                                   backend=f'replay:{path}', frame_size=(320, 240))
+        self.assertTrue(pipeline.start())
+        counters = []
+        try:
+            self.assertFalse(pipeline.switch_camera())
+            deadline = time.time() + 30.0
+            while not pipeline.finished and time.time() < deadline:
+                messages = pipeline.poll()
+                if messages and messages[-1]['counter'] > 0 and not pipeline._resets:
+                    pipeline.reset_counter()
+                elif pipeline._resets:
+                    counters.extend(message['counter'] for message in messages)
+                time.sleep(0.01)
+            stats = pipeline.get_stats()
+        finally:
+            final = pipeline.stop()
+        
+        self.assertLess(final['counter'], self.source.expected_reps(150))
+        self.assertEqual(len(final['reps']['start']), final['counter'])
+        self.assertLessEqual(max(counters, default=0), final['counter'])
+        self.assertEqual(stats['resolution'], (320, 240))
+        self.assertGreater(stats['capture_fps'], 0)
+        
+        # 采集进程打不开帧源时启动失败
+        missing = ProcessPipeline(source=os.path.join(self.temp_dir, 'missing.mp4'),
+                                  backend=f'replay:{path}', frame_size=(320, 240))
+        self.assertFalse(missing.start())
+    
+    def test_session_manager(self):
+        """测试多会话共享推理线程池（轮转调度、按目标帧率限速、各自计数）"""
+        from core.session_manager import SessionManager
+        
+        path = os.path.join(self.temp_dir, 'landmarks.npz')
+        save_landmarks(path, self.frames)
+        manager = SessionManager(workers=2)
+        manager.start()
+        try:
+            for i in range(3):
+                session = manager.add_session(
+                    f'athlete{i}', source='synthetic?width=320&height=240&fps=30&frames=60',
+                    backend=f'replay:{path}?loop=1', target_fps=10)
+                self.assertIsNotNone(session)
+            with self.assertRaises(ValueError):
+                manager.add_session('athlete0', source='synthetic?frames=1')
+            
+            deadline = time.time() + 30.0
+            while not manager.finished and time.time() < deadline:
+                time.sleep(0.05)
+            stats = manager.get_stats()
+        finally:
+            manager.stop()
+        
+        self.assertEqual(len(stats['sessions']), 3)
+        for session_stats in stats['sessions']:
+            # 60帧@30fps约2秒，目标10fps时每个会话约处理20帧，其余帧被跳过
+            self.assertGreater(session_stats['processed'], 5)
+            self.assertLessEqual(session_stats['processed'], 30)
+            self.assertEqual(session_stats['processed'] + session_stats['skipped'], 60)
+        self.assertEqual(manager.sessions, [])
+    
+    def test_multi_person(self):
+        """测试多人检测：IoU跟踪保持身份、每人独立计数、每帧一次批量姿态推理"""
+        from core.multi_person import MultiPersonDetector, PersonTracker
+        from core.pose_backends import PoseBackend
+        
+        tracker = PersonTracker(max_missed=1)
+        first = tracker.update([(10, 10, 100, 200), (300, 10, 100, 200)])
+        ids = [track.track_id for track in first]
+        tracker.update([(305, 12, 100, 200), (12, 8, 100, 200)])
+        self.assertEqual([track.track_id for track in tracker.tracks], ids)
+        self.assertEqual(tracker.tracks[1].box, (305, 12, 100, 200))
+        tracker.update([(12, 8, 100, 200)])
+        tracker.update([(12, 8, 100, 200)])
+        self.assertEqual([track.track_id for track in tracker.tracks], [ids[0]])
+        self.assertEqual([track.track_id for track in tracker.finished], [ids[1]])
+        
+        # 两个人以不同节奏做俯卧撑
+        people = [SyntheticPushupSource(width=320, height=240, cadence=cadence) for cadence in (30, 60)]
+        
+        class TwoPeopleBackend(PoseBackend):
+            def __init__(self):
+                self.batches = []
+                self.index = 0
+            
+            def process_batch(self, images):
+                self.batches.append(len(images))
+                landmarks = [person.landmarks(self.index) for person in people[:len(images)]]
+                self.index += 1
+                return landmarks
+        
+        person_detector = Mock()
+        person_detector.detect.return_value = [(0, 0, 320, 240), (320, 0, 320, 240)]
+        backend = TwoPeopleBackend()
+        detector = MultiPersonDetector(person_detector, backend=backend, detect_interval=5)
+        frame = np.zeros((240, 640, 3), dtype=np.uint8)
+        for _ in range(240):
+            image, detected = detector.process_frame(frame.copy())
+            self.assertTrue(detected)
+        
+        counters = detector.get_counters()
+        self.assertEqual(sorted(counters), [1, 2])
+        self.assertEqual(counters[1], people[0].expected_reps(240))
+        self.assertEqual(counters[2], people[1].expected_reps(240))
+        self.assertEqual(person_detector.detect.call_count, 48)
+        self.assertEqual(backend.batches, [2] * 240)
+        self.assertEqual(len(detector.get_rep_events()[2]['end']), counters[2])
+        detector.reset_counter()
+        self.assertEqual(detector.get_counters(), {})
+        
+        # 裁剪区域比画面宽得多（640x160位于640x480画面中）时，按像素坐标计数角度不失真
+        wide = SyntheticPushupSource(width=640, height=160, cadence=60)
+        
+        class WideBackend(PoseBackend):
+            def __init__(self):
+                self.index = 0
+            
+            def process_batch(self, images):
+                self.index += 1
+                return [wide.landmarks(self.index - 1)]
+        
+        person_detector = Mock()
+        person_detector.detect.return_value = [(0, 160, 640, 160)]
+        detector = MultiPersonDetector(person_detector, backend=WideBackend(), detect_interval=1, crop_margin=0)
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        for _ in range(240):
+            detector.process_frame(frame.copy())
+        self.assertEqual(detector.get_counters(), {1: wide.expected_reps(240)})
+        
+        # 跟踪框部分在画面外时裁剪到画面内，完全在画面外时不做姿态推理
+        self.assertEqual(detector._crop_region((600, -20, 100, 240), 640, 480), (600, 0, 40, 220))
+        self.assertIsNone(detector._crop_region((700, 0, 100, 240), 640, 480))
+        
+        class ShapeBackend(PoseBackend):
+            def __init__(self):
+                self.shapes = []
+            
+            def process_batch(self, images):
+                self.shapes.append([image.shape for image in images])
+                return [wide.landmarks(0) for _ in images]
+        
+        person_detector = Mock()
+        person_detector.detect.return_value = [(-50, 100, 200, 240), (700, 0, 100, 240)]
+        backend = ShapeBackend()
+        detector = MultiPersonDetector(person_detector, backend=backend, detect_interval=1, crop_margin=0)
+        image, detected = detector.process_frame(frame.copy())
+        self.assertTrue(detected)
+        self.assertEqual(backend.shapes, [[(240, 150, 3)]])
+        self.assertIsNone(detector.tracker.tracks[1].landmarks)
+        self.assertEqual(detector.tracker.tracks[1].missed, 1)
+        
+        # 未匹配到检测框且未检测到姿态的帧只计一次丢失
+        person_detector.detect.return_value = [(-50, 100, 200, 240)]
+        detector.process_frame(frame.copy())
+        self.assertEqual(detector.tracker.tracks[1].missed, 2)
+    
+    def test_recording_backend(self):
+        """测试录制包装保留内部后端的输入尺寸和批量推理"""
+        from core.pose_backends import PoseBackend, RecordingBackend
+        
+        class SizedBackend(PoseBackend):
+            input_size = (256, 256)
+            supports_batch = True
+            
+            def __init__(self, frames):
+                self.frames = iter(frames)
+                self.batches = 0
+            
+            def process(self, image):
+                return next(self.frames)
+            
+            def process_batch(self, images):
+                self.batches += 1
+                return [self.process(image) for image in images]
+        
+        path = os.path.join(self.temp_dir, 'recorded.jsonl')
+        inner = SizedBackend(self.frames[:4])
+        backend = RecordingBackend(inner, path)
+        self.assertEqual(backend.input_size, (256, 256))
+        self.assertTrue(backend.supports_batch)
+        detector = PoseDetector(backend=backend)
+        self.assertEqual(detector.get_capture_requirements(), (256, 256))
+        image = np.zeros((8, 8, 3), dtype=np.uint8)
+        backend.process(image)
+        backend.process_batch([image] * 3)
+        backend.close()
+        self.assertEqual(inner.batches, 1)
+        self.assertEqual(len(load_landmarks(path)), 4)
+    
+    def test_unknown_backend(self):
+        """测试未知后端"""
+        with self.assertRaises(ValueError):
+            create_pose_backend('unknown:model.bin')
+
+
 class TestPermissionManager(unittest.TestCase):
     """权限管理器测试"""
     
@@ -164,9 +875,16 @@ class TestPermissionManager(unittest.TestCase):
         mock_check.return_value = True
         self.assertTrue(self.permission_manager.check_camera_permission())
         
-        # 模拟权限未授予
+        # 权限状态被缓存，刷新后才重新读取
         mock_check.return_value = False
+        self.assertTrue(self.permission_manager.check_camera_permission())
+        self.assertEqual(mock_check.call_count, 1)
+        self.permission_manager.refresh()
         self.assertFalse(self.permission_manager.check_camera_permission())
+        
+        # 申请结果回调直接更新缓存
+        self.permission_manager._on_request_result(['android.permission.CAMERA'], [True])
+        self.assertTrue(self.permission_manager.check_camera_permission())
     
     def test_permission_status(self):
         """测试权限状态获取"""
@@ -184,6 +902,46 @@ class TestPermissionManager(unittest.TestCase):
             self.assertIn(permission, status)
 
 
+class TestFonts(unittest.TestCase):
+    """字体注册测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.font_path = os.path.join(self.temp_dir, 'fonts', 'TestCJK.ttf')
+        os.makedirs(os.path.dirname(self.font_path))
+        with open(self.font_path, 'wb') as f:
+            f.write(b'font')
+        self.cache_path = os.path.join(self.temp_dir, 'font_cache.json')
+    
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+    
+    def test_font_cache(self):
+        """测试字体探测结果缓存及按修改时间失效"""
+        from assets import fonts
+        
+        with patch.object(fonts, 'ANDROID_FONT_PATHS', [self.font_path]), \
+                patch.object(fonts, 'DEFAULT_FONT_PATH', self.font_path + '.missing'), \
+                patch.dict(fonts._registered, clear=True):
+            self.assertTrue(fonts.register_fonts(self.cache_path, background=True))
+            self.assertEqual(fonts.get_font_name(prefer_chinese=True), 'Chinese')
+            self.assertTrue(os.path.exists(self.cache_path))
+            
+            # 缓存有效时不再探测
+            with patch.object(fonts, '_discover_fonts') as discover:
+                fonts.register_fonts(self.cache_path)
+                discover.assert_not_called()
+            
+            # 字体文件变化后重新探测
+            os.utime(self.font_path, (0, 0))
+            self.assertIsNone(fonts._load_cache(self.cache_path))
+            with patch.object(fonts, '_discover_fonts', return_value={}) as discover:
+                fonts.register_fonts(self.cache_path)
+                discover.assert_called_once()
+
+
 class TestCameraHandler(unittest.TestCase):
     """摄像头处理器测试"""
     
@@ -232,6 +990,318 @@ class TestCameraHandler(unittest.TestCase):
         self.camera_handler.set_fps(30)
         self.assertEqual(self.camera_handler.fps, 30)
 
+    def test_fast_camera_switch(self):
+        """测试采集不中断的摄像头切换"""
+        opened = []
+        
+        def open_capture(camera_index):
+            source = SyntheticPushupSource(width=320, height=240)
+            source.open()
+            source.camera_index = camera_index
+            opened.append(source)
+            return source, {'width': 320, 'height': 240, 'fps': 30, 'fourcc': None, 'index': camera_index}
+        
+        frames = []
+        self.camera_handler.set_frame_callback(frames.append)
+        with patch.object(self.camera_handler, '_open_capture', side_effect=open_capture):
+            self.assertTrue(self.camera_handler.start_capture())
+            thread = self.camera_handler.capture_thread
+            self.assertTrue(self.camera_handler.switch_camera())
+            deadline = time.time() + 5.0
+            while self.camera_handler.last_switch_latency is None and time.time() < deadline:
+                time.sleep(0.01)
+        
+        # 同一个采集线程继续运行，旧设备已释放
+        self.assertIs(self.camera_handler.capture_thread, thread)
+        self.assertEqual(self.camera_handler.camera_index, 1)
+        self.assertIs(self.camera_handler.cap, opened[1])
+        self.assertEqual(self.camera_handler.camera_mode['index'], 1)
+        self.assertFalse(opened[0].isOpened())
+        self.assertIsNotNone(self.camera_handler.get_capture_stats()['switch_latency'])
+    
+    def test_camera_mode_negotiation(self):
+        """测试按推理需求协商采集分辨率和像素格式"""
+        import cv2
+        from utils import camera_handler
+        
+        class FakeCapture:
+            """只支持部分模式的摄像头：YUYV最高640x480@30，MJPG支持到1280x720@30"""
+            
+            def __init__(self, index):
+                self.props = {}
+            
+            def isOpened(self):
+                return True
+            
+            def set(self, prop, value):
+                self.props[prop] = value
+                return True
+            
+            def get(self, prop):
+                fourcc = camera_handler.decode_fourcc(self.props.get(cv2.CAP_PROP_FOURCC, 0))
+                limit = (1280, 720) if fourcc == 'MJPG' else (640, 480)
+                if prop == cv2.CAP_PROP_FRAME_WIDTH:
+                    return min(self.props.get(prop, 640), limit[0])
+                if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+                    return min(self.props.get(prop, 480), limit[1])
+                return self.props.get(prop, 0)
+            
+            def release(self):
+                pass
+        
+        with patch.object(camera_handler.cv2, 'VideoCapture', FakeCapture), \
+                patch.dict(camera_handler._negotiated_modes, clear=True):
+            self.camera_handler.set_requirements(256, 256, fps=30)
+            self.assertTrue(self.camera_handler.initialize_camera())
+            self.assertEqual(self.camera_handler.camera_mode,
+                             {'width': 352, 'height': 288, 'fps': 30, 'fourcc': 'YUYV'})
+            
+            # 未压缩格式达不到的分辨率使用MJPG
+            mode = camera_handler.negotiate_camera_mode(FakeCapture(0), 700, 500, 30)
+            self.assertEqual((mode['width'], mode['height'], mode['fourcc']), (800, 600, 'MJPG'))
+            
+            # 协商失败时恢复原来的像素格式，不留下最后尝试的MJPG
+            cap = FakeCapture(0)
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'YUYV'))
+            self.assertIsNone(camera_handler.negotiate_camera_mode(cap, 1920, 1080, 30))
+            self.assertEqual(camera_handler.decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)), 'YUYV')
+        
+        detector = PoseDetector()
+        try:
+            self.assertEqual(detector.get_capture_requirements(), (256, 256))
+        finally:
+            detector.cleanup()
+
+
+class TestFrameSources(unittest.TestCase):
+    """帧源测试"""
+    
+    def test_synthetic_source(self):
+        """测试合成帧源"""
+        source = SyntheticPushupSource(width=320, height=240, fps=30, cadence=60, num_frames=5)
+        self.assertTrue(source.open())
+        
+        frames = []
+        while True:
+            ret, frame = source.read()
+            if not ret:
+                break
+            frames.append(frame)
+        
+        self.assertEqual(len(frames), 5)
+        self.assertEqual(frames[0].shape, (240, 320, 3))
+        self.assertTrue(source.exhausted)
+        
+        # 同一帧号渲染结果一致
+        self.assertTrue((source.render(3) == frames[3]).all())
+        
+        # 动作范围覆盖计数阈值，节奏为每秒一次
+        self.assertGreater(source.arm_angle(0), 160)
+        self.assertLess(source.arm_angle(15), 80)
+        self.assertEqual(source.expected_reps(300), 10)
+    
+    def test_image_sequence_source(self):
+        """测试图片序列帧源"""
+        import cv2
+        
+        temp_dir = tempfile.mkdtemp()
+        try:
+            synthetic = SyntheticPushupSource(width=160, height=120)
+            for i in range(3):
+                cv2.imwrite(os.path.join(temp_dir, f'{i:03d}.png'), synthetic.render(i))
+            
+            source = create_frame_source(f'images:{temp_dir}?fps=15&realtime=0')
+            self.assertIsInstance(source, ImageSequenceSource)
+            self.assertTrue(source.open())
+            self.assertEqual(source.fps, 15)
+            self.assertFalse(source.realtime)
+            
+            count = 0
+            while source.read()[0]:
+                count += 1
+            self.assertEqual(count, 3)
+        finally:
+            for name in os.listdir(temp_dir):
+                os.remove(os.path.join(temp_dir, name))
+            os.rmdir(temp_dir)
+    
+    def test_camera_handler_with_source(self):
+        """测试摄像头处理器使用帧源"""
+        handler = CameraHandler(source='synthetic?width=320&height=240&frames=10&realtime=0')
+        self.assertTrue(handler.start_capture())
+        handler.capture_thread.join(timeout=5.0)
+        
+        self.assertFalse(handler.is_running)
+        self.assertEqual(handler.get_current_frame().shape, (240, 320, 3))
+        handler.stop_capture()
+    
+    def test_shared_frame_ring(self):
+        """测试共享内存帧环形缓冲区"""
+        from utils.shared_frames import SharedFrameRing
+        
+        ring = SharedFrameRing((24, 32, 3), slots=3)
+        try:
+            self.assertIsNone(ring.read_latest())
+            for i in range(5):
+                ring.write(np.full((24, 32, 3), i, dtype=np.uint8), timestamp=i * 0.1)
+            
+            # 读端只取最新帧，连接同一块共享内存的副本看到相同数据
+            attached = SharedFrameRing((24, 32, 3), slots=3, name=ring.name, condition=ring.condition)
+            seq, timestamp, frame = attached.read_latest(after=2)
+            self.assertEqual(seq, 5)
+            self.assertAlmostEqual(timestamp, 0.4)
+            self.assertTrue((frame == 4).all())
+            self.assertIsNone(attached.read_latest(after=5))
+            self.assertFalse(attached.wait(5, timeout=0.01))
+            attached.close()
+        finally:
+            ring.close()
+
+
+class TestLatencyMonitor(unittest.TestCase):
+    """延迟统计测试"""
+    
+    def test_latency_summary(self):
+        """测试延迟分布统计"""
+        monitor = LatencyMonitor(window=10)
+        for i in range(100):
+            timing = FrameTiming(i, capture=0.0)
+            timing.dispatch = 0.001
+            timing.inference_start = 0.002
+            timing.inference_end = 0.002 + i / 1000.0
+            timing.display = 0.010 + i / 1000.0
+            timing.rep = (i % 10 == 0)
+            monitor.record(timing)
+        
+        summary = monitor.summary()
+        self.assertEqual(summary['glass_to_glass']['count'], 100)
+        self.assertEqual(summary['rep_event']['count'], 10)
+        self.assertAlmostEqual(summary['inference']['p50'], 50.0, places=1)
+        self.assertAlmostEqual(summary['inference']['p95'], 95.0, places=1)
+        self.assertAlmostEqual(summary['queue_wait']['max'], 1.0, places=1)
+        
+        # 运行时统计只包含最近窗口
+        self.assertEqual(monitor.summary(recent=True)['glass_to_glass']['count'], 10)
+        self.assertIn('glass_to_glass', monitor.format_report())
+        
+        monitor.record_event('stop_to_popup', 0.004)
+        self.assertAlmostEqual(monitor.summary()['stop_to_popup']['max'], 4.0, places=1)
+        
+        monitor.reset()
+        self.assertEqual(monitor.summary()['inference']['count'], 0)
+    
+    def test_frame_rate_and_memory(self):
+        """测试帧率和内存统计"""
+        from utils.latency import now
+        
+        meter = FrameRateMeter(window=1.0)
+        start = now()
+        for i in range(10):
+            meter.tick(start - 2.0 + i * 0.01)  # 窗口之外
+        for i in range(15):
+            meter.tick(start + i * 0.001)
+        self.assertEqual(meter.rate(), 15)
+        self.assertEqual(meter.total, 25)
+        self.assertGreater(get_process_rss(), 0)
+    
+    def test_startup_timeline(self):
+        """测试启动阶段计时"""
+        from utils.startup import StartupTimeline
+        
+        timeline = StartupTimeline()
+        timeline.mark('imports')
+        timeline.mark('ui_build')
+        phases = timeline.phases()
+        self.assertEqual([name for name, _, _ in phases], ['imports', 'ui_build'])
+        self.assertAlmostEqual(sum(duration for _, duration, _ in phases), timeline.elapsed('ui_build'))
+        self.assertIsNone(timeline.elapsed('first_frame'))
+    
+    def test_capture_stats(self):
+        """测试采集统计：主线程未取走的帧计为丢帧"""
+        handler = CameraHandler(source='synthetic?width=320&height=240&frames=10&realtime=0')
+        handler.set_frame_callback(lambda frame: None)
+        handler.start_capture()
+        handler.capture_thread.join(timeout=5.0)
+        
+        stats = handler.get_capture_stats()
+        self.assertEqual(stats['frames'], 10)
+        self.assertEqual(stats['dropped'], 9)
+        self.assertEqual(stats['resolution'], (320, 240))
+        handler.stop_capture()
+        
+        # 性能浮层分别显示采集分辨率和模型输入尺寸
+        from screens.perf_hud import PerfHUD
+        text = PerfHUD.format_stats({'resolution': stats['resolution'], 'input_size': (256, 256)})
+        self.assertIn('Capture: 320x240', text)
+        self.assertIn('Model input: 256x256', text)
+    
+    def test_inference_timestamps(self):
+        """测试姿态检测器记录推理时间"""
+        detector = PoseDetector()
+        detector.process_interval = 1
+        try:
+            timing = FrameTiming(1)
+            detector.process_frame(SyntheticPushupSource(width=320, height=240).render(0), timing=timing)
+            self.assertIsNotNone(timing.inference_start)
+            self.assertGreaterEqual(timing.inference_end, timing.inference_start)
+        finally:
+            detector.cleanup()
+
+
+class TestFrameTracer(unittest.TestCase):
+    """帧流水线追踪测试"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.trace_file = os.path.join(self.temp_dir, 'trace.json')
+    
+    def tearDown(self):
+        """测试后清理"""
+        tracer.stop()
+        if os.path.exists(self.trace_file):
+            os.remove(self.trace_file)
+        os.rmdir(self.temp_dir)
+    
+    def test_disabled_tracer(self):
+        """测试关闭时不记录事件"""
+        local_tracer = FrameTracer()
+        with local_tracer.span('inference', 1):
+            pass
+        local_tracer.add_span('capture', 0.0, 1.0)
+        self.assertEqual(local_tracer.events, [])
+        self.assertIsNone(local_tracer.stop())
+    
+    def test_pipeline_trace(self):
+        """测试采集线程和检测流程的追踪输出"""
+        tracer.start(self.trace_file)
+        
+        handler = CameraHandler(source='synthetic?width=320&height=240&frames=3&realtime=0')
+        handler.start_capture()
+        handler.capture_thread.join(timeout=5.0)
+        handler.stop_capture()
+        
+        detector = PoseDetector()
+        detector.process_interval = 1
+        try:
+            detector.process_frame(handler.get_current_frame(), timing=FrameTiming(3))
+        finally:
+            detector.cleanup()
+        
+        self.assertEqual(tracer.stop(), self.trace_file)
+        with open(self.trace_file, 'r', encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+        
+        names = {event['name'] for event in events}
+        for name in ('capture', 'preprocess', 'inference', 'thread_name'):
+            self.assertIn(name, names)
+        
+        thread_names = {event['args']['name'] for event in events if event['ph'] == 'M'}
+        self.assertIn('CameraCapture', thread_names)
+        
+        inference = [event for event in events if event['name'] == 'inference']
+        self.assertEqual(inference[0]['args']['frame'], 3)
+
 
 class TestIntegration(unittest.TestCase):
     """集成测试"""
@@ -239,19 +1309,15 @@ class TestIntegration(unittest.TestCase):
     def setUp(self):
         """测试前准备"""
         self.temp_dir = tempfile.mkdtemp()
-        self.test_file = os.path.join(self.temp_dir, 'test_users.json')
     
     def tearDown(self):
         """测试后清理"""
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
-        os.rmdir(self.temp_dir)
+        shutil.rmtree(self.temp_dir)
     
     def test_user_workflow(self):
         """测试完整的用户工作流程"""
         # 创建用户管理器
-        user_manager = UserManager()
-        user_manager.users_file = self.test_file
+        user_manager = UserManager(data_dir=self.temp_dir)
         
         # 1. 用户注册
         success, message = user_manager.register("integration_test", "password123", "集成测试")
@@ -277,13 +1343,15 @@ class TestIntegration(unittest.TestCase):
         user_manager.save_users()
         
         # 6. 重新加载数据
-        new_user_manager = UserManager()
-        new_user_manager.users_file = self.test_file
+        new_user_manager = UserManager(data_dir=self.temp_dir)
         new_user_manager.load_users()
         
         # 7. 验证数据一致性
         new_stats = new_user_manager.get_user_statistics("integration_test")
         self.assertEqual(new_stats['total_pushups'], 75)
+        
+        user_manager.close()
+        new_user_manager.close()
 
 
 def run_tests():
@@ -298,9 +1366,15 @@ def run_tests():
     # 添加测试用例
     test_classes = [
         TestUserManager,
+        TestUserStore,
         TestPoseDetector,
+        TestPoseBackends,
         TestPermissionManager,
+        TestFonts,
         TestCameraHandler,
+        TestFrameSources,
+        TestLatencyMonitor,
+        TestFrameTracer,
         TestIntegration
     ]
     
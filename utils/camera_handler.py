@@ -10,6 +10,9 @@ import time
 from kivy.logger import Logger
 from kivy.clock import Clock
 
+from utils.latency import FrameRateMeter, FrameTiming, now
+from utils.tracing import tracer
+
 # 尝试导入OpenCV，如果失败则使用Kivy Camera
 try:
     import cv2
@@ -30,28 +33,116 @@ except ImportError:
     Logger.info("CameraHandler: Android camera API not available")
 
 
+# 采集模式协商时尝试的常见分辨率（按像素数从小到大）
+CANDIDATE_RESOLUTIONS = (
+    (320, 240), (352, 288), (424, 240), (640, 360), (640, 480),
+    (800, 600), (960, 540), (1280, 720), (1920, 1080),
+)
+# 像素格式按开销排序：YUYV无需解码，MJPG需要在CPU上解码JPEG，但带宽低，高分辨率下才能达到目标帧率
+FOURCC_PREFERENCE = ('YUYV', 'MJPG')
+
+# 已协商的采集模式：(摄像头索引, 最小宽, 最小高, 帧率) -> 模式，重新打开摄像头时不再逐个尝试
+_negotiated_modes = {}
+
+
+def decode_fourcc(value):
+    """把CAP_PROP_FOURCC的数值转换为四字符代码"""
+    code = int(value)
+    return ''.join(chr((code >> 8 * i) & 0xFF) for i in range(4)).strip('\x00')
+
+
+def negotiate_camera_mode(cap, min_width, min_height, fps):
+    """
+    选择满足要求的最小分辨率和开销最低的像素格式
+    
+    按分辨率从小到大、像素格式按FOURCC_PREFERENCE依次设置，读回驱动实际采用的参数，
+    第一个分辨率和帧率都满足要求的组合即为结果（驱动不报告帧率时视为满足）；
+    没有满足要求的组合时恢复原来的像素格式
+    
+    Args:
+        cap: 已打开的cv2.VideoCapture
+        min_width, min_height: 最小分辨率
+        fps: 目标帧率
+    
+    Returns:
+        dict: width、height、fps、fourcc，没有满足要求的模式时返回None
+    """
+    original_fourcc = cap.get(cv2.CAP_PROP_FOURCC)
+    for width, height in CANDIDATE_RESOLUTIONS:
+        if width < min_width or height < min_height:
+            continue
+        for fourcc in FOURCC_PREFERENCE:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+            cap.set(cv2.CAP_PROP_FPS, fps)
+            mode = {
+                'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                'fps': cap.get(cv2.CAP_PROP_FPS),
+                'fourcc': decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)),
+            }
+            if (mode['width'] >= min_width and mode['height'] >= min_height
+                    and (not mode['fps'] or mode['fps'] >= fps)):
+                return mode
+    cap.set(cv2.CAP_PROP_FOURCC, original_fourcc)
+    return None
+
+
 class CameraHandler:
     """摄像头处理器"""
     
-    def __init__(self, camera_index=0):
+    def __init__(self, camera_index=0, source=None):
         """
         初始化摄像头处理器
         
         Args:
             camera_index: 摄像头索引，默认为0（后置摄像头）
+            source: 可选的帧源（FrameSource对象或描述字符串，见create_frame_source），
+                    指定后代替真实摄像头
         """
         self.camera_index = camera_index
+        self.source = None
+        if source is not None:
+            from utils.frame_sources import create_frame_source
+            self.source = create_frame_source(source)
         self.cap = None
         self.is_running = False
         self.is_paused = False
         self.frame_callback = None
+        self.frame_event = None
         self.capture_thread = None
         self.current_frame = None
+        self.last_timing = None
+        # 最新一帧及其时间戳（一次赋值，供不使用帧回调的调用方在任意线程读取）
+        self.latest_capture = None
+        self.frame_index = 0
+        
+        # 帧率与丢帧统计：主线程来不及取走的帧会被新帧替换
+        self.capture_rate = FrameRateMeter()
+        self.dropped_frames = 0
+        self._pending = None
+        self._pending_lock = threading.Lock()
         self.fps = 30
         self.frame_width = 640
         self.frame_height = 480
         
-        Logger.info(f"CameraHandler: 初始化摄像头处理器，索引: {camera_index}")
+        # 采集模式协商：推理需要的最小分辨率（None时使用上面的固定设置）和实际采用的模式
+        self.min_width = None
+        self.min_height = None
+        self.camera_mode = None
+        
+        # 快速切换摄像头：新设备在后台线程中打开，由采集循环替换
+        self.last_switch_latency = None
+        self._switch_thread = None
+        self._switch_start = None
+        self._next_capture = None
+        self._switch_lock = threading.Lock()
+        
+        if self.source is not None:
+            Logger.info(f"CameraHandler: 初始化摄像头处理器，帧源: {type(self.source).__name__}")
+        else:
+            Logger.info(f"CameraHandler: 初始化摄像头处理器，索引: {camera_index}")
     
     def set_frame_callback(self, callback):
         """
@@ -62,34 +153,106 @@ class CameraHandler:
         """
         self.frame_callback = callback
     
+    def set_frame_event(self, event):
+        """
+        设置新帧通知（供不使用帧回调、在其他线程读取latest_capture的调用方等待新帧）
+        
+        Args:
+            event: threading.Event，每采集到一帧在采集线程中set一次
+        """
+        self.frame_event = event
+    
+    def _open_capture(self, camera_index):
+        """
+        打开并配置采集设备
+        
+        Args:
+            camera_index: 摄像头索引（使用帧源时忽略）
+        
+        Returns:
+            tuple: (采集对象（cv2.VideoCapture或帧源）, 实际采用的模式)，打开失败时返回(None, None)
+        """
+        if self.source is not None:
+            # 使用文件或合成帧源
+            cap = self.source
+            cap.open()
+        else:
+            # 在Android上可能需要特殊处理
+            cap = cv2.VideoCapture(camera_index)
+        
+        if not cap.isOpened():
+            Logger.error(f"CameraHandler: 无法打开摄像头 {camera_index}")
+            cap.release()
+            return None, None
+        
+        if self.min_width is not None and self.source is None:
+            mode = self._apply_negotiated_mode(cap, camera_index)
+        else:
+            mode = None
+        if mode is None:
+            # 设置摄像头参数（移动端优化）
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+        
+        # 获取实际设置的参数（由调用方与采集对象一起发布，切换摄像头的后台线程不直接修改）
+        camera_mode = {
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': cap.get(cv2.CAP_PROP_FPS),
+            'fourcc': decode_fourcc(cap.get(cv2.CAP_PROP_FOURCC)) if self.source is None else None,
+        }
+        
+        Logger.info(f"CameraHandler: 摄像头初始化成功")
+        Logger.info(f"CameraHandler: 分辨率: {camera_mode['width']}x{camera_mode['height']}, "
+                    f"FPS: {camera_mode['fps']}, 格式: {camera_mode['fourcc']}")
+        return cap, camera_mode
+    
+    def set_requirements(self, min_width, min_height, fps=None):
+        """
+        设置采集要求，下次打开摄像头时据此协商采集模式（代替固定的640x480）
+        
+        Args:
+            min_width, min_height: 推理需要的最小分辨率（见PoseDetector.get_capture_requirements）
+            fps: 目标帧率，默认为当前fps
+        """
+        self.min_width = min_width
+        self.min_height = min_height
+        if fps:
+            self.fps = fps
+    
+    def _apply_negotiated_mode(self, cap, camera_index):
+        """协商采集模式（结果按摄像头缓存），失败时返回None"""
+        key = (camera_index, self.min_width, self.min_height, self.fps)
+        mode = _negotiated_modes.get(key)
+        if mode is not None:
+            cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*mode['fourcc']))
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, mode['width'])
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, mode['height'])
+            cap.set(cv2.CAP_PROP_FPS, self.fps)
+            return mode
+        
+        start = now()
+        mode = negotiate_camera_mode(cap, self.min_width, self.min_height, self.fps)
+        if mode is None:
+            Logger.warning(f"CameraHandler: 没有满足 {self.min_width}x{self.min_height}@{self.fps} 的采集模式，"
+                           f"使用默认设置")
+            return None
+        _negotiated_modes[key] = mode
+        Logger.info(f"CameraHandler: 协商采集模式 {mode['width']}x{mode['height']} {mode['fourcc']}，"
+                    f"耗时 {(now() - start) * 1000:.0f} ms")
+        return mode
+    
     def initialize_camera(self):
         """初始化摄像头"""
         try:
             # 释放之前的摄像头
             if self.cap is not None:
                 self.cap.release()
+                self.cap = None
             
-            # 在Android上可能需要特殊处理
-            self.cap = cv2.VideoCapture(self.camera_index)
-            
-            if not self.cap.isOpened():
-                Logger.error("CameraHandler: 无法打开摄像头")
-                return False
-            
-            # 设置摄像头参数（移动端优化）
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.frame_width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.frame_height)
-            self.cap.set(cv2.CAP_PROP_FPS, self.fps)
-            
-            # 获取实际设置的参数
-            actual_width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-            actual_height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-            actual_fps = self.cap.get(cv2.CAP_PROP_FPS)
-            
-            Logger.info(f"CameraHandler: 摄像头初始化成功")
-            Logger.info(f"CameraHandler: 分辨率: {actual_width}x{actual_height}, FPS: {actual_fps}")
-            
-            return True
+            self.cap, self.camera_mode = self._open_capture(self.camera_index)
+            return self.cap is not None
             
         except Exception as e:
             Logger.error(f"CameraHandler: 摄像头初始化失败: {e}")
@@ -102,9 +265,12 @@ class CameraHandler:
         
         self.is_running = True
         self.is_paused = False
+        self.capture_rate.reset()
+        self.dropped_frames = 0
+        self._pending = None
         
         # 启动捕获线程
-        self.capture_thread = threading.Thread(target=self._capture_loop)
+        self.capture_thread = threading.Thread(target=self._capture_loop, name='CameraCapture')
         self.capture_thread.daemon = True
         self.capture_thread.start()
         
@@ -118,8 +284,15 @@ class CameraHandler:
         # 等待线程结束
         if self.capture_thread and self.capture_thread.is_alive():
             self.capture_thread.join(timeout=2.0)
+        switch_thread = self._switch_thread
+        if switch_thread is not None:
+            switch_thread.join(timeout=2.0)
         
-        # 释放摄像头
+        # 释放摄像头（包括切换中尚未接管的新设备）
+        with self._switch_lock:
+            pending, self._next_capture = self._next_capture, None
+        if pending is not None:
+            pending[1].release()
         if self.cap:
             self.cap.release()
             self.cap = None
@@ -138,11 +311,14 @@ class CameraHandler:
     
     def _capture_loop(self):
         """视频捕获循环"""
-        frame_interval = 1.0 / self.fps
+        frame_interval = self._get_frame_interval()
         last_frame_time = 0
         
         while self.is_running:
             try:
+                if self._next_capture is not None:
+                    self._swap_capture()
+                
                 if self.is_paused:
                     time.sleep(0.1)
                     continue
@@ -158,9 +334,16 @@ class CameraHandler:
                     Logger.warning("CameraHandler: 摄像头未打开")
                     break
                 
+                read_start = now()
                 ret, frame = self.cap.read()
+                capture_time = now()
+                tracer.add_span('capture', read_start, capture_time, self.frame_index + 1)
                 
                 if not ret:
+                    if getattr(self.cap, 'exhausted', False):
+                        # 帧源播放结束
+                        self.is_running = False
+                        break
                     Logger.warning("CameraHandler: 无法读取帧")
                     continue
                 
@@ -169,10 +352,27 @@ class CameraHandler:
                 
                 self.current_frame = frame
                 last_frame_time = current_time
+                self.frame_index += 1
+                self.capture_rate.tick(capture_time)
+                timing = FrameTiming(self.frame_index, capture_time)
+                self.latest_capture = (frame, timing)
+                if self.frame_event is not None:
+                    self.frame_event.set()
+                if self._switch_start is not None:
+                    # 切换后新设备的第一帧
+                    self.last_switch_latency = capture_time - self._switch_start
+                    self._switch_start = None
+                    Logger.info(f"CameraHandler: 切换摄像头耗时 {self.last_switch_latency * 1000:.0f} ms")
                 
-                # 调用回调函数（在主线程中执行）
+                # 调用回调函数（在主线程中执行），只保留最新一帧
                 if self.frame_callback:
-                    Clock.schedule_once(lambda dt: self.frame_callback(frame), 0)
+                    with self._pending_lock:
+                        scheduled = self._pending is not None
+                        if scheduled:
+                            self.dropped_frames += 1
+                        self._pending = (frame, timing)
+                    if not scheduled:
+                        Clock.schedule_once(self._dispatch_frame, 0)
                 
             except Exception as e:
                 Logger.error(f"CameraHandler: 捕获帧时出错: {e}")
@@ -180,6 +380,27 @@ class CameraHandler:
         
         Logger.info("CameraHandler: 捕获循环结束")
     
+    def _dispatch_frame(self, dt=None):
+        """在主线程中分发最新的帧，回调期间可通过last_timing获取帧时间戳"""
+        with self._pending_lock:
+            pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        frame, timing = pending
+        timing.dispatch = now()
+        tracer.add_async_span('queue_wait', timing.capture, timing.dispatch, timing.frame_id)
+        self.last_timing = timing
+        if self.frame_callback:
+            self.frame_callback(frame)
+    
+    def _get_frame_interval(self):
+        """获取帧间隔（帧源以最快速度播放时为0）"""
+        if self.source is not None:
+            if not self.source.realtime:
+                return 0
+            return 1.0 / (self.source.fps or self.fps)
+        return 1.0 / self.fps
+    
     def _process_frame(self, frame):
         """
         处理帧（旋转、翻转等）
@@ -208,19 +429,83 @@ class CameraHandler:
         """获取当前帧"""
         return self.current_frame
     
-    def switch_camera(self):
-        """切换前后摄像头"""
+    def switch_camera(self, fast=True):
+        """
+        切换前后摄像头
+        
+        Args:
+            fast: 采集进行中时，在后台打开新摄像头并由采集循环直接替换，
+                  采集线程和帧回调保持不变；False时停止采集后重新启动
+        
+        Returns:
+            bool: 是否开始切换
+        """
+        if self.source is not None:
+            Logger.info("CameraHandler: 使用帧源时不支持切换摄像头")
+            return False
+        
+        new_index = 1 - self.camera_index
+        if fast and self.is_running:
+            if self._switch_thread is not None:
+                Logger.info("CameraHandler: 正在切换摄像头")
+                return False
+            self._switch_start = None
+            switch_start = now()
+            self._switch_thread = threading.Thread(
+                target=self._open_for_switch, args=(new_index, switch_start), name='CameraSwitch')
+            self._switch_thread.daemon = True
+            self._switch_thread.start()
+            Logger.info(f"CameraHandler: 切换到摄像头 {new_index}")
+            return True
+        
         was_running = self.is_running
+        switch_start = now()
         
         if was_running:
             self.stop_capture()
         
         # 切换摄像头索引
-        self.camera_index = 1 - self.camera_index
+        self.camera_index = new_index
         Logger.info(f"CameraHandler: 切换到摄像头 {self.camera_index}")
         
         if was_running:
-            self.start_capture()
+            self._switch_start = switch_start
+            if not self.start_capture():
+                self._switch_start = None
+        return True
+    
+    def _open_for_switch(self, camera_index, switch_start):
+        """后台线程：打开新摄像头，交给采集循环替换"""
+        try:
+            cap, camera_mode = self._open_capture(camera_index)
+        except Exception as e:
+            Logger.error(f"CameraHandler: 切换摄像头失败: {e}")
+            cap = None
+        try:
+            if cap is None:
+                Logger.warning("CameraHandler: 新摄像头打开失败，继续使用当前摄像头")
+                return
+            with self._switch_lock:
+                if not self.is_running:
+                    cap.release()
+                    return
+                self._next_capture = (camera_index, cap, camera_mode, switch_start)
+        finally:
+            self._switch_thread = None
+    
+    def _swap_capture(self):
+        """采集线程：用已打开的新设备替换当前设备"""
+        with self._switch_lock:
+            pending, self._next_capture = self._next_capture, None
+        if pending is None:
+            return
+        camera_index, cap, camera_mode, switch_start = pending
+        old_cap, self.cap = self.cap, cap
+        self.camera_index = camera_index
+        self.camera_mode = camera_mode
+        self._switch_start = switch_start
+        if old_cap is not None:
+            old_cap.release()
     
     def set_resolution(self, width, height):
         """
@@ -255,6 +540,22 @@ class CameraHandler:
         """检查摄像头是否可用"""
         return self.cap is not None and self.cap.isOpened()
     
+    def get_capture_stats(self):
+        """
+        获取采集统计
+        
+        Returns:
+            dict: 采集帧率、已采集帧数、丢帧数和当前帧分辨率
+        """
+        frame = self.current_frame
+        return {
+            'fps': self.capture_rate.rate(),
+            'frames': self.frame_index,
+            'dropped': self.dropped_frames,
+            'resolution': (frame.shape[1], frame.shape[0]) if frame is not None else None,
+            'switch_latency': self.last_switch_latency
+        }
+    
     def get_camera_info(self):
         """获取摄像头信息"""
         if not self.is_camera_available():
@@ -264,5 +565,7 @@ class CameraHandler:
             'width': int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
             'height': int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
             'fps': self.cap.get(cv2.CAP_PROP_FPS),
-            'index': self.camera_index
+            'index': self.camera_index,
+            'mode': self.camera_mode,
+            'source': type(self.source).__name__ if self.source is not None else None
         }
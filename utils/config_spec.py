@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+配置描述字符串解析
+解析 "类型:路径?参数=值&..." 形式的描述字符串，用于帧源、推理后端等可替换组件的配置
+"""
+
+from urllib.parse import parse_qs
+
+
+def parse_spec(spec, schemes):
+    """
+    解析描述字符串
+
+    Args:
+        spec: 描述字符串，如 "video:/sdcard/a.mp4?realtime=0" 或 "synthetic?fps=15"
+        schemes: 可识别的类型名称列表
+
+    Returns:
+        tuple: (类型, 路径, 参数字典)，无法识别类型时类型为None、路径为去掉参数后的整个字符串
+    """
+    head, _, query = spec.partition('?')
+    options = {key: values[-1] for key, values in parse_qs(query).items()}
+
+    if head in schemes:
+        return head, '', options
+
+    scheme, sep, path = head.partition(':')
+    if sep and scheme in schemes:
+        return scheme, path, options
+    return None, head, options
+
+
+def option_flag(options, name, default):
+    """读取布尔参数（1/true/yes为真）"""
+    value = options.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes')
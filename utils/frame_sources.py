@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧源模块
+提供视频文件、图片序列和合成俯卧撑动画等可替换的帧源，
+接口与cv2.VideoCapture保持一致，供CameraHandler在没有摄像头时使用
+"""
+
+import glob
+import math
+import os
+import cv2
+import numpy as np
+from kivy.logger import Logger
+
+from utils.config_spec import option_flag, parse_spec
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class FrameSource:
+    """帧源基类（模拟cv2.VideoCapture的常用接口）"""
+
+    def __init__(self, fps=30, realtime=True, loop=False):
+        """
+        初始化帧源
+
+        Args:
+            fps: 帧率
+            realtime: True按帧率实时播放，False以最快速度输出
+            loop: 播放结束后是否从头循环
+        """
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self.width = 0
+        self.height = 0
+        self.frame_index = 0
+        self.exhausted = False
+        self._opened = False
+
+    def open(self):
+        """打开帧源，从头开始播放"""
+        self.frame_index = 0
+        self.exhausted = False
+        self._opened = True
+        return True
+
+    def isOpened(self):
+        """帧源是否已打开"""
+        return self._opened
+
+    def read(self):
+        """
+        读取下一帧
+
+        Returns:
+            tuple: (是否成功, 帧)
+        """
+        if not self._opened or self.exhausted:
+            return False, None
+
+        frame = self._read_frame()
+        if frame is None and self.loop and self.frame_index > 0:
+            self._rewind()
+            frame = self._read_frame()
+
+        if frame is None:
+            self.exhausted = True
+            Logger.info(f"FrameSource: 帧源播放结束，共 {self.frame_index} 帧")
+            return False, None
+
+        self.frame_index += 1
+        return True, frame
+
+    def release(self):
+        """释放帧源"""
+        self._opened = False
+
+    def get(self, prop):
+        """获取属性（支持宽、高、帧率和当前帧位置）"""
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return float(self.fps)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.frame_index)
+        return 0.0
+
+    def set(self, prop, value):
+        """设置属性（帧源的参数在创建时确定，默认忽略）"""
+        return False
+
+    def _read_frame(self):
+        """读取一帧，结束时返回None（子类实现）"""
+        raise NotImplementedError
+
+    def _rewind(self):
+        """回到第一帧"""
+        self.frame_index = 0
+
+
+class VideoFileSource(FrameSource):
+    """视频文件帧源"""
+
+    def __init__(self, path, realtime=True, loop=False):
+        """
+        初始化视频文件帧源
+
+        Args:
+            path: 视频文件路径
+            realtime: True按视频原始帧率播放，False以最快速度解码
+            loop: 是否循环播放
+        """
+        super().__init__(realtime=realtime, loop=loop)
+        self.path = path
+        self.cap = None
+
+    def open(self):
+        """打开视频文件"""
+        self.release()
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            Logger.error(f"FrameSource: 无法打开视频文件: {self.path}")
+            self.cap = None
+            return False
+
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        Logger.info(f"FrameSource: 打开视频文件 {self.path}，"
+                    f"{self.width}x{self.height} @ {self.fps:.1f}FPS")
+        return super().open()
+
+    def release(self):
+        """释放视频文件"""
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+        super().release()
+
+    def _read_frame(self):
+        ret, frame = self.cap.read()
+        return frame if ret else None
+
+    def _rewind(self):
+        super()._rewind()
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+
+class ImageSequenceSource(FrameSource):
+    """图片序列帧源"""
+
+    def __init__(self, path, fps=30, realtime=True, loop=False):
+        """
+        初始化图片序列帧源
+
+        Args:
+            path: 图片目录或通配符（如 frames/*.png），按文件名排序播放
+            fps: 播放帧率
+            realtime: 是否按帧率实时播放
+            loop: 是否循环播放
+        """
+        super().__init__(fps=fps, realtime=realtime, loop=loop)
+        self.path = path
+        self.files = []
+
+    def open(self):
+        """扫描图片文件"""
+        if os.path.isdir(self.path):
+            files = [os.path.join(self.path, name) for name in os.listdir(self.path)]
+        else:
+            files = glob.glob(self.path)
+        self.files = sorted(f for f in files if f.lower().endswith(IMAGE_EXTENSIONS))
+
+        if not self.files:
+            Logger.error(f"FrameSource: 未找到图片: {self.path}")
+            return False
+
+        first = cv2.imread(self.files[0])
+        if first is not None:
+            self.height, self.width = first.shape[:2]
+        Logger.info(f"FrameSource: 打开图片序列 {self.path}，共 {len(self.files)} 张")
+        return super().open()
+
+    def _read_frame(self):
+        while self.frame_index < len(self.files):
+            frame = cv2.imread(self.files[self.frame_index])
+            if frame is not None:
+                return frame
+            Logger.warning(f"FrameSource: 无法读取图片: {self.files[self.frame_index]}")
+            self.frame_index += 1
+        return None
+
+
+class SyntheticPushupSource(FrameSource):
+    """合成帧源：侧视角火柴人按固定节奏做俯卧撑"""
+
+    # 肘关节角度范围（度），覆盖PoseDetector的计数阈值
+    TOP_ARM_ANGLE = 170.0
+    BOTTOM_ARM_ANGLE = 60.0
+
+    def __init__(self, width=640, height=480, fps=30, cadence=30,
+                 num_frames=None, realtime=True):
+        """
+        初始化合成帧源
+
+        Args:
+            width, height: 输出分辨率
+            fps: 帧率
+            cadence: 动作节奏（每分钟俯卧撑次数）
+            num_frames: 总帧数，None表示无限输出
+            realtime: 是否按帧率实时输出
+        """
+        super().__init__(fps=fps, realtime=realtime)
+        self.width = width
+        self.height = height
+        self.cadence = cadence
+        self.num_frames = num_frames
+
+        # 身体尺寸（像素），以较短边为基准保持比例
+        unit = min(width, height * 4 / 3)
+        self.segment = 0.11 * unit         # 上臂/前臂长度
+        self.body_length = 0.62 * unit     # 脚踝到肩膀
+        self.ground_y = 0.85 * height
+        self.feet_x = 0.5 * (width - self.body_length)
+        self.thickness = max(2, int(unit / 80))
+
+        self._background = np.full((height, width, 3), 96, dtype=np.uint8)
+        cv2.line(self._background, (0, int(self.ground_y) + self.thickness),
+                 (width, int(self.ground_y) + self.thickness), (60, 60, 60), self.thickness)
+
+    def phase(self, index):
+        """
+        获取第index帧的动作相位
+
+        Returns:
+            float: 0表示手臂伸直（最高点），1表示最低点
+        """
+        t = index / self.fps
+        return (1 - math.cos(2 * math.pi * t * self.cadence / 60.0)) / 2
+
+    def arm_angle(self, index):
+        """第index帧的肘关节角度（度）"""
+        return self.TOP_ARM_ANGLE + (self.BOTTOM_ARM_ANGLE - self.TOP_ARM_ANGLE) * self.phase(index)
+
+    def expected_reps(self, frames):
+        """前frames帧内应完成的俯卧撑次数"""
+        return int(frames / self.fps * self.cadence / 60.0 + 0.5)
+
+    def joints(self, index):
+        """
+        计算第index帧各关节的像素坐标
+
+        Returns:
+            dict: 关节名 -> (x, y)
+        """
+        s = self.segment
+        # 手腕在肩膀正下方，肩高即肩腕距离
+        d = 2 * s * math.sin(math.radians(self.arm_angle(index)) / 2)
+        ankle = (self.feet_x, self.ground_y)
+        shoulder = (ankle[0] + math.sqrt(max(self.body_length ** 2 - d ** 2, 0.0)),
+                    self.ground_y - d)
+        wrist = (shoulder[0], self.ground_y)
+        # 肘部向脚的方向弯曲
+        offset = math.sqrt(max(s ** 2 - (d / 2) ** 2, 0.0))
+        elbow = (shoulder[0] - offset, self.ground_y - d / 2)
+
+        def along(ratio):
+            return (ankle[0] + (shoulder[0] - ankle[0]) * ratio,
+                    ankle[1] + (shoulder[1] - ankle[1]) * ratio)
+
+        dx = shoulder[0] - ankle[0]
+        dy = shoulder[1] - ankle[1]
+        norm = math.hypot(dx, dy) or 1.0
+        head = (shoulder[0] + dx / norm * s * 0.8, shoulder[1] + dy / norm * s * 0.8)
+
+        return {
+            'ankle': ankle,
+            'knee': along(0.28),
+            'hip': along(0.55),
+            'shoulder': shoulder,
+            'elbow': elbow,
+            'wrist': wrist,
+            'head': head,
+        }
+
+    def landmarks(self, index):
+        """
+        第index帧的真实关键点（MediaPipe 33点布局，坐标按宽高归一化）
+
+        Returns:
+            numpy.ndarray: (33, 4) 的 x, y, z, visibility，未绘制的关键点visibility为0
+        """
+        from core.pose_backends import LANDMARK_INDEX, NUM_LANDMARKS
+
+        points = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+        joints = self.joints(index)
+        for side in ('LEFT', 'RIGHT'):
+            for name in ('shoulder', 'elbow', 'wrist', 'hip', 'knee', 'ankle'):
+                x, y = joints[name]
+                points[LANDMARK_INDEX[f'{side}_{name.upper()}']] = (
+                    x / self.width, y / self.height, 0.0, 1.0)
+        x, y = joints['head']
+        points[LANDMARK_INDEX['NOSE']] = (x / self.width, y / self.height, 0.0, 1.0)
+        return points
+
+    def _read_frame(self):
+        if self.num_frames is not None and self.frame_index >= self.num_frames:
+            return None
+        return self.render(self.frame_index)
+
+    def render(self, index):
+        """渲染第index帧（同一帧号结果完全一致）"""
+        frame = self._background.copy()
+        j = {name: (int(round(x)), int(round(y))) for name, (x, y) in self.joints(index).items()}
+        color = (235, 235, 235)
+        for a, b in (('ankle', 'knee'), ('knee', 'hip'), ('hip', 'shoulder'),
+                     ('shoulder', 'elbow'), ('elbow', 'wrist')):
+            cv2.line(frame, j[a], j[b], color, self.thickness * 2, cv2.LINE_AA)
+        cv2.circle(frame, j['head'], int(self.segment * 0.45), color, -1, cv2.LINE_AA)
+        return frame
+
+
+def create_frame_source(spec):
+    """
+    根据描述字符串创建帧源
+
+    支持的格式：
+        synthetic[?width=640&height=480&fps=30&cadence=30&frames=300&realtime=1]
+        video:<路径>[?realtime=0&loop=1]
+        images:<目录或通配符>[?fps=15&realtime=0&loop=1]
+        <视频路径或图片目录>
+
+    Args:
+        spec: 描述字符串，为空时返回None（使用真实摄像头）
+
+    Returns:
+        FrameSource: 帧源对象
+    """
+    if not spec:
+        return None
+    if isinstance(spec, FrameSource):
+        return spec
+
+    scheme, path, options = parse_spec(spec, ('synthetic', 'video', 'images'))
+    if scheme is None:
+        # 不带前缀时根据路径类型判断
+        scheme = 'images' if os.path.isdir(path) else 'video'
+
+    if scheme == 'synthetic':
+        frames = options.get('frames')
+        return SyntheticPushupSource(
+            width=int(options.get('width', 640)),
+            height=int(options.get('height', 480)),
+            fps=float(options.get('fps', 30)),
+            cadence=float(options.get('cadence', 30)),
+            num_frames=int(frames) if frames else None,
+            realtime=option_flag(options, 'realtime', True)
+        )
+    if scheme == 'images':
+        return ImageSequenceSource(path, fps=float(options.get('fps', 30)),
+                                   realtime=option_flag(options, 'realtime', True), loop=option_flag(options, 'loop', False))
+    return VideoFileSource(path, realtime=option_flag(options, 'realtime', True), loop=option_flag(options, 'loop', False))
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟统计模块
+记录每一帧从采集、推理到显示的时间戳，统计端到端延迟分布，以及帧率和内存占用
+"""
+
+import os
+import threading
+import time
+from array import array
+from collections import deque
+
+from kivy.logger import Logger
+
+
+def now():
+    """获取单调时钟时间（秒）"""
+    return time.perf_counter()
+
+
+class FrameTiming:
+    """单帧在处理流程中各阶段的时间戳"""
+
+    __slots__ = ('frame_id', 'capture', 'dispatch', 'inference_start',
+                 'inference_end', 'display', 'rep')
+
+    def __init__(self, frame_id, capture=None):
+        """
+        初始化帧时间戳
+
+        Args:
+            frame_id: 帧序号
+            capture: 采集时间，默认为当前时间
+        """
+        self.frame_id = frame_id
+        self.capture = now() if capture is None else capture
+        self.dispatch = None
+        self.inference_start = None
+        self.inference_end = None
+        self.display = None
+        self.rep = False
+
+
+class FrameRateMeter:
+    """帧率统计（最近一段时间内的事件速率）"""
+
+    def __init__(self, window=1.0):
+        """
+        初始化帧率统计
+
+        Args:
+            window: 统计时间窗口（秒）
+        """
+        self.window = window
+        self.ticks = deque()
+        self.total = 0
+        self._lock = threading.Lock()
+
+    def tick(self, t=None):
+        """记录一次事件（可在任意线程调用）"""
+        t = now() if t is None else t
+        with self._lock:
+            self.ticks.append(t)
+            self.total += 1
+            self._trim(t)
+
+    def rate(self):
+        """获取当前速率（次/秒）"""
+        with self._lock:
+            self._trim(now())
+            return len(self.ticks) / self.window
+
+    def reset(self):
+        """清空统计"""
+        with self._lock:
+            self.ticks.clear()
+            self.total = 0
+
+    def _trim(self, t):
+        while self.ticks and t - self.ticks[0] > self.window:
+            self.ticks.popleft()
+
+
+def get_process_rss():
+    """
+    获取当前进程的常驻内存（字节）
+
+    Returns:
+        int: 常驻内存大小，无法获取时返回0
+    """
+    try:
+        # Linux/Android：/proc/self/statm 第二列为常驻页数
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        # 其他平台退回到峰值内存
+        import resource
+        import sys
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return usage if sys.platform == 'darwin' else usage * 1024
+    except Exception:
+        return 0
+
+
+def get_process_write_bytes():
+    """
+    获取当前进程累计写出的字节数（所有write系统调用，含后台线程）
+
+    Returns:
+        int: 写出字节数，无法获取时（非Linux/Android）返回0
+    """
+    try:
+        with open('/proc/self/io', 'r') as f:
+            for line in f:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class LatencyStats:
+    """单项延迟的分布统计"""
+
+    def __init__(self, window=300):
+        """
+        初始化统计
+
+        Args:
+            window: 运行时统计使用的最近样本数
+        """
+        self.recent = deque(maxlen=window)
+        self.samples = array('d')
+
+    def add(self, seconds):
+        """添加一个样本（秒）"""
+        self.recent.append(seconds)
+        self.samples.append(seconds)
+
+    def reset(self):
+        """清空样本"""
+        self.recent.clear()
+        self.samples = array('d')
+
+    def summary(self, recent=False):
+        """
+        获取分布摘要
+
+        Args:
+            recent: True只统计最近窗口内的样本，False统计整个会话
+
+        Returns:
+            dict: 样本数及均值、p50、p95、p99、最大值（毫秒）
+        """
+        values = sorted(self.recent if recent else self.samples)
+        count = len(values)
+        if not count:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+
+        def percentile(p):
+            return values[min(count - 1, int(p / 100.0 * count))] * 1000.0
+
+        return {
+            'count': count,
+            'mean': round(sum(values) / count * 1000.0, 2),
+            'p50': round(percentile(50), 2),
+            'p95': round(percentile(95), 2),
+            'p99': round(percentile(99), 2),
+            'max': round(values[-1] * 1000.0, 2)
+        }
+
+
+class LatencyMonitor:
+    """端到端延迟监控"""
+
+    # 统计项: (名称, 起始时间戳, 结束时间戳)
+    METRICS = (
+        ('glass_to_glass', 'capture', 'display'),
+        ('queue_wait', 'capture', 'dispatch'),
+        ('inference', 'inference_start', 'inference_end'),
+        ('inference_to_display', 'inference_end', 'display'),
+    )
+
+    # 不属于单帧的事件延迟（如停止检测到结果弹窗显示、点击开始或从后台恢复到首帧推理完成）
+    EVENTS = ('rep_event', 'stop_to_popup', 'start_to_first_frame', 'resume_to_first_frame')
+
+    def __init__(self, window=300):
+        """
+        初始化延迟监控
+
+        Args:
+            window: 运行时统计使用的最近样本数
+        """
+        self.stats = {name: LatencyStats(window) for name, _, _ in self.METRICS}
+        for name in self.EVENTS:
+            self.stats[name] = LatencyStats(window)
+        self.frames = 0
+
+    def record(self, timing):
+        """
+        记录一帧的时间戳（在帧显示后调用）
+
+        Args:
+            timing: FrameTiming对象
+        """
+        self.frames += 1
+        for name, start, end in self.METRICS:
+            start_time = getattr(timing, start)
+            end_time = getattr(timing, end)
+            if start_time is not None and end_time is not None:
+                self.stats[name].add(end_time - start_time)
+
+        # 计数增加的那一帧：从采集到计数显示的延迟
+        if timing.rep and timing.display is not None:
+            self.stats['rep_event'].add(timing.display - timing.capture)
+
+    def record_event(self, name, seconds):
+        """
+        记录一次事件延迟
+
+        Args:
+            name: 事件名称（见EVENTS）
+            seconds: 耗时（秒）
+        """
+        self.stats[name].add(seconds)
+
+    def summary(self, recent=False):
+        """
+        获取各项延迟的分布摘要
+
+        Args:
+            recent: True只统计最近窗口内的样本
+
+        Returns:
+            dict: 统计项名称 -> 分布摘要
+        """
+        return {name: stats.summary(recent) for name, stats in self.stats.items()}
+
+    def format_report(self):
+        """生成会话延迟报告文本"""
+        lines = [f"延迟报告（共 {self.frames} 帧，单位ms）"]
+        for name, summary in self.summary().items():
+            lines.append(f"  {name}: n={summary['count']} mean={summary['mean']} "
+                         f"p50={summary['p50']} p95={summary['p95']} "
+                         f"p99={summary['p99']} max={summary['max']}")
+        return '\n'.join(lines)
+
+    def log_report(self):
+        """输出会话延迟报告到日志"""
+        for line in self.format_report().split('\n'):
+            Logger.info(f"LatencyMonitor: {line}")
+
+    def reset(self):
+        """清空所有统计"""
+        for stats in self.stats.values():
+            stats.reset()
+        self.frames = 0
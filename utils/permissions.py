@@ -2,123 +2,139 @@
 # -*- coding: utf-8 -*-
 """
 Android权限管理模块
-处理摄像头、存储等权限申请
+处理摄像头、存储等权限申请；权限状态缓存在内存中，应用恢复和申请结果回调时刷新，
+检查权限不再每次调用Android接口
 """
 
 from kivy.logger import Logger
 
+from utils.platform_probe import android_permissions
+
+
+# Android权限接口（非Android环境下为None，视为全部已授予）
+if android_permissions is not None:
+    check_permission = android_permissions.check_permission
+    _request_permissions = android_permissions.request_permissions
+else:
+    check_permission = None
+    _request_permissions = None
+
+CAMERA_PERMISSION = 'android.permission.CAMERA'
+STORAGE_PERMISSIONS = [
+    'android.permission.WRITE_EXTERNAL_STORAGE',
+    'android.permission.READ_EXTERNAL_STORAGE',
+]
+
 
 class PermissionManager:
     """权限管理器"""
     
     def __init__(self):
+        # 权限状态缓存：权限名 -> 是否已授予
         self.permissions_granted = {}
-        self.required_permissions = [
-            'android.permission.CAMERA',
-            'android.permission.WRITE_EXTERNAL_STORAGE',
-            'android.permission.READ_EXTERNAL_STORAGE',
-        ]
+        self.required_permissions = [CAMERA_PERMISSION] + STORAGE_PERMISSIONS
+    
+    def refresh(self, permissions=None):
+        """
+        从系统重新读取权限状态（应用恢复时调用，用户可能在系统设置中修改了权限）
+        
+        Args:
+            permissions: 要刷新的权限列表，默认为全部必要权限
+        """
+        for permission in permissions or self.required_permissions:
+            if check_permission is None:
+                self.permissions_granted[permission] = True
+                continue
+            try:
+                self.permissions_granted[permission] = bool(check_permission(permission))
+            except Exception as e:
+                Logger.error(f"PermissionManager: 检查权限失败: {permission}: {e}")
+                self.permissions_granted.pop(permission, None)
+    
+    def is_granted(self, permission):
+        """
+        检查权限是否已授予（优先使用缓存）
+        
+        Args:
+            permission: 权限名
+        
+        Returns:
+            bool: 是否已授予
+        """
+        if permission not in self.permissions_granted:
+            self.refresh([permission])
+        return self.permissions_granted.get(permission, False)
+    
+    def _request(self, permissions):
+        """申请权限，结果通过回调写入缓存"""
+        _request_permissions(permissions, self._on_request_result)
+    
+    def _on_request_result(self, permissions, grant_results):
+        """权限申请结果回调（可能在Android的UI线程中调用）"""
+        for permission, granted in zip(permissions, grant_results):
+            self.permissions_granted[permission] = bool(granted)
+            Logger.info(f"PermissionManager: 权限 {permission} {'已授予' if granted else '被拒绝'}")
     
     def request_permissions(self):
         """申请必要权限"""
+        if _request_permissions is None:
+            # 非Android环境，跳过权限检查
+            Logger.info("PermissionManager: 非Android环境，跳过权限检查")
+            self.refresh()
+            return
         try:
-            # 检查是否在Android环境
-            from android.permissions import request_permissions, Permission
-            from android.permissions import check_permission
-            
-            # 检查权限状态
-            permissions_to_request = []
-            
+            self.refresh()
+            permissions_to_request = [permission for permission in self.required_permissions
+                                      if not self.permissions_granted.get(permission)]
             for permission in self.required_permissions:
-                if not check_permission(permission):
-                    permissions_to_request.append(permission)
+                if permission in permissions_to_request:
                     Logger.info(f"PermissionManager: 需要申请权限: {permission}")
                 else:
-                    self.permissions_granted[permission] = True
                     Logger.info(f"PermissionManager: 权限已授予: {permission}")
             
             # 申请缺失的权限
             if permissions_to_request:
                 Logger.info(f"PermissionManager: 申请权限: {permissions_to_request}")
-                request_permissions(permissions_to_request)
+                self._request(permissions_to_request)
             else:
                 Logger.info("PermissionManager: 所有权限已授予")
                 
-        except ImportError:
-            # 非Android环境，跳过权限检查
-            Logger.info("PermissionManager: 非Android环境，跳过权限检查")
-            for permission in self.required_permissions:
-                self.permissions_granted[permission] = True
         except Exception as e:
             Logger.error(f"PermissionManager: 权限申请失败: {e}")
     
     def check_camera_permission(self):
         """检查摄像头权限"""
-        try:
-            from android.permissions import check_permission
-            return check_permission('android.permission.CAMERA')
-        except ImportError:
-            return True  # 非Android环境默认有权限
-        except Exception as e:
-            Logger.error(f"PermissionManager: 检查摄像头权限失败: {e}")
-            return False
+        return self.is_granted(CAMERA_PERMISSION)
     
     def check_storage_permission(self):
         """检查存储权限"""
-        try:
-            from android.permissions import check_permission
-            return (check_permission('android.permission.WRITE_EXTERNAL_STORAGE') and
-                   check_permission('android.permission.READ_EXTERNAL_STORAGE'))
-        except ImportError:
-            return True  # 非Android环境默认有权限
-        except Exception as e:
-            Logger.error(f"PermissionManager: 检查存储权限失败: {e}")
-            return False
+        return all(self.is_granted(permission) for permission in STORAGE_PERMISSIONS)
     
     def request_camera_permission(self):
         """单独申请摄像头权限"""
+        if _request_permissions is None:
+            Logger.info("PermissionManager: 非Android环境，跳过摄像头权限申请")
+            return
         try:
-            from android.permissions import request_permission
-            request_permission('android.permission.CAMERA')
+            self._request([CAMERA_PERMISSION])
             Logger.info("PermissionManager: 已申请摄像头权限")
-        except ImportError:
-            Logger.info("PermissionManager: 非Android环境，跳过摄像头权限申请")
         except Exception as e:
             Logger.error(f"PermissionManager: 申请摄像头权限失败: {e}")
     
     def request_storage_permission(self):
         """单独申请存储权限"""
+        if _request_permissions is None:
+            Logger.info("PermissionManager: 非Android环境，跳过存储权限申请")
+            return
         try:
-            from android.permissions import request_permissions
-            request_permissions([
-                'android.permission.WRITE_EXTERNAL_STORAGE',
-                'android.permission.READ_EXTERNAL_STORAGE'
-            ])
+            self._request(list(STORAGE_PERMISSIONS))
             Logger.info("PermissionManager: 已申请存储权限")
-        except ImportError:
-            Logger.info("PermissionManager: 非Android环境，跳过存储权限申请")
         except Exception as e:
             Logger.error(f"PermissionManager: 申请存储权限失败: {e}")
     
     def get_permission_status(self):
         """获取权限状态"""
-        status = {}
-        try:
-            from android.permissions import check_permission
-            
-            for permission in self.required_permissions:
-                status[permission] = check_permission(permission)
-                
-        except ImportError:
-            # 非Android环境，所有权限默认为True
-            for permission in self.required_permissions:
-                status[permission] = True
-        except Exception as e:
-            Logger.error(f"PermissionManager: 获取权限状态失败: {e}")
-            for permission in self.required_permissions:
-                status[permission] = False
-        
-        return status
+        return {permission: self.is_granted(permission) for permission in self.required_permissions}
     
     def is_all_permissions_granted(self):
         """检查是否所有权限都已授予"""
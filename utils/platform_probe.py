@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+平台探测模块
+在导入时判断一次是否运行在Android上以及哪些Android API可用，
+其他模块直接使用这里的结果，不必在每次调用时尝试导入并捕获ImportError
+"""
+
+import importlib
+
+from kivy.logger import Logger
+from kivy.utils import platform
+
+
+IS_ANDROID = platform == 'android'
+
+
+def _probe(module_name):
+    """
+    导入Android模块
+
+    Returns:
+        module: 模块对象，非Android环境或导入失败时返回None
+    """
+    if not IS_ANDROID:
+        return None
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        Logger.warning(f"PlatformProbe: {module_name} 不可用: {e}")
+        return None
+
+
+# python-for-android提供的模块（非Android环境下为None）
+android_permissions = _probe('android.permissions')
+android_storage = _probe('android.storage')
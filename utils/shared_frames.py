@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享内存帧环形缓冲区
+在进程之间传递视频帧：帧数据直接写入multiprocessing.shared_memory，不经过pickle；
+读端总是取最新的一帧，来不及读取的旧帧被覆盖（与CameraHandler只保留最新帧的策略一致）
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedFrameRing:
+    """固定尺寸帧的共享内存环形缓冲区（单写多读）"""
+
+    def __init__(self, shape, slots=4, name=None, condition=None):
+        """
+        创建或连接缓冲区
+
+        Args:
+            shape: 帧形状，如 (480, 640, 3)，dtype为uint8
+            slots: 槽位数，读端处理一帧期间写端可写入 slots-1 帧而不覆盖正在读取的帧
+            name: 已有共享内存的名称（子进程连接时使用），为空时新建
+            condition: 进程间条件变量（连接时传入创建方的），为空时新建
+        """
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape))
+        # 头部：最新序号，各槽位序号（写入中为-1），各槽位采集时间
+        header_bytes = 8 * (1 + 2 * slots)
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(
+            name=name, create=self.owner, size=header_bytes + slots * self.frame_bytes)
+        self.name = self.shm.name
+        self.condition = condition or multiprocessing.Condition()
+
+        buf = self.shm.buf
+        self._head = np.ndarray((1,), dtype=np.int64, buffer=buf, offset=0)
+        self._slot_seq = np.ndarray((slots,), dtype=np.int64, buffer=buf, offset=8)
+        self._slot_time = np.ndarray((slots,), dtype=np.float64, buffer=buf, offset=8 * (1 + slots))
+        self._frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=buf, offset=header_bytes)
+        if self.owner:
+            self._head[0] = 0
+            self._slot_seq[:] = -1
+
+    def __getstate__(self):
+        # 传给子进程时只传名称，由子进程重新映射同一块共享内存
+        return {'shape': self.shape, 'slots': self.slots, 'name': self.name, 'condition': self.condition}
+
+    def __setstate__(self, state):
+        self.__init__(state['shape'], state['slots'], name=state['name'], condition=state['condition'])
+
+    @property
+    def latest(self):
+        """最新写入的帧序号（从1开始，0表示还没有帧）"""
+        return int(self._head[0])
+
+    def write(self, frame, timestamp):
+        """
+        写入一帧
+
+        Args:
+            frame: uint8帧，形状必须与缓冲区一致
+            timestamp: 采集时间（utils.latency.now，系统范围的单调时钟）
+
+        Returns:
+            int: 帧序号
+        """
+        with self.condition:
+            seq = int(self._head[0]) + 1
+            slot = seq % self.slots
+            self._slot_seq[slot] = -1
+        # 复制帧数据时不持有锁，读端通过槽位序号判断是否被覆盖
+        np.copyto(self._frames[slot], frame)
+        with self.condition:
+            self._slot_time[slot] = timestamp
+            self._slot_seq[slot] = seq
+            self._head[0] = seq
+            self.condition.notify_all()
+        return seq
+
+    def read_latest(self, after=0, out=None):
+        """
+        读取最新的一帧
+
+        Args:
+            after: 只返回序号大于该值的帧
+            out: 可选的输出数组（避免每帧分配内存）
+
+        Returns:
+            tuple: (序号, 采集时间, 帧)，没有更新的帧时返回None
+        """
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+        while True:
+            with self.condition:
+                seq = int(self._head[0])
+            if seq <= after:
+                return None
+            slot = seq % self.slots
+            np.copyto(out, self._frames[slot])
+            with self.condition:
+                if self._slot_seq[slot] == seq:
+                    return seq, float(self._slot_time[slot]), out
+            # 复制期间槽位被覆盖，重新读取更新的帧
+
+    def wait(self, after, timeout=None):
+        """
+        等待序号大于after的帧
+
+        Returns:
+            bool: 是否有新帧
+        """
+        with self.condition:
+            return self.condition.wait_for(lambda: self._head[0] > after, timeout)
+
+    def close(self):
+        """断开共享内存（创建方同时删除）"""
+        # 释放指向共享内存的数组后才能关闭
+        self._head = self._slot_seq = self._slot_time = self._frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时记录模块
+记录从进程启动到首帧显示的各个阶段（模块导入、字体注册、界面构建、首帧），启动完成后输出到日志
+本模块只依赖标准库，应在main.py中最先导入，使计时起点尽量接近进程启动
+"""
+
+import time
+
+
+class StartupTimeline:
+    """启动阶段时间线"""
+
+    def __init__(self, origin=None):
+        """
+        初始化时间线
+
+        Args:
+            origin: 计时起点（time.perf_counter()），默认为当前时间
+        """
+        self.origin = time.perf_counter() if origin is None else origin
+        self.marks = []
+        self.reported = False
+
+    def mark(self, name):
+        """
+        记录一个阶段结束
+
+        Args:
+            name: 阶段名称（如 'imports'、'fonts'、'ui_build'、'first_frame'）
+
+        Returns:
+            float: 自起点以来的耗时（秒）
+        """
+        elapsed = time.perf_counter() - self.origin
+        self.marks.append((name, elapsed))
+        return elapsed
+
+    def elapsed(self, name):
+        """
+        获取某个阶段结束时自起点以来的耗时
+
+        Returns:
+            float: 耗时（秒），该阶段尚未记录时返回None
+        """
+        for mark, elapsed in self.marks:
+            if mark == name:
+                return elapsed
+        return None
+
+    def phases(self):
+        """
+        获取各阶段自身的耗时
+
+        Returns:
+            list: (阶段名称, 阶段耗时秒, 累计耗时秒)
+        """
+        result = []
+        previous = 0.0
+        for name, elapsed in self.marks:
+            result.append((name, elapsed - previous, elapsed))
+            previous = elapsed
+        return result
+
+    def format_report(self):
+        """生成启动耗时报告文本"""
+        lines = ["启动耗时（单位ms）"]
+        for name, duration, elapsed in self.phases():
+            lines.append(f"  {name}: +{duration * 1000:.1f} (累计 {elapsed * 1000:.1f})")
+        return '\n'.join(lines)
+
+    def log_report(self):
+        """输出启动耗时报告到日志（只输出一次）"""
+        if self.reported:
+            return
+        self.reported = True
+        from kivy.logger import Logger
+        for line in self.format_report().split('\n'):
+            Logger.info(f"StartupTimeline: {line}")
+
+
+# 全局启动时间线
+startup_timeline = StartupTimeline()
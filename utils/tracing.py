@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+帧流水线追踪模块
+记录采集线程、主线程等各阶段的耗时区间，导出为Chrome Trace Event格式的JSON文件，
+可在 chrome://tracing 或 Perfetto 中打开
+"""
+
+import gc
+import json
+import os
+import threading
+from contextlib import nullcontext
+
+from kivy.logger import Logger
+
+from utils.latency import now
+
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    """耗时区间上下文"""
+
+    __slots__ = ('tracer', 'name', 'frame_id', 'start')
+
+    def __init__(self, tracer, name, frame_id):
+        self.tracer = tracer
+        self.name = name
+        self.frame_id = frame_id
+        self.start = None
+
+    def __enter__(self):
+        self.start = now()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.tracer.add_span(self.name, self.start, now(), self.frame_id)
+        return False
+
+
+class FrameTracer:
+    """帧流水线追踪器（默认关闭，关闭时开销可忽略）"""
+
+    def __init__(self, max_events=500000):
+        """
+        初始化追踪器
+
+        Args:
+            max_events: 最多记录的事件数，超出后停止记录
+        """
+        self.enabled = False
+        self.active = False
+        self.max_events = max_events
+        self.events = []
+        self.path = None
+        self._origin = 0.0
+        self._lock = threading.Lock()
+        self._thread_ids = {}
+        self._gc_start = None
+        self._async_id = 0
+
+    def start(self, path):
+        """
+        开始追踪
+
+        Args:
+            path: 追踪文件输出路径
+        """
+        with self._lock:
+            self.events = []
+            self._thread_ids = {}
+            self._async_id = 0
+        self.path = path
+        self._origin = now()
+        self.active = True
+        self.enabled = True
+        if self._on_gc not in gc.callbacks:
+            gc.callbacks.append(self._on_gc)
+        Logger.info(f"FrameTracer: 开始追踪，输出到 {path}")
+
+    def stop(self):
+        """
+        停止追踪并写出文件
+
+        Returns:
+            str: 追踪文件路径，未开启或写出失败时返回None
+        """
+        if not self.active:
+            return None
+
+        self.active = False
+        self.enabled = False
+        if self._on_gc in gc.callbacks:
+            gc.callbacks.remove(self._on_gc)
+        return self.save(self.path)
+
+    def save(self, path):
+        """将已记录的事件写出为Chrome Trace JSON"""
+        try:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock:
+                events = list(self.events)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+            Logger.info(f"FrameTracer: 已写出 {len(events)} 个事件到 {path}")
+            return path
+        except Exception as e:
+            Logger.error(f"FrameTracer: 写出追踪文件失败: {e}")
+            return None
+
+    def span(self, name, frame_id=None):
+        """
+        记录一个耗时区间
+
+        用法：
+            with tracer.span('inference', frame_id):
+                ...
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, frame_id)
+
+    def add_span(self, name, start, end, frame_id=None):
+        """
+        添加当前线程上的耗时区间
+
+        Args:
+            name: 区间名称
+            start, end: 开始和结束时间（latency.now()的时间）
+            frame_id: 帧序号
+        """
+        if not self.enabled:
+            return
+        event = {
+            'name': name,
+            'cat': 'pipeline',
+            'ph': 'X',
+            'ts': self._us(start),
+            'dur': round((end - start) * 1e6, 1),
+            'pid': os.getpid(),
+            'tid': self._tid(),
+        }
+        if frame_id is not None:
+            event['args'] = {'frame': frame_id}
+        self._append(event)
+
+    def add_async_span(self, name, start, end, frame_id=None):
+        """
+        添加跨线程的耗时区间（如采集到主线程处理之间的排队等待）
+
+        Args:
+            name: 区间名称
+            start, end: 开始和结束时间
+            frame_id: 帧序号
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._async_id += 1
+            async_id = self._async_id
+        common = {'name': name, 'cat': 'pipeline', 'id': async_id,
+                  'pid': os.getpid(), 'tid': self._tid()}
+        args = {'frame': frame_id} if frame_id is not None else {}
+        self._append(dict(common, ph='b', ts=self._us(start), args=args))
+        self._append(dict(common, ph='e', ts=self._us(end)))
+
+    def _on_gc(self, phase, info):
+        """垃圾回收回调，记录GC造成的停顿"""
+        if phase == 'start':
+            self._gc_start = now()
+        elif self._gc_start is not None:
+            start, self._gc_start = self._gc_start, None
+            self.add_span(f"gc{info.get('generation', '')}", start, now())
+
+    def _us(self, t):
+        return round((t - self._origin) * 1e6, 1)
+
+    def _tid(self):
+        """获取当前线程的追踪ID，首次出现时记录线程名"""
+        ident = threading.get_ident()
+        tid = self._thread_ids.get(ident)
+        if tid is None:
+            with self._lock:
+                tid = len(self._thread_ids) + 1
+                self._thread_ids[ident] = tid
+            self._append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid,
+                          'args': {'name': threading.current_thread().name}})
+        return tid
+
+    def _append(self, event):
+        with self._lock:
+            if len(self.events) >= self.max_events:
+                if self.enabled:
+                    self.enabled = False
+                    Logger.warning("FrameTracer: 事件数达到上限，停止记录")
+                return
+            self.events.append(event)
+
+
+# 全局追踪器实例
+tracer = FrameTracer()